@@ -1,11 +1,17 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
-import os, json
-import pandas as pd
-import PyPDF2
-from RegulatoryAgent import claimvalidation_agent, regulatory_agent, cbvalidationdisplay_agent, decision_agent, \
-    validator_agent, summarizer_agent
+import json
+import hashlib
+from RegulatoryAgent import run_representment_pipeline
+from agent_graph import AgentGraphError
+from claim_context import ClaimContext
+from batch_jobs import batch_bp
+from validate_stream import stream_bp
+from metrics import metrics_bp
+from job_queue import jobs_bp
+from results_store import results_bp
+from claims_index import ClaimsIndex, DEFAULT_DATE_FIELD, STATUS_COLUMN
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,34 +19,18 @@ app = Flask(__name__)
 CORS(app)
 
 DATA_DIR = r"D:\Agentic AI\backend\Docs"
+app.config["DATA_DIR"] = DATA_DIR
 
-
-'''### 🔸 Your Existing Functions for Reading Excel & PDF Data ###
-def read_excel_data(claim_id):
-    file_path = f"{DATA_DIR}/{claim_id}.xlsx"
-    print("excel file path :", file_path)
-    if not os.path.exists(file_path):
-        print("Error: File %s does not exist.", file_path)
-        return None
-    df = pd.read_excel(file_path)
-    print("df :", df)
-    return df.to_dict()
-
-
-def read_pdf_data(claim_id):
-    pdf_file_path = f"{DATA_DIR}/{claim_id}.txt"
-    print("pdf file path :", pdf_file_path)
-    if not os.path.exists(pdf_file_path):
-        return None
-    with open(pdf_file_path, 'r', encoding='utf-8') as pdf_file:
-        pdf_reader = pdf_file.read()
-    try:
-        text = json.loads(pdf_reader)
-    except json.JSONDecodeError as e:
-        print("The file does not contain valid JSON.")
-        text = {}
-    print("pdf_reader :", pdf_reader)
-    return text'''
+# /api/validate/batch: queue many claims and poll for per-claim results
+app.register_blueprint(batch_bp)
+# /api/validate/stream: Server-Sent Events with each agent's output as it completes
+app.register_blueprint(stream_bp)
+# /api/jobs: durable queue drained by job_worker.py processes, resumable per agent
+app.register_blueprint(jobs_bp)
+# /api/results: past runs by claim, decision, reason code and date
+app.register_blueprint(results_bp)
+# /metrics for Prometheus; /api/validate responses carry a per-agent Server-Timing header
+app.register_blueprint(metrics_bp)
 
 
 ### 🔹 Your Existing API for Validation ###
@@ -48,69 +38,95 @@ def read_pdf_data(claim_id):
 def validate_dispute_reason():
     try:
         claim_id = request.json.get("claim_id")
-        print("claim_id :", claim_id)
+        app.logger.debug("claim_id: %s", claim_id)
         if not claim_id:
             return jsonify({"success": False, "error": "Claim ID not provided"}), 400
-        '''excel_data = read_excel_data(claim_id)
-        print("excel_data :", excel_data)
-        pdf_data = read_pdf_data(claim_id)
-        print("pdf_data :", pdf_data)
-
-        if excel_data is None or pdf_data is None:
-            return jsonify({"success": False, "error": "Files for given claim ID not found"}), 404'''
-
-        claimvalidation_response = claimvalidation_agent()
-        regulatory_response = regulatory_agent(claimvalidation_response)
-        cbvalidationdisplay_response = cbvalidationdisplay_agent(claimvalidation_response)
-        decision_response = decision_agent(claimvalidation_response, regulatory_response)
-        validator_response = validator_agent(decision_response)
-        summarizer_response = summarizer_agent(decision_response)
-
-        result = {
-            "ClaimValidationAgent": claimvalidation_response,
-            "RegulatoryAgent": regulatory_response,
-            "CBValidationDisplayAgent": cbvalidationdisplay_response,
-            "DecisionAgent": decision_response,
-            "ValidatorAgent": validator_response,
-            "SummarizerAgent": summarizer_response,
-        }
+
+        try:
+            claim_ctx = ClaimContext(claim_id, DATA_DIR)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if not claim_ctx.exists():
+            return jsonify({"success": False, "error": "Files for given claim ID not found"}), 404
+
+        # Independent agents run concurrently; see REPRESENTMENT_GRAPH
+        result = run_representment_pipeline(claim_ctx)
 
         return jsonify({"success": True, "result": result})
+    except AgentGraphError as e:
+        # The LLM stayed unavailable after retries; return what did complete
+        app.logger.error("Error occurred: %s", str(e))
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "failed_agents": {name: str(error) for name, error in e.failures.items()},
+            "skipped_agents": e.skipped,
+            "result": e.results,
+        }), 502
     except Exception as e:
         app.logger.error("Error occurred: %s", str(e))
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 ### 🔹 Added API for Fetching Claims Data (From `server.js`) ###
-def preserve_date_format(value, key):
-    date_fields = {"FLD TXN Date", "FLD Post Date", "Repre Date"}
+# Workbooks are parsed once and re-read only when their mtime changes
+claims_index = ClaimsIndex(DATA_DIR)
 
-    if key in date_fields and isinstance(value, (int, float)) and value > 30000:
-        excel_epoch_start = pd.Timestamp("1899-12-30")
-        formatted_date = excel_epoch_start + pd.to_timedelta(value, unit="D")
-        return formatted_date.strftime("%Y-%m-%d")
 
-    return value
+CLAIMS_PAGE_SIZE = 100
+CLAIMS_MAX_PAGE_SIZE = 1000
 
 
 @app.route("/api/getClaims", methods=["GET"])
 def get_claims():
+    """
+    Query parameters (all optional):
+      offset, limit                   page through the rows (limit defaults to 100, max 1000)
+      claim_number, status            exact-match filters
+      date_from, date_to, date_field  YYYY-MM-DD range on date_field (default FLD TXN Date)
+      fields                          comma-separated columns to return
+    The body stays a JSON array; X-Total-Count and X-Next-Offset describe the page.
+    """
     try:
-        files = [f for f in os.listdir(DATA_DIR) if f.endswith(".xlsx")]
-        claims_data = []
-
-        for file in files:
-            file_path = os.path.join(DATA_DIR, file)
-            sheets = pd.ExcelFile(file_path).sheet_names
-
-            for sheet_name in sheets:
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                df = df.fillna("")
-                formatted_data = df.apply(lambda row: {k: preserve_date_format(v, k) for k, v in row.items()}, axis=1)
-
-                claims_data.extend(formatted_data.to_dict(orient="records"))
-
-        return jsonify(claims_data)
+        args = request.args
+        offset = max(args.get("offset", 0, type=int), 0)
+        limit = min(max(args.get("limit", CLAIMS_PAGE_SIZE, type=int), 1), CLAIMS_MAX_PAGE_SIZE)
+        fields = [name.strip() for name in args.get("fields", "").split(",") if name.strip()]
+
+        # The only refresh per request: query works on the index as it stands.
+        # The ETag only depends on the index contents and the query, so an
+        # unchanged page is answered with 304 before any row is serialised
+        claims_index.refresh()
+        if args.get("status") and not claims_index.has_column(STATUS_COLUMN):
+            return jsonify({
+                "error": f"Cannot filter by status: no claims sheet has a '{STATUS_COLUMN}' column "
+                         "(set CLAIMS_STATUS_COLUMN to the workbook's status column)"
+            }), 400
+        query_key = json.dumps(sorted(args.items(multi=True)))
+        etag = f"{claims_index.version}-{hashlib.sha1(query_key.encode('utf-8')).hexdigest()[:16]}"
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        total, rows = claims_index.query(
+            claim_number=args.get("claim_number"),
+            status=args.get("status"),
+            date_from=args.get("date_from"),
+            date_to=args.get("date_to"),
+            date_field=args.get("date_field", DEFAULT_DATE_FIELD),
+            fields=fields or None,
+            offset=offset,
+            limit=limit,
+        )
+
+        response = jsonify(rows)
+        response.set_etag(etag, weak=True)
+        response.headers["X-Total-Count"] = str(total)
+        if offset + len(rows) < total:
+            response.headers["X-Next-Offset"] = str(offset + len(rows))
+        response.headers["Access-Control-Expose-Headers"] = "ETag, X-Total-Count, X-Next-Offset"
+        return response
 
     except Exception as e:
         return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
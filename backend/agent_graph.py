@@ -0,0 +1,148 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from llm_client import stream_deltas
+from metrics import agent_scope, current_timings
+
+logger = logging.getLogger("AgentGraph")
+
+
+class AgentNode:
+    """
+    One agent in the representment pipeline.
+
+    `func` is called with the claim context first, followed by the outputs of
+    the upstream agents named in `inputs`, in the listed order.
+    """
+
+    def __init__(self, name, func, inputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+
+    def __repr__(self):
+        return f"AgentNode({self.name!r}, inputs={list(self.inputs)})"
+
+
+class AgentGraphError(Exception):
+    """
+    Raised when agents of the graph failed.
+
+    `failures` maps each failed agent to its exception; `results` holds the
+    outputs of every agent that still ran. Agents downstream of a failure are
+    skipped rather than fed its error.
+    """
+
+    def __init__(self, failures, results, skipped=()):
+        names = ", ".join(f"{name}: {error}" for name, error in failures.items())
+        super().__init__(f"Agents failed - {names}")
+        self.failures = failures
+        self.results = results
+        self.skipped = list(skipped)
+
+
+def _check_graph(nodes):
+    """
+    Rejects duplicate names, unknown inputs and cycles before anything runs.
+    """
+    names = [node.name for node in nodes]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Duplicate agent names in graph: {names}")
+
+    known = set(names)
+    for node in nodes:
+        unknown = [name for name in node.inputs if name not in known]
+        if unknown:
+            raise ValueError(f"{node.name} depends on unknown agents: {unknown}")
+
+    # Kahn's algorithm: anything left over sits on a cycle
+    pending = {node.name: set(node.inputs) for node in nodes}
+    while pending:
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cycle in agent graph between: {sorted(pending)}")
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+
+
+def run_agent_graph(nodes, claim_ctx, max_workers=None, on_event=None, completed=None, on_result=None):
+    """
+    Runs every node once all of its inputs are available.
+
+    Agents that do not depend on each other run at the same time on a thread
+    pool, so the wall time is the critical path of the graph rather than the
+    sum of all agents. Returns a dict of agent name -> output, in the order the
+    nodes were declared.
+
+    A failing agent does not stop the agents that do not depend on it. Once
+    nothing else can run, AgentGraphError is raised with the failures and the
+    partial results.
+
+    When `on_event` is given, agents stream their LLM replies and it is called
+    as on_event("delta", name, text) for each token delta and
+    on_event("agent", name, output) as soon as an agent finishes, or
+    on_event("failed", name, message) when it raises.
+
+    Each agent's wall time and LLM calls are recorded in `metrics` under its
+    name, and in the calling thread's request timings if there are any.
+
+    `completed` holds outputs saved by an earlier, interrupted run; those
+    agents are not run again. `on_result(name, output)` is called from the
+    calling thread as each agent finishes, e.g. to checkpoint it.
+    """
+    _check_graph(nodes)
+    timings = current_timings()
+    names = {node.name for node in nodes}
+
+    def call(node, args):
+        with agent_scope(node.name, timings):
+            if on_event is None:
+                return node.func(claim_ctx, *args)
+            with stream_deltas(lambda text: on_event("delta", node.name, text)):
+                return node.func(claim_ctx, *args)
+
+    results = {name: output for name, output in (completed or {}).items() if name in names}
+    failures = {}
+    skipped = []
+    waiting = [node for node in nodes if node.name not in results]
+    if results:
+        logger.info("Resuming after %s", ", ".join(results))
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(nodes)) as pool:
+        while waiting or running:
+            for node in [n for n in waiting if any(i in failures or i in skipped for i in n.inputs)]:
+                logger.warning("Skipping %s: an upstream agent failed", node.name)
+                skipped.append(node.name)
+                waiting.remove(node)
+
+            for node in [n for n in waiting if all(i in results for i in n.inputs)]:
+                logger.info("Processing %s...", node.name)
+                args = [results[name] for name in node.inputs]
+                running[pool.submit(call, node, args)] = node
+                waiting.remove(node)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node.name] = future.result()
+                except Exception as e:
+                    logger.error("%s failed: %s", node.name, e)
+                    failures[node.name] = e
+                    if on_event is not None:
+                        on_event("failed", node.name, str(e))
+                    continue
+                logger.debug("%s Response: %s", node.name, results[node.name])
+                if on_result is not None:
+                    on_result(node.name, results[node.name])
+                if on_event is not None:
+                    on_event("agent", node.name, results[node.name])
+
+    ordered = {node.name: results[node.name] for node in nodes if node.name in results}
+    if failures:
+        raise AgentGraphError(failures, ordered, skipped)
+    return ordered
@@ -1,7 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
-from RegulatoryAgent import claimvalidation_agent, regulatory_agent, cbvalidationdisplay_agent , decision_agent, validator_agent, summarizer_agent
+from RegulatoryAgent import run_representment_pipeline
+from agent_graph import AgentGraphError
+from claim_context import ClaimContext
+from batch_jobs import batch_bp
+from validate_stream import stream_bp
+from metrics import metrics_bp
+from job_queue import jobs_bp
+from results_store import results_bp
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -9,6 +16,17 @@ logging.basicConfig(level=logging.DEBUG)
 app = Flask(__name__)
 CORS(app)
 
+# /api/validate/batch: queue many claims and poll for per-claim results
+app.register_blueprint(batch_bp)
+# /api/validate/stream: Server-Sent Events with each agent's output as it completes
+app.register_blueprint(stream_bp)
+# /api/jobs: durable queue drained by job_worker.py processes, resumable per agent
+app.register_blueprint(jobs_bp)
+# /api/results: past runs by claim, decision, reason code and date
+app.register_blueprint(results_bp)
+# /metrics for Prometheus; /api/validate responses carry a per-agent Server-Timing header
+app.register_blueprint(metrics_bp)
+
 @app.route('/api/validate', methods=['POST'])
 def validate_dispute_reason():
     try:
@@ -21,47 +39,31 @@ def validate_dispute_reason():
         app.logger.info("Received PDF Data: %s", pdf_data)
         app.logger.info("Received CSV Data: %s", csv_data)'''
 
-        # Step 1: Run ClaimValidationAgent
-        app.logger.info("Processing ClaimValidationAgent...")
-        claimvalidation_response = claimvalidation_agent()
-        app.logger.debug("ClaimValidationAgent Response: %s", claimvalidation_response)
-
-        # Step 2: Run RegulatoryAgent
-        app.logger.info("Processing RegulatoryAgent...")
-        regulatory_response = regulatory_agent(claimvalidation_response)
-        app.logger.debug("RegulatoryAgent Response: %s", regulatory_response)
-
-        # Step 2: Run cbvalidationdisplay_agent
-        app.logger.info("Processing CBValidationDisplayAgent...")
-        cbvalidationdisplay_response = cbvalidationdisplay_agent(claimvalidation_response)
-        app.logger.debug("CBValidationDisplayAgent Response: %s", cbvalidationdisplay_response)
-
-        # Step 3: Run DecisionAgent
-        app.logger.info("Processing DecisionAgent...")
-        decision_response = decision_agent(claimvalidation_response, regulatory_response)
-        app.logger.debug("DecisionAgent Response: %s", decision_response)
+        claim_id = request.json.get("claim_id")
+        if not claim_id:
+            return jsonify({"success": False, "error": "Claim ID not provided"}), 400
+        try:
+            claim_ctx = ClaimContext(claim_id)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if not claim_ctx.exists():
+            return jsonify({"success": False, "error": "Files for given claim ID not found"}), 404
 
-        # Step 4: Run ValidatorAgent
-        app.logger.info("Processing ValidatorAgent...")
-        validator_response = validator_agent(decision_response)
-        app.logger.debug("ValidatorAgent Response: %s", validator_response)
-
-        # Step 5: Run SummarizerAgent
-        app.logger.info("Processing SummarizerAgent...")
-        summarizer_response = summarizer_agent(decision_response)
-        app.logger.debug("ValidatorAgent Response: %s", validator_response)
-
-        # Maintains the order of the responses (ensures desired sequence)
-        result = {
-            "ClaimValidationAgent": claimvalidation_response,
-            "RegulatoryAgent": regulatory_response,
-            "CBValidationDisplayAgent": cbvalidationdisplay_response,
-            "DecisionAgent": decision_response,
-            "ValidatorAgent": validator_response,
-            "SummarizerAgent": summarizer_response,
-        }
+        # Run the agent graph; agents that share only an upstream input run
+        # concurrently, and the result keeps the declared agent order
+        result = run_representment_pipeline(claim_ctx)
 
         return jsonify({"success": True, "result": result})
+    except AgentGraphError as e:
+        # The LLM stayed unavailable after retries; return what did complete
+        app.logger.error("Error occurred: %s", str(e))
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "failed_agents": {name: str(error) for name, error in e.failures.items()},
+            "skipped_agents": e.skipped,
+            "result": e.results,
+        }), 502
     except Exception as e:
         app.logger.error("Error occurred: %s", str(e))
         return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,142 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, current_app, jsonify, request
+from claim_context import ClaimContext
+from RegulatoryAgent import run_representment_pipeline
+
+logger = logging.getLogger("BatchJobs")
+
+# Claims validated at the same time; LLM_MAX_INFLIGHT caps the requests they make
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "4"))
+BATCH_MAX_CLAIMS = int(os.environ.get("BATCH_MAX_CLAIMS", "5000"))
+# Finished jobs are forgotten after this many seconds
+BATCH_JOB_TTL = float(os.environ.get("BATCH_JOB_TTL", "3600"))
+
+
+class BatchJob:
+    """
+    Progress and per-claim results of one batch validation request.
+
+    `results` is appended to in completion order, so a client that has already
+    seen the first n entries can ask for the rest with ?offset=n.
+    """
+
+    def __init__(self, claim_ids):
+        self.job_id = uuid.uuid4().hex
+        self.claim_ids = list(claim_ids)
+        self.created_at = time.time()
+        self.finished_at = None
+        self.results = []
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        if self.finished_at is not None:
+            return "completed"
+        return "running" if self.results else "queued"
+
+    def record(self, claim_id, result=None, error=None):
+        entry = {"claim_id": claim_id, "success": error is None}
+        if error is None:
+            entry["result"] = result
+        else:
+            entry["error"] = error
+        with self._lock:
+            self.results.append(entry)
+            if len(self.results) == len(self.claim_ids):
+                self.finished_at = time.time()
+
+    def snapshot(self, offset=0):
+        with self._lock:
+            results = self.results[offset:]
+            failed = sum(1 for entry in self.results if not entry["success"])
+            completed = len(self.results)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": len(self.claim_ids),
+            "completed": completed,
+            "failed": failed,
+            "offset": offset,
+            "results": results,
+        }
+
+
+class BatchRunner:
+    """
+    Runs batch jobs on a bounded pool of claim workers, shared by all jobs.
+    """
+
+    def __init__(self, max_workers=BATCH_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, claim_ids, data_dir=None):
+        """
+        Queues every claim of a new job and returns the job without waiting.
+        """
+        job = BatchJob(claim_ids)
+        with self._lock:
+            self._expire_jobs()
+            self._jobs[job.job_id] = job
+        for claim_id in job.claim_ids:
+            self._pool.submit(self._run_claim, job, claim_id, data_dir)
+        logger.info("Queued batch job %s with %d claims", job.job_id, len(job.claim_ids))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire_jobs(self):
+        cutoff = time.time() - BATCH_JOB_TTL
+        for job_id in [j for j, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run_claim(self, job, claim_id, data_dir):
+        try:
+            claim_ctx = ClaimContext(claim_id, data_dir)
+            if not claim_ctx.exists():
+                job.record(claim_id, error="Files for given claim ID not found")
+                return
+            job.record(claim_id, result=run_representment_pipeline(claim_ctx))
+        except Exception as e:
+            logger.error("Batch job %s: claim %s failed: %s", job.job_id, claim_id, e)
+            job.record(claim_id, error=str(e))
+
+
+batch_runner = BatchRunner()
+batch_bp = Blueprint("batch", __name__)
+
+
+@batch_bp.route('/api/validate/batch', methods=['POST'])
+def submit_batch():
+    claim_ids = (request.get_json(silent=True) or {}).get("claim_ids")
+    if not isinstance(claim_ids, list) or not claim_ids:
+        return jsonify({"success": False, "error": "claim_ids must be a non-empty list"}), 400
+    if len(claim_ids) > BATCH_MAX_CLAIMS:
+        return jsonify({"success": False, "error": f"At most {BATCH_MAX_CLAIMS} claims per batch"}), 400
+
+    # Duplicates would only pay for the same pipeline twice
+    claim_ids = list(dict.fromkeys(str(claim_id) for claim_id in claim_ids))
+    job = batch_runner.submit(claim_ids, current_app.config.get("DATA_DIR"))
+    return jsonify({
+        "success": True,
+        "job_id": job.job_id,
+        "total": len(job.claim_ids),
+        "status_url": f"/api/validate/batch/{job.job_id}",
+    }), 202
+
+
+@batch_bp.route('/api/validate/batch/<job_id>', methods=['GET'])
+def get_batch(job_id):
+    job = batch_runner.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job ID"}), 404
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    return jsonify({"success": True, **job.snapshot(offset)})
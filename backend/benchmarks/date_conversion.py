@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: row-wise vs column-wise Excel date conversion.
+
+Builds a synthetic DRC sheet (100k rows by default) with the date columns
+stored as Excel serial numbers, then times the old per-cell
+`df.apply(..., axis=1)` path against `claims_index.convert_excel_dates`.
+
+Usage (from the backend folder):
+    python benchmarks/date_conversion.py [--rows 100000] [--workbook out.xlsx]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claims_index import convert_excel_dates  # noqa: E402
+
+
+def legacy_preserve_date_format(value, key):
+    """
+    The per-cell conversion /api/getClaims used before the claims index.
+    """
+    date_fields = {"FLD TXN Date", "FLD Post Date", "Repre Date"}
+
+    if key in date_fields and isinstance(value, (int, float)) and value > 30000:
+        excel_epoch_start = pd.Timestamp("1899-12-30")
+        formatted_date = excel_epoch_start + pd.to_timedelta(value, unit="D")
+        return formatted_date.strftime("%Y-%m-%d")
+
+    return value
+
+
+def legacy_rowwise(df):
+    df = df.fillna("")
+    formatted = df.apply(lambda row: {k: legacy_preserve_date_format(v, k) for k, v in row.items()}, axis=1)
+    return pd.DataFrame(list(formatted))
+
+
+def vectorised(df):
+    return convert_excel_dates(df.copy()).fillna("")
+
+
+def synthetic_sheet(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    serials = rng.integers(44000, 46000, size=rows).astype("float64")
+    return pd.DataFrame({
+        "FLD Claim Number": [f"D{n:010d}" for n in range(rows)],
+        "FLD TXN Amount": rng.uniform(1, 500, size=rows).round(2),
+        "FLD TXN Date": serials,
+        "FLD Post Date": serials + 1,
+        "Repre Date": serials + 30,
+        "FLD Merchant Name": rng.choice(["TODAY SHOPS", "ACME", "NORTHWIND"], size=rows),
+        "CB Reason Code": rng.choice([30, 53, 83], size=rows),
+    })
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workbook", help="also write the synthetic sheet to this .xlsx path and read it back")
+    args = parser.parse_args()
+
+    df = synthetic_sheet(args.rows)
+    if args.workbook:
+        df.to_excel(args.workbook, index=False)
+        df = pd.read_excel(args.workbook)
+
+    # The old path is slow enough that one run is representative
+    legacy_time, legacy = best_of(legacy_rowwise, df, 1)
+    new_time, new = best_of(vectorised, df, args.repeat)
+
+    for column in ("FLD TXN Date", "FLD Post Date", "Repre Date"):
+        if not legacy[column].astype(str).equals(new[column].astype(str)):
+            raise SystemExit(f"Outputs differ in column {column!r}")
+
+    print(f"rows:        {args.rows}")
+    print(f"row-wise:    {legacy_time * 1000:10.1f} ms")
+    print(f"vectorised:  {new_time * 1000:10.1f} ms")
+    print(f"speed-up:    {legacy_time / new_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
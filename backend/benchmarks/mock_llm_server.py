@@ -0,0 +1,245 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions endpoint.
+
+Answers every request after a configurable delay with a canned reply chosen
+by matching the prompt against substrings, so the representment pipeline can
+be benchmarked with no network. A fraction of requests can be failed to
+exercise retries. Both plain and stream=true requests are supported.
+Provider-side prompt caching is imitated: usage reports the longest prompt
+prefix seen before as cached_tokens, counted the way Azure OpenAI does.
+
+Usage (from the backend folder):
+    python benchmarks/mock_llm_server.py [--port 8089] [--latency 0.5] [--jitter 0.1]
+                                         [--error-rate 0.02] [--responses canned.json]
+then point the app at it:
+    AZURE_OPENAI_URL=http://127.0.0.1:8089/chat/completions python app.py
+
+`--responses` is a JSON object of {"prompt substring": reply}; a reply that is
+not a string is sent as JSON text. Its entries are tried before the defaults.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Checked in order; the first substring found in the prompt picks the reply
+DEFAULT_RESPONSES = {
+    "You are provided two data sources": {
+        "pdf_data": {"Transaction Amount": "25.54", "Transaction Date": "2025-02-20"},
+        "drc_data": {"Transaction Amount": "25.54", "Transaction Date": "2025-02-20"},
+        "matched_fields": [{"field_name": "Transaction Amount", "pdf_value": "25.54", "drc_value": "25.54"}],
+        "mismatched_fields": [],
+        "missing_fields": {"pdf_missing": [], "drc_missing": []},
+        "critical_findings": [],
+    },
+    "RegulatoryValidationAgent": {
+        "dispute_reason": "13.1 Merchandise/Services Not Received",
+        "identified_visa_rules": "Merchant must provide proof of delivery or service.",
+        "required_information": ["Proof of delivery", "Transaction receipt"],
+        "available_information": ["Proof of delivery", "Transaction receipt"],
+        "missing_information": [],
+        "justification": "All required information is present.",
+    },
+    "DecisionAgent with 30 years": {
+        "information_considered": ["Proof of delivery provided"],
+        "Final Decision recommendation": "Send for Cardholder's review/Rebuttal letter",
+        "justification": "Merchant supplied the required evidence.",
+    },
+    "output from the DecisionAgent": {
+        "Guardrails Check": "Pass",
+        "Review Summary": "The decision is consistent with the evidence.",
+        "Recommendations": "None",
+    },
+    "Summarizer Agent": "## 🧾 Summary\n- ✅ Decision: Send for Cardholder's review/Rebuttal letter",
+}
+DEFAULT_REPLY = "{}"
+
+# Prompts shorter than this are never cached; longer ones are cached in steps of PROMPT_CACHE_STEP
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_STEP = 128
+# Rough size of a token, for the usage the mock reports
+CHARS_PER_TOKEN = 4
+
+
+class MockLLMServer:
+    """
+    Threaded mock endpoint; `start()` returns the chat-completions URL.
+
+    `latency` and `jitter` (seconds) set the delay before the response
+    headers: a normal draw around `latency`, never below zero. `error_rate`
+    of the requests are answered with `error_status` instead.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.5, jitter=0.1, error_rate=0.0, error_status=503,
+                 responses=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responses = dict(responses or {})
+        for marker, reply in DEFAULT_RESPONSES.items():
+            self.responses.setdefault(marker, reply)
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "streamed": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reply_for(self, prompt):
+        for marker, reply in self.responses.items():
+            if marker in prompt:
+                return reply if isinstance(reply, str) else json.dumps(reply)
+        return DEFAULT_REPLY
+
+    def cached_tokens(self, messages):
+        """
+        Prompt tokens of `messages` whose prefix an earlier request already sent;
+        every prefix of this request is remembered for the next ones.
+        """
+        text = json.dumps(messages, ensure_ascii=False)
+        step = PROMPT_CACHE_STEP * CHARS_PER_TOKEN
+        digest = hashlib.sha1(text[:PROMPT_CACHE_MIN_TOKENS * CHARS_PER_TOKEN].encode("utf-8"))
+        cached = 0
+        with self._lock:
+            for end in range(PROMPT_CACHE_MIN_TOKENS * CHARS_PER_TOKEN, len(text) + 1, step):
+                if end > PROMPT_CACHE_MIN_TOKENS * CHARS_PER_TOKEN:
+                    digest.update(text[end - step:end].encode("utf-8"))
+                key = digest.copy().digest()
+                if key in self._prefixes:
+                    cached = end // CHARS_PER_TOKEN
+                self._prefixes.add(key)
+        return cached
+
+    def _draw(self):
+        """
+        (delay in seconds, whether to fail) for the next request.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = max(self.random.gauss(self.latency, self.jitter), 0.0) if self.jitter else self.latency
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.stats["errors"] += 1
+        return delay, fail
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                delay, fail = server._draw()
+                time.sleep(delay)
+                if fail:
+                    body = json.dumps({"error": {"code": str(server.error_status), "message": "mock failure"}})
+                    self._send(server.error_status, body.encode("utf-8"), headers={"Retry-After": "0"})
+                    return
+
+                prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+                if (request.get("response_format") or {}).get("type") == "json_object" and "json" not in prompt.lower():
+                    # As the real endpoint does
+                    body = json.dumps({"error": {"message": "'messages' must contain the word 'json' in some form"}})
+                    self._send(400, body.encode("utf-8"))
+                    return
+                content = server.reply_for(prompt)
+                usage = {
+                    "prompt_tokens": len(prompt) // CHARS_PER_TOKEN,
+                    "completion_tokens": len(content) // CHARS_PER_TOKEN,
+                    "total_tokens": (len(prompt) + len(content)) // CHARS_PER_TOKEN,
+                    "prompt_tokens_details": {"cached_tokens": server.cached_tokens(request.get("messages", []))},
+                }
+                with server._lock:
+                    server.stats["prompt_tokens"] += usage["prompt_tokens"]
+                    server.stats["cached_tokens"] += usage["prompt_tokens_details"]["cached_tokens"]
+                if request.get("stream"):
+                    with server._lock:
+                        server.stats["streamed"] += 1
+                    self._stream(content, usage if request.get("stream_options") else None)
+                    return
+                body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}], "usage": usage}
+                self._send(200, json.dumps(body).encode("utf-8"))
+
+            def _stream(self, content, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [{"choices": [{"index": 0, "delta": {"content": content[i:i + 16]}}]}
+                          for i in range(0, len(content), 16)]
+                if usage:
+                    events.append({"choices": [], "usage": usage})
+                lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+                for line in lines:
+                    data = line.encode("utf-8")
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def load_responses(path):
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean delay per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="standard deviation of the delay (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests to fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of failed requests")
+    parser.add_argument("--responses", help="JSON file of {prompt substring: reply}")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+                           load_responses(args.responses), args.seed)
+    print(f"Mock chat-completions endpoint at {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.stats['requests']} requests ({server.stats['errors']} failed), "
+              f"{server.stats['cached_tokens']} of {server.stats['prompt_tokens']} prompt tokens cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Throughput benchmark for the representment pipeline, fully offline.
+
+Starts benchmarks/mock_llm_server.py in-process, then validates claims at a
+fixed concurrency and reports p50/p95/p99 latency, claims per second and the
+same percentiles per agent. The LLM response cache is off unless --cache is
+given, so every run pays for every agent call.
+
+Modes:
+    agents  call RegulatoryAgent.run_representment_pipeline directly
+    api     POST /api/validate through the Flask test client, or to --url
+            when a server is already running (start it with AZURE_OPENAI_URL
+            pointing at a mock server)
+
+Usage (from the backend folder):
+    python benchmarks/pipeline.py [--mode agents] [--requests 50] [--concurrency 8]
+                                  [--latency 0.5] [--jitter 0.1] [--error-rate 0]
+                                  [--claim-id D1111111261 ...] [--responses canned.json]
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from mock_llm_server import MockLLMServer, load_responses  # noqa: E402
+
+_SERVER_TIMING_PATTERN = re.compile(r"([\w-]+);dur=([\d.]+)")
+
+
+def percentile(values, pct):
+    """
+    Linear-interpolated percentile of `values` (0-100).
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def agents_runner():
+    from RegulatoryAgent import run_representment_pipeline
+    from claim_context import ClaimContext
+    from metrics import RequestTimings, collect
+
+    def run(claim_id):
+        with collect(RequestTimings()) as timings:
+            run_representment_pipeline(ClaimContext(claim_id))
+        return {agent: stats["seconds"] for agent, stats in timings.summary().items()}
+
+    return run
+
+
+def api_runner(url=None):
+    """
+    One /api/validate call per claim; agent durations come from Server-Timing.
+    """
+    def agent_seconds(header):
+        return {name: float(ms) / 1000 for name, ms in _SERVER_TIMING_PATTERN.findall(header or "")
+                if name != "total"}
+
+    if url:
+        import urllib3
+        pool = urllib3.PoolManager(maxsize=64)
+
+        def run(claim_id):
+            response = pool.request("POST", url, body=json.dumps({"claim_id": claim_id}),
+                                    headers={"Content-Type": "application/json"})
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {response.data[:200]!r}")
+            return agent_seconds(response.headers.get("Server-Timing"))
+
+        return run
+
+    from app import app
+    clients = threading.local()
+
+    def run(claim_id):
+        if not hasattr(clients, "client"):
+            clients.client = app.test_client()
+        response = clients.client.post("/api/validate", json={"claim_id": claim_id})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return agent_seconds(response.headers.get("Server-Timing"))
+
+    return run
+
+
+def run_benchmark(run, claim_ids, requests, concurrency, warmup):
+    """
+    Calls run(claim_id) `requests` times over `concurrency` threads.
+
+    Returns (wall seconds, request latencies, {agent: [seconds]}, errors).
+    """
+    for i in range(warmup):
+        run(claim_ids[i % len(claim_ids)])
+
+    latencies = []
+    per_agent = {}
+    errors = []
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            agents = run(claim_ids[i % len(claim_ids)])
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            for agent, seconds in agents.items():
+                per_agent.setdefault(agent, []).append(seconds)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - started, latencies, per_agent, errors
+
+
+def report(wall, latencies, per_agent, errors, requests, mock):
+    print(f"\n{requests} claims, {len(errors)} failed, {wall:.2f}s wall, "
+          f"{len(latencies) / wall:.2f} claims/s")
+    if mock is not None:
+        print(f"mock LLM: {mock.stats['requests']} requests, {mock.stats['errors']} injected failures, "
+              f"{mock.stats['cached_tokens']} of {mock.stats['prompt_tokens']} prompt tokens prefix-cached")
+    print(f"\n{'':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [("claim", latencies)] + sorted(per_agent.items())
+    for name, values in rows:
+        print(f"{name:<26}" + "".join(f"{percentile(values, pct) * 1000:>10.1f}" for pct in (50, 95, 99)))
+    for error in dict.fromkeys(errors):
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("agents", "api"), default="agents")
+    parser.add_argument("--url", help="with --mode api: POST to this running /api/validate instead")
+    parser.add_argument("--claim-id", action="append", dest="claim_ids", help="claim to validate (repeatable)")
+    parser.add_argument("--requests", type=int, default=50, help="claims to validate")
+    parser.add_argument("--concurrency", type=int, default=8, help="claims validated at once")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed claims before the run")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock LLM mean delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="mock LLM delay standard deviation (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM requests to fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--responses", help="JSON file of {prompt substring: reply} for the mock")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--log-level", default="ERROR", help="backend log level during the run")
+    args = parser.parse_args()
+    # Before the app is imported, so its DEBUG basicConfig does not flood the report
+    logging.basicConfig(level=args.log_level.upper())
+
+    mock = None
+    if not args.url:
+        mock = MockLLMServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             error_status=args.error_status, responses=load_responses(args.responses),
+                             seed=args.seed)
+        # Must be set before llm_client is imported: its settings are read at import time
+        os.environ["AZURE_OPENAI_URL"] = mock.start()
+    if not args.cache:
+        os.environ["LLM_CACHE_SIZE"] = "0"
+        os.environ.pop("LLM_CACHE_DB", None)
+
+    run = agents_runner() if args.mode == "agents" else api_runner(args.url)
+    claim_ids = args.claim_ids or ["D1111111261"]
+    print(f"{args.mode}: {args.requests} claims at concurrency {args.concurrency}"
+          + ("" if args.url else f", mock latency {args.latency}s ± {args.jitter}s, error rate {args.error_rate}"))
+    try:
+        results = run_benchmark(run, claim_ids, args.requests, args.concurrency, args.warmup)
+        report(*results, args.requests, mock)
+    finally:
+        if mock is not None:
+            mock.stop()
+
+
+if __name__ == "__main__":
+    main()
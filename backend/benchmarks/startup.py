@@ -0,0 +1,65 @@
+"""
+Import-time benchmark for the backend modules.
+
+Each module is imported in a fresh interpreter with networking disabled, so any
+LLM call or other socket use at import time fails the run instead of silently
+slowing down worker boot.
+
+Usage (from the backend folder):
+    python benchmarks/startup.py [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["pdf_reader", "csv_reader", "claim_context", "RepreRules", "RegulatoryAgent", "app"]
+
+# Runs inside the child interpreter: block sockets, then time a single import
+_CHILD_SCRIPT = """
+import socket, sys, time
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError("network access during import")
+
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+socket.getaddrinfo = _no_network
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def time_import(module):
+    """
+    Imports `module` in a new interpreter and returns the import time in ms.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT, module],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip()}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh imports per module")
+    args = parser.parse_args()
+
+    print(f"{'module':<18}{'median ms':>12}{'max ms':>10}")
+    for module in MODULES:
+        timings = [time_import(module) for _ in range(args.repeat)]
+        print(f"{module:<18}{statistics.median(timings):>12.1f}{max(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
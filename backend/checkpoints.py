@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger("Checkpoints")
+
+# Agent outputs kept across runs, keyed by claim, agent and input hash; CHECKPOINTS=0 turns reuse off
+CHECKPOINTS = os.environ.get("CHECKPOINTS", "1") != "0"
+CHECKPOINT_DB = os.environ.get(
+    "CHECKPOINT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoints.sqlite3")
+)
+# Older input versions kept per claim and agent
+CHECKPOINT_VERSIONS = int(os.environ.get("CHECKPOINT_VERSIONS", "5"))
+
+
+def input_hash(*parts):
+    """
+    Content hash of an agent's inputs (prompt text, parsed files, upstream outputs).
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    """
+    Content hash of a file, read in blocks so large workbooks are never held whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_error(output):
+    """
+    True for the {"error": ...} JSON the agents return instead of a result.
+    """
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            return False
+    return isinstance(output, dict) and set(output) == {"error"}
+
+
+class CheckpointStore:
+    """
+    Agent outputs in a sqlite table, written as soon as each agent finishes.
+
+    A re-run of a claim looks each agent up by the hash of its inputs, so only
+    agents whose inputs changed are recomputed; everything downstream of an
+    unchanged output is reused as well.
+    """
+
+    def __init__(self, db_path=CHECKPOINT_DB, versions=CHECKPOINT_VERSIONS):
+        self.versions = versions
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS agent_outputs ("
+            " claim_id TEXT NOT NULL, agent TEXT NOT NULL, input_hash TEXT NOT NULL,"
+            " output TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (claim_id, agent, input_hash))"
+        )
+        self._db.commit()
+
+    def get(self, claim_id, agent, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT output FROM agent_outputs WHERE claim_id = ? AND agent = ? AND input_hash = ?",
+                (claim_id, agent, key),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, claim_id, agent, key, output):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO agent_outputs (claim_id, agent, input_hash, output, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (claim_id, agent, key, json.dumps(output), time.time()),
+            )
+            self._db.execute(
+                "DELETE FROM agent_outputs WHERE claim_id = ? AND agent = ? AND input_hash NOT IN ("
+                " SELECT input_hash FROM agent_outputs WHERE claim_id = ? AND agent = ?"
+                " ORDER BY created_at DESC LIMIT ?)",
+                (claim_id, agent, claim_id, agent, self.versions),
+            )
+            self._db.commit()
+
+    def latest(self, claim_id):
+        """
+        {agent: output} of the most recent run of every agent for the claim.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT agent, output FROM agent_outputs WHERE claim_id = ? ORDER BY created_at", (claim_id,)
+            ).fetchall()
+        return {agent: json.loads(output) for agent, output in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Process-wide store, opened on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore()
+    return _store
+
+
+def checkpointed(claim_id, agent, key, compute):
+    """
+    Returns the stored output for (claim_id, agent, key), or compute() and stores it.
+
+    Error outputs are passed through without being stored.
+    """
+    if not CHECKPOINTS:
+        return compute()
+    store = get_store()
+    output = store.get(claim_id, agent, key)
+    if output is not None:
+        logger.info("%s for %s: inputs unchanged, reusing checkpoint", agent, claim_id)
+        return output
+    output = compute()
+    if not _is_error(output):
+        store.put(claim_id, agent, key, output)
+    return output
@@ -0,0 +1,94 @@
+import os
+import re
+import threading
+from functools import cached_property
+from checkpoints import checkpointed, file_hash, input_hash
+from csv_reader import DRC_NOTES_INSTRUCTIONS, iter_excel_sheets, process_notes_with_api
+from drc_extract import DRC_RESIDUAL_MIN_CHARS, NOTE_MIN_CHARS, PRE_EXTRACT_VERSION
+from pdf_reader import read_ocr_file
+from llm_client import MODEL, stream_deltas
+
+# Folder holding <claim_id>.xlsx (DRC export) and <claim_id>.txt (OCR of the merchant's response)
+DATA_DIR = os.environ.get("REPRE_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "Docs"))
+
+_CLAIM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# (kind, path) -> (mtime, value); shared by every request in the process
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+
+def load_cached(kind, path, loader):
+    """
+    Returns loader(path), reusing the previous result while the file's mtime is unchanged.
+    """
+    mtime = os.path.getmtime(path)
+    with _file_cache_lock:
+        cached = _file_cache.get((kind, path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    value = loader(path)
+    with _file_cache_lock:
+        _file_cache[(kind, path)] = (mtime, value)
+    return value
+
+
+def _extract_drc_data(workbook_path):
+    """
+    Reads every sheet of a DRC workbook and has the LLM extract the notes.
+
+    The extraction is checkpointed by the workbook's contents, the model, the
+    prompt and the pre-extraction rules, so it survives restarts and is reused
+    when only the merchant's OCR file changed. The sheets are streamed chunk
+    by chunk into the extraction, never loaded whole.
+    """
+    claim_id = os.path.splitext(os.path.basename(workbook_path))[0]
+    key = input_hash(MODEL, DRC_NOTES_INSTRUCTIONS, PRE_EXTRACT_VERSION, NOTE_MIN_CHARS, DRC_RESIDUAL_MIN_CHARS,
+                     file_hash(workbook_path))
+    # Input preparation, not agent output: keep it out of any SSE stream
+    with stream_deltas(None):
+        return checkpointed(claim_id, "DRCNotesExtraction", key,
+                            lambda: process_notes_with_api(iter_excel_sheets(workbook_path)))
+
+
+class ClaimContext:
+    """
+    Inputs of a single claim, built per request from its claim ID.
+
+    The workbook and OCR file are only read when an agent first asks for them,
+    and the parsed result is shared across requests until the file changes.
+    """
+
+    def __init__(self, claim_id, data_dir=None):
+        claim_id = str(claim_id).strip()
+        if not _CLAIM_ID_PATTERN.match(claim_id):
+            raise ValueError(f"Invalid claim ID: {claim_id!r}")
+
+        self.claim_id = claim_id
+        self.data_dir = data_dir or DATA_DIR
+        self.workbook_path = os.path.join(self.data_dir, f"{claim_id}.xlsx")
+        self.ocr_path = os.path.join(self.data_dir, f"{claim_id}.txt")
+
+    def __repr__(self):
+        return f"ClaimContext({self.claim_id!r})"
+
+    def exists(self):
+        """
+        True when both the DRC workbook and the OCR file for the claim are on disk.
+        """
+        return os.path.exists(self.workbook_path) and os.path.exists(self.ocr_path)
+
+    @cached_property
+    def pdf_data(self):
+        """
+        OCR of the merchant's response, as parsed JSON.
+        """
+        return load_cached("ocr", self.ocr_path, read_ocr_file)
+
+    @cached_property
+    def drc_data(self):
+        """
+        LLM extraction of the DRC workbook's transaction and notes sheets.
+        """
+        return load_cached("drc", self.workbook_path, _extract_drc_data)
@@ -0,0 +1,256 @@
+import os
+import logging
+import threading
+from workbook_loader import iter_sheet_chunks, load_workbook_sheets, should_stream
+
+logger = logging.getLogger("ClaimsIndex")
+
+
+# Columns holding dates; override with e.g. CLAIMS_DATE_COLUMNS="FLD TXN Date,Repre Date"
+DATE_COLUMNS = [
+    column.strip()
+    for column in os.environ.get("CLAIMS_DATE_COLUMNS", "FLD TXN Date,FLD Post Date,Repre Date").split(",")
+    if column.strip()
+]
+EXCEL_EPOCH = "1899-12-30"
+
+# Columns behind the /api/getClaims filters
+CLAIM_NUMBER_COLUMN = "FLD Claim Number"
+STATUS_COLUMN = os.environ.get("CLAIMS_STATUS_COLUMN", "Status")
+DEFAULT_DATE_FIELD = "FLD TXN Date"
+# Smaller numbers are amounts or IDs, not dates (30000 is 1982-02-17)
+MIN_EXCEL_SERIAL = 30000
+
+
+def convert_excel_dates(df, date_columns=None):
+    """
+    Converts the date columns to YYYY-MM-DD strings, one whole column at a time.
+
+    Excel serial numbers above MIN_EXCEL_SERIAL and cells already parsed as
+    dates (by pandas or openpyxl) are converted; anything else (text, blanks,
+    small numbers) is kept.
+    """
+    import datetime
+    import pandas as pd
+
+    epoch = pd.Timestamp(EXCEL_EPOCH)
+    for column in DATE_COLUMNS if date_columns is None else date_columns:
+        if column not in df.columns:
+            continue
+        values = df[column]
+
+        if pd.api.types.is_datetime64_any_dtype(values):
+            df[column] = values.dt.strftime("%Y-%m-%d")
+            continue
+
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            serials = values.astype("float64")
+            is_date = pd.Series(False, index=values.index)
+        else:
+            # Mixed column: only real numbers are serials, never numeric-looking text
+            is_number = values.map(type).isin((int, float))
+            serials = pd.to_numeric(values.where(is_number), errors="coerce")
+            # openpyxl hands back datetime cells as-is, possibly next to text
+            is_date = values.map(lambda value: isinstance(value, datetime.date))
+
+        is_serial = serials > MIN_EXCEL_SERIAL
+        if not is_serial.any() and not is_date.any():
+            continue
+        converted = values.astype(object)
+        if is_date.any():
+            converted[is_date] = values[is_date].map(lambda value: value.strftime("%Y-%m-%d"))
+        if is_serial.any():
+            dates = epoch + pd.to_timedelta(serials[is_serial], unit="D")
+            converted[is_serial] = dates.dt.strftime("%Y-%m-%d")
+        df[column] = converted
+    return df
+
+
+def _normalise_sheet(df):
+    """
+    Turn Excel dates into YYYY-MM-DD strings and blank out NaNs.
+    """
+    return convert_excel_dates(df).fillna("")
+
+
+def _filter_columns(df):
+    """
+    The columns the query filters look at; the rest of a streamed row is re-read for its page.
+    """
+    return df[[name for name in (CLAIM_NUMBER_COLUMN, STATUS_COLUMN, *DATE_COLUMNS) if name in df.columns]]
+
+
+class ClaimsIndex:
+    """
+    In-memory index of the claims rows of every workbook in a folder.
+
+    Each workbook is parsed once and kept as one normalised DataFrame per
+    sheet (columnar). Workbooks over WORKBOOK_STREAM_THRESHOLD_MB are read
+    chunk by chunk and only the filter columns of each chunk are kept; the
+    full rows of a page are read again from the file, one chunk at a time.
+    Filtering on a date_field outside DATE_COLUMNS finds no rows in those
+    workbooks. `refresh` only re-reads workbooks whose mtime changed and
+    drops deleted ones; `version` is bumped whenever the contents change.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.version = 0
+        self._workbooks = {}  # file name -> (mtime, [DataFrame per sheet or chunk], streamed)
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        with os.scandir(self.data_dir) as entries:
+            return {
+                entry.name: entry.stat().st_mtime
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(".xlsx") and not entry.name.startswith("~$")
+            }
+
+    def _load_workbook(self, path):
+        if should_stream(path):
+            # Each chunk is dropped as soon as its filter columns are taken
+            return [_normalise_sheet(_filter_columns(chunk)) for _, chunk in iter_sheet_chunks(path)], True
+        return [_normalise_sheet(df) for df in load_workbook_sheets(path).values()], False
+
+    def _read_rows(self, name, mtime, wanted):
+        """
+        Full rows of a streamed workbook, {chunk number: DataFrame}, for the
+        {chunk number: row positions} in `wanted`, in one pass over the file.
+
+        Positions are only valid for the file as it was indexed at `mtime`:
+        when it has been rewritten or removed since, nothing is returned and
+        the caller keeps the indexed filter columns until the next refresh.
+        """
+        path = os.path.join(self.data_dir, name)
+
+        def unchanged():
+            try:
+                return os.stat(path).st_mtime == mtime
+            except OSError:
+                return False
+
+        if not unchanged():
+            logger.warning("%s changed since it was indexed; returning its indexed columns only", name)
+            return {}
+        rows = {}
+        for number, (_, chunk) in enumerate(iter_sheet_chunks(path)):
+            if number in wanted:
+                rows[number] = _normalise_sheet(chunk.iloc[wanted[number]])
+                if len(rows) == len(wanted):
+                    break
+        # A rewrite while the rows were being read would mix two versions of the file
+        if not unchanged():
+            logger.warning("%s changed while its rows were read; returning its indexed columns only", name)
+            return {}
+        return rows
+
+    def refresh(self):
+        """
+        Brings the index in line with the folder; returns True when anything changed.
+        """
+        with self._lock:
+            on_disk = self._scan()
+            changed = False
+
+            for name in set(self._workbooks) - set(on_disk):
+                del self._workbooks[name]
+                changed = True
+
+            for name, mtime in on_disk.items():
+                cached = self._workbooks.get(name)
+                if cached and cached[0] == mtime:
+                    continue
+                try:
+                    self._workbooks[name] = (mtime, *self._load_workbook(os.path.join(self.data_dir, name)))
+                except Exception as e:
+                    # Half-written or locked files are retried on the next refresh
+                    logger.error("Could not index %s: %s", name, e)
+                    continue
+                changed = True
+
+            if changed:
+                self.version += 1
+            return changed
+
+    def has_column(self, name):
+        """
+        True when at least one indexed sheet has the column.
+        """
+        with self._lock:
+            return any(name in df.columns for _, frames, _ in self._workbooks.values() for df in frames)
+
+    def query(self, claim_number=None, status=None, date_from=None, date_to=None,
+              date_field=DEFAULT_DATE_FIELD, fields=None, offset=0, limit=None):
+        """
+        Filters, projects and pages the indexed rows.
+
+        Filters are applied column-wise to each sheet before any row dict is
+        built, so only the requested page is materialised. Dates compare as
+        YYYY-MM-DD strings. Returns (total matching rows, rows of the page).
+        The index is queried as it stands; call `refresh` first to pick up
+        changes on disk.
+        """
+        import pandas as pd
+
+        with self._lock:
+            mtimes = {name: entry[0] for name, entry in self._workbooks.items()}
+            frames = [
+                (name, number, df, self._workbooks[name][2])
+                for name in sorted(self._workbooks)
+                for number, df in enumerate(self._workbooks[name][1])
+            ]
+
+        def column(df, name):
+            return df[name].astype(str) if name in df.columns else pd.Series("", index=df.index)
+
+        matches = []
+        for name, number, df, streamed in frames:
+            mask = pd.Series(True, index=df.index)
+            if claim_number:
+                mask &= column(df, CLAIM_NUMBER_COLUMN) == claim_number
+            if status:
+                mask &= column(df, STATUS_COLUMN).str.lower() == status.lower()
+            if date_from or date_to:
+                dates = column(df, date_field)
+                # Blank or unconverted cells never match a date range
+                mask &= dates.str.match(r"^\d{4}-\d{2}-\d{2}$")
+                if date_from:
+                    mask &= dates >= date_from
+                if date_to:
+                    mask &= dates <= date_to
+            if mask.any():
+                matches.append((name, number, df[mask], streamed))
+
+        total = sum(len(df) for _, _, df, _ in matches)
+        selected = []
+        skip = offset
+        remaining = total if limit is None else limit
+        for name, number, df, streamed in matches:
+            if remaining <= 0:
+                break
+            if skip >= len(df):
+                skip -= len(df)
+                continue
+            selected.append((name, number, df.iloc[skip:skip + remaining], streamed))
+            skip = 0
+            remaining -= len(selected[-1][2])
+
+        # Streamed workbooks only hold the filter columns: read the page's full rows back
+        wanted = {}
+        for name, number, df, streamed in selected:
+            if streamed:
+                # Chunks keep their 0-based RangeIndex, so labels are row positions
+                wanted.setdefault(name, {})[number] = list(df.index)
+        full_rows = {name: self._read_rows(name, mtimes[name], chunks) for name, chunks in wanted.items()}
+
+        page = []
+        for name, number, chunk, streamed in selected:
+            if streamed:
+                # Only the filter columns when the file changed since it was indexed
+                chunk = full_rows[name].get(number, chunk)
+            if fields:
+                chunk = chunk[[field for field in fields if field in chunk.columns]]
+            # to_dict drops rows entirely when no requested column exists in this sheet
+            page.extend(chunk.to_dict(orient="records") if len(chunk.columns) else [{}] * len(chunk))
+        return total, page
@@ -0,0 +1,254 @@
+import os
+import re
+import logging
+from claim_context import DATA_DIR, load_cached
+from prompt_payload import JSONText, parse_json_text
+from workbook_loader import load_workbook_sheets
+
+logger = logging.getLogger("DecisionRules")
+
+DECISION_GRID_PATH = os.environ.get("DECISION_GRID_PATH", os.path.join(DATA_DIR, "Repre Decision Grid.xlsx"))
+# Set DECISION_RULES=0 to let the LLM pick the outcome again
+DECISION_RULES = os.environ.get("DECISION_RULES", "1") != "0"
+
+_SCENARIO_PATTERN = re.compile(r"^\s*Scenario\s*\d+\s*$", re.IGNORECASE)
+_YES = {"y", "yes", "true", "1"}
+_NO = {"n", "no", "false", "0"}
+
+# DRC note wording for the cardholder-side conditions of the grid. Each note sentence
+# is read on its own: a stated fact, its denial, or wording that leaves it open.
+_SENTENCE_SPLIT = re.compile(r"[.;!?\n]+")
+_NEGATION_PATTERN = re.compile(r"\b(?:not|never|yet|pending|awaiting|without|refuses?)\b|n't\b|\bno\b(?! longer)",
+                               re.IGNORECASE)
+_REVIEWED_PATTERN = re.compile(
+    r"\b(?:CH|cardholder)\b[^.\n]{0,40}\b(?:reviewed|has seen|acknowledged)\b[^.\n]{0,40}"
+    r"\b(?:merchant|rebuttal|representment|response)", re.IGNORECASE
+)
+_NOT_REVIEWED_PATTERN = re.compile(
+    r"\b(?:CH|cardholder)\b[^.\n]{0,40}(?:\b(?:not|never|yet to)\b|n't\b)\W+(?:\w+\W+){0,2}?"
+    r"(?:review(?:ed)?|seen|acknowledged)\b"
+    r"|\b(?:awaiting|pending)\b[^.\n]{0,20}\b(?:CH|cardholder)\b[^.\n]{0,20}\breview", re.IGNORECASE
+)
+# Sending or receiving the rebuttal says nothing about whether the cardholder read it
+_REVIEW_SENT_PATTERN = re.compile(
+    r"\b(?:CH|cardholder)\b[^.\n]{0,40}\b(?:received|was sent|sent|mailed|emailed)\b[^.\n]{0,40}"
+    r"\b(?:merchant|rebuttal|representment|response|letter)", re.IGNORECASE
+)
+_NO_LONGER_VALID_PATTERN = re.compile(
+    r"\bno longer (?:valid|disputing|wishes? to dispute)\b"
+    r"|\b(?:CH|cardholder)\b[^.\n]{0,40}\b(?:withdr[ae]w|withdrawn|cancell?ed|dropped|accepts?|agreed)\b"
+    r"[^.\n]{0,30}\b(?:dispute|claim|charge|chargeback)", re.IGNORECASE
+)
+_STILL_DISPUTED_PATTERN = re.compile(
+    r"\b(?:CH|cardholder)\b[^.\n]{0,40}(?:\b(?:not|never|refuses? to)\b|n't\b)\W+(?:\w+\W+){0,1}?"
+    r"(?:accept|agree|withdraw|drop)"
+    r"|\b(?:continue|continues|pursue|pursues|proceed with|still)\b[^.\n]{0,30}\b(?:dispute|disputing|claim|chargeback)",
+    re.IGNORECASE
+)
+_CREDIT_FIELD_PATTERN = re.compile(r"credit\w*\W+(?:\w+\W+)?amount|recovered\W+amount|refund\w*\W+amount", re.IGNORECASE)
+_AMOUNT_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value).strip()
+
+
+def _flag(value):
+    text = _cell(value).lower()
+    if text in _YES:
+        return True
+    if text in _NO:
+        return False
+    raise ValueError(f"Expected Y or N in decision grid, got {value!r}")
+
+
+class DecisionGrid:
+    """
+    The representment decision grid, compiled to a condition -> outcome table.
+
+    `conditions` are the grid's condition labels in row order; `table` maps
+    each tuple of Y/N answers (as booleans, same order) to its scenario name
+    and final decision recommendation.
+    """
+
+    def __init__(self, conditions, scenarios):
+        self.conditions = list(conditions)
+        self.scenarios = list(scenarios)  # (name, answers, outcome)
+        self.table = {}
+        for name, answers, outcome in self.scenarios:
+            if answers in self.table:
+                logger.warning("%s repeats the conditions of %s; keeping the first", name, self.table[answers][0])
+                continue
+            self.table[answers] = (name, outcome)
+
+    @property
+    def outcomes(self):
+        return list(dict.fromkeys(outcome for _, _, outcome in self.scenarios))
+
+    def evaluate(self, answers):
+        """
+        (scenario name, outcome) for {condition: bool}, or None when a condition
+        is unanswered or the combination is not in the grid.
+        """
+        key = tuple(answers.get(condition) for condition in self.conditions)
+        if None in key:
+            return None
+        return self.table.get(key)
+
+    def as_scenarios(self):
+        """
+        The grid in the {"Scenario n": {"Conditions", "Possible Outputs"}} shape.
+        """
+        return {
+            name: {
+                "Conditions": {condition: "Y" if answer else "N" for condition, answer in zip(self.conditions, answers)},
+                "Possible Outputs": [outcome],
+            }
+            for name, answers, outcome in self.scenarios
+        }
+
+
+def compile_decision_grid(grid_path):
+    """
+    Reads the grid workbook: a "Condition" header cell followed by "Scenario n"
+    columns, one Y/N row per condition, then the "Final Decision" row.
+    """
+    for df in load_workbook_sheets(grid_path).values():
+        rows = [[_cell(value) for value in df.columns]] + [[_cell(value) for value in row] for row in df.values.tolist()]
+        for header_index, header in enumerate(rows):
+            if not any(cell.lower() == "condition" for cell in header):
+                continue
+            label_column = next(i for i, cell in enumerate(header) if cell.lower() == "condition")
+            columns = [(i, cell) for i, cell in enumerate(header) if _SCENARIO_PATTERN.match(cell)]
+
+            conditions, answers = [], []
+            for row in rows[header_index + 1:]:
+                label = row[label_column]
+                if not label:
+                    continue
+                if label.lower().startswith("final decision"):
+                    scenarios = [
+                        (name, tuple(flags[i] for flags in answers), row[i])
+                        for i, name in columns
+                    ]
+                    logger.info("Compiled %d scenarios over %d conditions from %s",
+                                len(scenarios), len(conditions), grid_path)
+                    return DecisionGrid(conditions, scenarios)
+                conditions.append(label)
+                answers.append({i: _flag(row[i]) for i, _ in columns})
+    raise ValueError(f"No decision grid (Condition / Scenario n / Final Decision rows) in {grid_path}")
+
+
+def load_decision_grid(grid_path=None):
+    """
+    Compiled grid, recompiled only when the workbook changes on disk.
+    """
+    return load_cached("decision_rules", grid_path or DECISION_GRID_PATH, compile_decision_grid)
+
+
+def _amount(value):
+    match = _AMOUNT_PATTERN.search(str(value))
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+def _note_answer(text, stated, denied, unclear=None):
+    """
+    True when a note sentence states the condition, False when none does or
+    one denies it, and None when the notes are unclear or contradict each
+    other (a negation the patterns do not place, or only `unclear` wording),
+    so the decision is left to the LLM.
+    """
+    found = set()
+    for sentence in _SENTENCE_SPLIT.split(text):
+        if denied.search(sentence):
+            found.add(False)
+        elif stated.search(sentence):
+            found.add(None if _NEGATION_PATTERN.search(sentence.lower().replace("no longer", "")) else True)
+        elif unclear is not None and unclear.search(sentence):
+            found.add(None)
+    if not found:
+        return False
+    return found.pop() if len(found) == 1 else None
+
+
+def claim_conditions(grid, validation, regulatory):
+    """
+    Answers the grid's conditions from the ClaimValidationAgent and
+    RegulatoryAgent outputs, matched to the grid rows by keyword. A condition
+    that cannot be answered from them is left as None.
+    """
+    validation = validation if isinstance(validation, dict) else {}
+    regulatory = regulatory if isinstance(regulatory, dict) else {}
+    pdf_fields = validation.get("pdf_data") or {}
+    drc_fields = validation.get("drc_data") or {}
+    drc_text = "\n".join(str(value) for value in drc_fields.values())
+
+    missing = regulatory.get("missing_information")
+    major_mismatch = any(entry.get("significance") == "major" for entry in validation.get("mismatched_fields") or []
+                         if isinstance(entry, dict))
+    # The matcher's findings on the key evidence (e.g. no tracking number or proof of delivery)
+    findings = [finding for finding in validation.get("critical_findings") or [] if finding]
+    sufficient = None if not isinstance(missing, list) else not missing and not major_mismatch and not findings
+
+    disputed = None
+    for name in ("Dispute Amount", "Transaction Amount"):
+        for fields in (drc_fields, pdf_fields):
+            if disputed is None and name in fields:
+                disputed = _amount(fields[name])
+    credits = [
+        _amount(value)
+        for fields in (pdf_fields, drc_fields)
+        for key, value in fields.items()
+        if _CREDIT_FIELD_PATTERN.search(str(key))
+    ]
+    credited = max((credit for credit in credits if credit), default=0.0)
+    full_credit = None if disputed is None else credited > 0 and credited + 0.005 >= disputed
+
+    answers = {}
+    for condition in grid.conditions:
+        label = condition.lower()
+        if "sufficient" in label:
+            answers[condition] = sufficient
+        elif "reviewed" in label:
+            answers[condition] = _note_answer(drc_text, _REVIEWED_PATTERN, _NOT_REVIEWED_PATTERN,
+                                              _REVIEW_SENT_PATTERN)
+        elif "no longer valid" in label:
+            answers[condition] = _note_answer(drc_text, _NO_LONGER_VALID_PATTERN, _STILL_DISPUTED_PATTERN)
+        elif "credit" in label:
+            answers[condition] = full_credit
+        else:
+            answers[condition] = None
+    return answers
+
+
+def decide(validation_output, regulatory_output, grid=None):
+    """
+    Local DecisionAgent: answers the grid's conditions and looks the outcome
+    up. Returns the decision as JSON text, or None when some condition could
+    not be answered and the LLM has to decide instead.
+    """
+    grid = grid or load_decision_grid()
+    validation = parse_json_text(validation_output) if isinstance(validation_output, str) else validation_output
+    regulatory = parse_json_text(regulatory_output) if isinstance(regulatory_output, str) else regulatory_output
+    answers = claim_conditions(grid, validation, regulatory)
+    result = grid.evaluate(answers)
+    if result is None:
+        logger.info("Decision grid cannot decide: %s", {c: a for c, a in answers.items() if a is None})
+        return None
+
+    scenario, outcome = result
+    flags = {condition: "Y" if answer else "N" for condition, answer in answers.items()}
+    considered = [f"{condition}: {flag}" for condition, flag in flags.items()]
+    for entry in (validation or {}).get("mismatched_fields") or []:
+        considered.append(f"Mismatch in {entry.get('field_name')}: PDF {entry.get('pdf_value')} vs DRC {entry.get('drc_value')}")
+    for item in (regulatory or {}).get("missing_information") or []:
+        considered.append(f"Missing: {item}")
+    return JSONText({
+        "information_considered": considered,
+        "Final Decision recommendation": outcome,
+        "justification": f"{scenario} of the decision grid: " + "; ".join(considered[:len(flags)]),
+        "scenario": scenario,
+        "conditions": flags,
+    })
@@ -0,0 +1,175 @@
+import os
+import re
+import math
+import datetime
+
+# Text cells longer than this are treated as notes even outside a note column
+NOTE_MIN_CHARS = int(os.environ.get("DRC_NOTE_MIN_CHARS", "200"))
+# Left-over note text shorter than this is passed on verbatim instead of sent to the LLM
+DRC_RESIDUAL_MIN_CHARS = int(os.environ.get("DRC_RESIDUAL_MIN_CHARS", "80"))
+# A "Label: value" line only counts as a field when the value is this short
+MAX_FIELD_VALUE_CHARS = 120
+# Part of the DRC extraction's checkpoint key: bump it whenever pre_extract's output changes
+PRE_EXTRACT_VERSION = 1
+
+_NOTE_COLUMN_PATTERN = re.compile(r"note", re.IGNORECASE)
+_FIELD_LINE_PATTERN = re.compile(r"^\s*([A-Za-z][A-Za-z0-9 #/&().'-]{0,59}?)\s*:\s*(\S.*?)\s*$")
+
+_DATE_PATTERNS = [
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), lambda m: (m[3], m[1], m[2])),  # MM/DD/YYYY
+    (re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"), lambda m: (m[1], m[2], m[3])),
+]
+_MONTH_DATE_PATTERN = re.compile(
+    r"\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b", re.IGNORECASE
+)
+_MONTHS = {name: i for i, name in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1
+)}
+_AMOUNT_PATTERNS = [
+    (re.compile(r"\$\s?(\d[\d,]*(?:\.\d{1,2})?)"), "USD"),
+    (re.compile(r"\b(\d[\d,]*\.\d{2})\s?(USD|EUR|GBP|CAD|AUD)\b"), None),
+    (re.compile(r"\b(USD|EUR|GBP|CAD|AUD)\s?(\d[\d,]*(?:\.\d{1,2})?)\b"), None),
+]
+# Acquirer reference numbers are 23 digits
+_ARN_PATTERN = re.compile(r"(?<!\d)\d{23}(?!\d)")
+_TRANSACTION_ID_PATTERN = re.compile(
+    r"\b(?:Tran(?:saction)?|TXN)\s*ID\s*[:#]?\s*((?=[A-Z]*\d)[A-Z0-9]{6,})", re.IGNORECASE
+)
+_TRACKING_PATTERNS = [
+    re.compile(r"\b1Z[0-9A-Z]{16}\b"),  # UPS
+    re.compile(r"(?<!\d)9[2-5]\d{20}(?!\d)"),  # USPS
+    re.compile(r"\bTracking\s*(?:#|No\.?|Number)?[^:\n]{0,20}:\s*((?=[A-Z]*\d)[A-Z0-9]{8,})", re.IGNORECASE),
+]
+_ORDER_PATTERN = re.compile(r"\bOrder\s*(?:#|No\.?|Number)?\s*[:#]?\s*((?=[A-Z-]*\d)[A-Z0-9-]{6,})", re.IGNORECASE)
+
+
+def _is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    try:
+        return bool(value != value)  # pandas NaT
+    except Exception:
+        return False
+
+
+def _plain(value):
+    """
+    JSON-friendly version of a typed cell: dates as YYYY-MM-DD, numpy scalars as Python numbers.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _iso_date(year, month, day):
+    try:
+        return datetime.date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def _unique(values):
+    return list(dict.fromkeys(value for value in values if value))
+
+
+def extract_entities(text):
+    """
+    Dates, amounts, ARNs, transaction IDs, tracking and order numbers found in free text.
+    Only the kinds that occur are returned.
+    """
+    dates = [_iso_date(*to_parts(m)) for pattern, to_parts in _DATE_PATTERNS for m in pattern.finditer(text)]
+    dates += [_iso_date(m[3], _MONTHS[m[1][:3].lower()], m[2]) for m in _MONTH_DATE_PATTERN.finditer(text)]
+
+    amounts = []
+    for pattern, currency in _AMOUNT_PATTERNS:
+        for m in pattern.finditer(text):
+            if currency:
+                number, code = m[1], currency
+            elif m[1][0].isdigit():
+                number, code = m[1], m[2]
+            else:
+                code, number = m[1], m[2]
+            amounts.append(f"{number.replace(',', '')} {code.upper()}")
+
+    entities = {
+        "dates": _unique(dates),
+        "amounts": _unique(amounts),
+        "arns": _unique(_ARN_PATTERN.findall(text)),
+        "transaction_ids": _unique(_TRANSACTION_ID_PATTERN.findall(text)),
+        "tracking_numbers": _unique(m for pattern in _TRACKING_PATTERNS for m in pattern.findall(text)),
+        "order_numbers": _unique(_ORDER_PATTERN.findall(text)),
+    }
+    return {kind: found for kind, found in entities.items() if found}
+
+
+def extract_note(text):
+    """
+    Splits a note into ("Label: value" fields plus entities, remaining narrative text).
+    """
+    fields = {}
+    narrative = []
+    for line in text.splitlines():
+        match = _FIELD_LINE_PATTERN.match(line)
+        if match and len(match[2]) <= MAX_FIELD_VALUE_CHARS:
+            fields[match[1].strip()] = match[2]
+        elif line.strip():
+            narrative.append(line.strip())
+
+    extracted = dict(fields)
+    entities = extract_entities(text)
+    if entities:
+        extracted["entities"] = entities
+    return extracted, "\n".join(narrative)
+
+
+def pre_extract(sheets):
+    """
+    Deterministic pass over the DRC sheets, before any LLM call.
+
+    `sheets` is {sheet: [row]} or an iterable of (sheet, [row]) chunks, such
+    as iter_workbook_records yields; each chunk is only read once. Typed cells
+    (numbers, dates, short text) are copied over as they are; note cells are
+    reduced to their labelled fields and recognised entities.
+    Returns ({sheet: [row]}, residual), where residual lists the note text
+    that still needs reading as {"sheet", "column", "text"} entries.
+    """
+    structured = {}
+    residual = []
+    for sheet_name, rows in sheets.items() if isinstance(sheets, dict) else sheets:
+        out_rows = []
+        for row in rows:
+            out = {}
+            for column, value in row.items():
+                if _is_blank(value):
+                    continue
+                column = str(column)
+                if isinstance(value, str) and (_NOTE_COLUMN_PATTERN.search(column) or len(value) > NOTE_MIN_CHARS):
+                    extracted, narrative = extract_note(value)
+                    if extracted:
+                        out[column] = extracted
+                    if narrative:
+                        residual.append({"sheet": sheet_name, "column": column, "text": narrative})
+                else:
+                    out[column] = _plain(value)
+            if out:
+                out_rows.append(out)
+        if out_rows:
+            structured.setdefault(sheet_name, []).extend(out_rows)
+    return structured, residual
+
+
+def needs_llm(residual):
+    """
+    True when the residual note text is long enough to be worth an LLM round-trip.
+    """
+    return sum(len(entry["text"]) for entry in residual) >= DRC_RESIDUAL_MIN_CHARS
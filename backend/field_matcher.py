@@ -0,0 +1,354 @@
+import os
+import re
+import logging
+import datetime
+from difflib import SequenceMatcher
+from functools import lru_cache
+from drc_extract import extract_note
+from llm_client import LLMRequestError, chat_completion
+from prompt_payload import JSONText, encode_payload, parse_json_text
+
+logger = logging.getLogger("FieldMatcher")
+
+# Set LOCAL_FIELD_MATCHING=0 to hand the whole comparison back to the LLM
+LOCAL_FIELD_MATCHING = os.environ.get("LOCAL_FIELD_MATCHING", "1") != "0"
+# Label similarity needed to treat two differently named fields as the same field
+NAME_MATCH_CUTOFF = float(os.environ.get("FIELD_NAME_MATCH_CUTOFF", "0.9"))
+# Text values at least this similar match; between AMBIGUOUS_CUTOFF and this the LLM decides
+TEXT_MATCH_CUTOFF = float(os.environ.get("FIELD_TEXT_MATCH_CUTOFF", "0.9"))
+AMBIGUOUS_CUTOFF = float(os.environ.get("FIELD_AMBIGUOUS_CUTOFF", "0.6"))
+# Amount differences below this are reported as minor
+MINOR_AMOUNT_DIFFERENCE = 1.0
+
+# Canonical field -> (value type, names it goes by in the OCR text and the DRC export)
+FIELDS = {
+    "Transaction Date": ("date", ["Transaction Date", "Tran Date", "Trans Date", "TransDate", "Txn Date"]),
+    "Post Date": ("date", ["Post Date", "Posting Date", "Processing Date"]),
+    "Chargeback Date": ("date", ["Chargeback Date", "Chargeback CPD", "CB Date"]),
+    "Transaction Amount": ("amount", ["Transaction Amount", "Tran Amount", "Txn Amount"]),
+    "Dispute Amount": ("amount", ["Dispute Amount", "Disputed Amount", "Disputed TXN Amount"]),
+    "Acquirer Reference Number": ("arn", ["Acquirer Reference Number", "ARN", "Reference Number", "Acquirer Ref Number"]),
+    "Transaction Identifier": ("id", ["Transaction Identifier", "Transaction ID", "Tran ID", "TXN ID"]),
+    "Merchant Name": ("text", ["Merchant Name", "Merchant"]),
+    "Merchant Category Code": ("number", ["Merchant Category Code", "MCC"]),
+    "Dispute Reason Code": ("code", ["Dispute Category/Condition", "Disp Cat Con", "Dispute Category Condition"]),
+    "Order Number": ("ref", ["Order Number", "Order", "Order #"]),
+    "Tracking Number": ("ref", ["Tracking Number", "Tracking #", "Tracking #/Provider"]),
+    "Cardholder Name": ("text", ["Cardholder Name", "CH Name"]),
+}
+# Fields whose mismatch decides a representment on its own
+CRITICAL_FIELDS = ("Transaction Date", "Transaction Amount", "Dispute Amount", "Acquirer Reference Number",
+                   "Dispute Reason Code")
+# Entity lists produced by drc_extract, by canonical field
+ENTITY_FIELDS = {"arns": "Acquirer Reference Number", "transaction_ids": "Transaction Identifier",
+                 "tracking_numbers": "Tracking Number", "order_numbers": "Order Number"}
+
+_VALUE_PATTERNS = {
+    "date": r"\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}",
+    "amount": r"\d[\d,]*\.\d{2}",
+    "arn": r"(?:\d[ -]?){22}\d",
+    "id": r"\d{6,}",
+    "number": r"\d{2,}",
+    "code": r"\d{1,2}[.,]\d{1,2}",
+    "ref": r"(?=[A-Z0-9-]*\d)[A-Z0-9][A-Z0-9-]{5,}",
+}
+# Abbreviations expanded before names are compared
+_ABBREVIATIONS = {"txn": "transaction", "tran": "transaction", "trans": "transaction", "cb": "chargeback",
+                  "ch": "cardholder", "amt": "amount", "ref": "reference", "no": "number", "num": "number",
+                  "disp": "dispute", "cat": "category", "con": "condition", "fld": ""}
+_QUESTION_PATTERN = re.compile(r"^\s*[‘'\"]?(.{10,200}?\?)\s*(Yes|No)\s*$", re.IGNORECASE)
+_LABEL_COLON_PATTERN = re.compile(r":(?:\s|$)")
+
+
+def normalise_name(name):
+    """
+    Lower-case words of a field name with the usual abbreviations spelled out.
+    """
+    words = re.findall(r"[a-z0-9]+", str(name).lower())
+    return " ".join(word for word in (_ABBREVIATIONS.get(word, word) for word in words) if word)
+
+
+_ALIASES = {normalise_name(alias): field for field, (_, aliases) in FIELDS.items() for alias in aliases}
+
+
+@lru_cache(maxsize=4096)
+def canonical_field(name):
+    """
+    Canonical field a column or label refers to, by alias table and then by similarity.
+    """
+    normalised = normalise_name(name)
+    if normalised in _ALIASES:
+        return _ALIASES[normalised]
+    best, score = None, 0.0
+    for alias, field in _ALIASES.items():
+        ratio = SequenceMatcher(None, normalised, alias).ratio()
+        if ratio > score:
+            best, score = field, ratio
+    return best if score >= NAME_MATCH_CUTOFF else None
+
+
+def normalise_value(kind, value):
+    """
+    Comparable form of a value of the given type, or None when it does not hold one.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.strftime("%Y-%m-%d")
+    text = str(value).strip()
+    if kind == "text":
+        text = " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+        return text or None
+    if kind in ("number", "id", "arn") and isinstance(value, (int, float)) and float(value).is_integer():
+        text = str(int(value))
+    match = re.search(_VALUE_PATTERNS[kind], text) if kind != "ref" else re.search(_VALUE_PATTERNS[kind], text.upper())
+    if not match:
+        return None
+    found = match.group(0)
+    if kind == "date":
+        for fmt in ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d"):
+            try:
+                return datetime.datetime.strptime(found, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+        return None
+    if kind == "amount":
+        return f"{float(found.replace(',', '')):.2f}"
+    if kind in ("arn", "id", "number"):
+        return re.sub(r"\D", "", found).lstrip("0") or "0"
+    if kind == "code":
+        return found.replace(",", ".")
+    return found
+
+
+def _flatten(value, prefix=""):
+    """
+    Dot-notation key -> value pairs; single-row sheets lose their list index.
+    """
+    if isinstance(value, dict):
+        pairs = {}
+        for key, item in value.items():
+            pairs.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return pairs
+    if isinstance(value, list):
+        if len(value) == 1 and isinstance(value[0], dict):
+            return _flatten(value[0], prefix)
+        if value and all(isinstance(item, dict) for item in value):
+            pairs = {}
+            for i, item in enumerate(value, 1):
+                pairs.update(_flatten(item, f"{prefix}[{i}]"))
+            return pairs
+    return {prefix: value}
+
+
+def _typed_part(kind, raw):
+    """
+    Just the date, amount, code or ID out of a longer OCR value.
+    """
+    if kind == "text":
+        return raw
+    match = re.search(_VALUE_PATTERNS[kind], raw if kind != "ref" else raw.upper())
+    return match.group(0) if match else raw
+
+
+def _cut_at_next_label(value):
+    """
+    Drops a following "Label:" that OCR ran into the same line as the value.
+    """
+    value = re.split(r"\s{2,}", value.strip(), maxsplit=1)[0]
+    colon = _LABEL_COLON_PATTERN.search(value)
+    if not colon:
+        return value
+    words = value[:colon.start()].split()
+    # The label is the last word before the colon, or the last two when both are capitalised
+    label_words = 2 if len(words) > 2 and words[-2][:1].isupper() else 1
+    return " ".join(words[:-label_words])
+
+
+def _pdf_text(pdf_data):
+    if isinstance(pdf_data, dict):
+        return str(pdf_data.get("extracted_text") or "")
+    return str(pdf_data or "")
+
+
+def _search_text(text, field):
+    """
+    Finds a field in OCR text by its aliases, followed by a value of the right type.
+    """
+    kind, aliases = FIELDS[field]
+    for alias in sorted(aliases, key=len, reverse=True):
+        label = r"\b" + r"\s*".join(map(re.escape, alias.split())) + r"(?![A-Za-z])"
+        if kind == "text":
+            pattern = label + r"[^\S\n]*:[^\S\n]*([^\n]+)"
+        else:
+            # Up to 15 non-digit characters between label and value, e.g. " (MM/DD/YY): "
+            pattern = label + r"[^\n\d]{0,15}?(" + _VALUE_PATTERNS[kind] + r")"
+        for match in re.finditer(pattern, text, re.IGNORECASE if kind != "ref" else 0):
+            raw = match.group(1)
+            if kind == "text":
+                raw = _cut_at_next_label(raw)
+            if normalise_value(kind, raw):
+                return raw
+    return None
+
+
+def extract_pdf_fields(pdf_data):
+    """
+    Labelled values of the merchant's response: {label: raw value}, with known
+    fields under their canonical names.
+    """
+    text = _pdf_text(pdf_data)
+    fields = {}
+    labelled, _ = extract_note(text)
+    labelled.pop("entities", None)
+    for line in text.splitlines():
+        match = _QUESTION_PATTERN.match(line)
+        if match:
+            labelled[match[1].strip()] = match[2].capitalize()
+
+    for label, raw in labelled.items():
+        # OCR often runs several "Label: value" pairs into one line
+        raw = _cut_at_next_label(raw)
+        if not raw:
+            continue
+        field = canonical_field(label)
+        if field and field not in fields and normalise_value(FIELDS[field][0], raw):
+            fields[field] = _typed_part(FIELDS[field][0], raw)
+        elif not field:
+            fields.setdefault(label, raw)
+    for field in FIELDS:
+        if field not in fields:
+            raw = _search_text(text, field)
+            if raw is not None:
+                fields[field] = raw
+    return fields
+
+
+def extract_drc_fields(drc_data):
+    """
+    DRC extraction flattened to {field: value}, with known fields under their canonical names.
+    """
+    if isinstance(drc_data, str):
+        drc_data = parse_json_text(drc_data) or {"DRC Data": drc_data}
+    fields = {}
+    for key, value in _flatten(drc_data).items():
+        name = str(key.rsplit(".", 1)[-1])
+        if name in ENTITY_FIELDS and isinstance(value, list):
+            field = ENTITY_FIELDS[name]
+            if value and field not in fields:
+                fields[field] = value[0]
+            continue
+        field = canonical_field(name)
+        if field and normalise_value(FIELDS[field][0], value):
+            fields.setdefault(field, value)
+        else:
+            fields[key] = value
+    return fields
+
+
+def _compare(field, kind, pdf_value, drc_value):
+    """
+    ("matched" | "mismatched" | "ambiguous", entry) for one field found in both sources.
+    """
+    pdf_norm, drc_norm = normalise_value(kind, pdf_value), normalise_value(kind, drc_value)
+    entry = {"field_name": field, "pdf_value": pdf_value, "drc_value": drc_value}
+    if pdf_norm == drc_norm:
+        same_text = str(pdf_value).strip() == str(drc_value).strip()
+        return "matched", {**entry, "notes": "Exact match" if same_text else "Match after normalization"}
+
+    if kind == "text":
+        ratio = SequenceMatcher(None, pdf_norm or "", drc_norm or "").ratio()
+        if ratio >= TEXT_MATCH_CUTOFF:
+            return "matched", {**entry, "notes": f"Near match after normalization ({ratio:.2f})"}
+        if ratio >= AMBIGUOUS_CUTOFF:
+            return "ambiguous", entry
+
+    if kind == "amount" and pdf_norm and drc_norm:
+        difference = abs(float(pdf_norm) - float(drc_norm))
+        significance = "minor" if difference < MINOR_AMOUNT_DIFFERENCE else "major"
+        return "mismatched", {**entry, "discrepancy": f"{difference:.2f}", "significance": significance}
+    if kind == "date" and pdf_norm and drc_norm:
+        days = abs((datetime.date.fromisoformat(pdf_norm) - datetime.date.fromisoformat(drc_norm)).days)
+        return "mismatched", {**entry, "discrepancy": f"{days} days", "significance": "major"}
+    return "mismatched", {**entry, "discrepancy": f"{pdf_norm} vs {drc_norm}", "significance": "major"}
+
+
+_RESOLVE_INSTRUCTIONS = (
+    "For each field in the user message, decide whether the PDF value and the DRC value state the same fact.\n"
+    "Return only JSON: {\"matched_fields\": [{\"field_name\", \"pdf_value\", \"drc_value\", \"notes\"}], "
+    "\"mismatched_fields\": [{\"field_name\", \"pdf_value\", \"drc_value\", \"discrepancy\", \"significance\"}]}\n"
+    "Use significance \"minor\" or \"major\". Do not add fields that are not listed."
+)
+
+
+def _resolve_ambiguous(ambiguous):
+    """
+    Asks the LLM about the field pairs the local rules could not decide.
+    """
+    prompt = f"Fields:\n{encode_payload(ambiguous)}"
+    reply = parse_json_text(chat_completion(prompt, system=_RESOLVE_INSTRUCTIONS))
+    if not isinstance(reply, dict):
+        raise ValueError("LLM reply is not a JSON object")
+    matched, mismatched = reply.get("matched_fields") or [], reply.get("mismatched_fields") or []
+    for entries in (matched, mismatched):
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+            raise TypeError("LLM reply fields are not lists of objects")
+    return matched, mismatched
+
+
+def match_claim(pdf_data, drc_data):
+    """
+    Field-by-field comparison of the merchant's response and the DRC extraction.
+
+    Returns the ClaimValidationAgent JSON shape (pdf_data, drc_data,
+    matched_fields, mismatched_fields, missing_fields, critical_findings).
+    Dates, amounts, codes and IDs are compared after normalisation; only text
+    values that are similar but not clearly equal are sent to the LLM.
+    """
+    pdf_fields = extract_pdf_fields(pdf_data)
+    drc_fields = extract_drc_fields(drc_data)
+
+    matched, mismatched, ambiguous = [], [], []
+    for field, (kind, _) in FIELDS.items():
+        if field in pdf_fields and field in drc_fields:
+            outcome, entry = _compare(field, kind, pdf_fields[field], drc_fields[field])
+            {"matched": matched, "mismatched": mismatched, "ambiguous": ambiguous}[outcome].append(entry)
+
+    if ambiguous:
+        try:
+            llm_matched, llm_mismatched = _resolve_ambiguous(ambiguous)
+            matched.extend(llm_matched)
+            mismatched.extend(llm_mismatched)
+        except LLMRequestError:
+            # The request itself failed: let the agent fail rather than mark every field for review
+            raise
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.error("Could not resolve %d ambiguous fields: %s", len(ambiguous), e)
+            mismatched.extend({**entry, "discrepancy": "needs review", "significance": "unknown"} for entry in ambiguous)
+
+    findings = [
+        f"{entry['field_name']} differs: PDF {entry['pdf_value']} vs DRC {entry['drc_value']}"
+        for entry in mismatched
+        if entry.get("field_name") in CRITICAL_FIELDS and entry.get("significance") != "minor"
+    ]
+    if "Tracking Number" not in pdf_fields and "Tracking Number" not in drc_fields:
+        findings.append("No tracking number or proof of delivery in either source")
+
+    return {
+        "pdf_data": pdf_fields,
+        "drc_data": drc_fields,
+        "matched_fields": matched,
+        "mismatched_fields": mismatched,
+        "missing_fields": {
+            "pdf_missing": [field for field in FIELDS if field in drc_fields and field not in pdf_fields],
+            "drc_missing": [field for field in FIELDS if field in pdf_fields and field not in drc_fields],
+        },
+        "critical_findings": findings,
+    }
+
+
+def match_claim_json(pdf_data, drc_data):
+    """
+    match_claim as the JSON text the agents pass to each other.
+    """
+    return JSONText(match_claim(pdf_data, drc_data))
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from flask import Blueprint, current_app, jsonify, request
+from claim_context import ClaimContext
+
+logger = logging.getLogger("JobQueue")
+
+# Shared by the web tier and every worker process; put it on a local disk
+JOB_QUEUE_DB = os.environ.get(
+    "JOB_QUEUE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_queue.sqlite3")
+)
+# A running job whose worker has not renewed its lease for this long is handed to another worker
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# Delay before a failed job is tried again, doubled on each attempt
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", "30"))
+JOB_MAX_CLAIMS = int(os.environ.get("JOB_MAX_CLAIMS", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    claim_id TEXT NOT NULL,
+    data_dir TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (claim_id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    output TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    PRIMARY KEY (job_id, agent)
+);
+"""
+
+
+class JobQueue:
+    """
+    Durable queue of representment jobs in a sqlite database.
+
+    Jobs go from queued to running when a worker claims them, which gives the
+    worker a lease it keeps renewing. Each agent output is checkpointed as it
+    finishes, so when a worker dies its job is claimed again after the lease
+    runs out and resumes after the last finished agent. Failed attempts are
+    retried with a growing delay up to `max_attempts`.
+
+    Safe to share between threads; every process opens its own connections.
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_DB, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_delay=JOB_RETRY_DELAY):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit; writes that must be atomic go through _transaction()
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self):
+        return _Transaction(self._db())
+
+    def enqueue(self, claim_id, data_dir=None):
+        """
+        Adds a job for one claim and returns its ID.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._db().execute(
+            "INSERT INTO jobs (job_id, claim_id, data_dir, status, available_at, created_at)"
+            " VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, claim_id, data_dir, now, now),
+        )
+        return job_id
+
+    def claim(self, worker):
+        """
+        Leases the oldest runnable job to `worker`; returns the job row or None.
+
+        Runnable means queued and due, or running with an expired lease (its
+        worker died). Jobs that lost their worker too often are failed here.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = COALESCE(error, 'Worker lost')"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT job_id FROM jobs"
+                " WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY available_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                " started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+                (worker, now + self.lease_seconds, now, row["job_id"]),
+            )
+            return dict(db.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone())
+
+    def renew(self, job_id, worker):
+        """
+        Extends the lease; False when the job is no longer this worker's.
+        """
+        cursor = self._db().execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, job_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def save_checkpoint(self, job_id, agent, output):
+        self._db().execute(
+            "INSERT OR REPLACE INTO checkpoints (job_id, agent, output, finished_at) VALUES (?, ?, ?, ?)",
+            (job_id, agent, json.dumps(output), time.time()),
+        )
+
+    def checkpoints(self, job_id):
+        """
+        {agent: output} of every agent the job has finished so far.
+        """
+        rows = self._db().execute(
+            "SELECT agent, output FROM checkpoints WHERE job_id = ? ORDER BY finished_at", (job_id,)
+        ).fetchall()
+        return {row["agent"]: json.loads(row["output"]) for row in rows}
+
+    def complete(self, job_id, worker, result):
+        self._db().execute(
+            "UPDATE jobs SET status = 'completed', finished_at = ?, result = ?, error = NULL, lease_until = NULL"
+            " WHERE job_id = ? AND worker = ?",
+            (time.time(), json.dumps(result), job_id, worker),
+        )
+
+    def fail(self, job_id, worker, error, retry=True):
+        """
+        Records a failed attempt; the job is queued again unless it is out of attempts.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts FROM jobs WHERE job_id = ? AND worker = ?", (job_id, worker)).fetchone()
+            if row is None:
+                return
+            if retry and row["attempts"] < self.max_attempts:
+                delay = self.retry_delay * 2 ** (row["attempts"] - 1)
+                db.execute(
+                    "UPDATE jobs SET status = 'queued', available_at = ?, error = ?, lease_until = NULL"
+                    " WHERE job_id = ?",
+                    (now + delay, error, job_id),
+                )
+                logger.warning("Job %s failed (attempt %d), retrying in %.0fs: %s", job_id, row["attempts"], delay, error)
+            else:
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ?, lease_until = NULL"
+                    " WHERE job_id = ?",
+                    (now, error, job_id),
+                )
+                logger.error("Job %s failed: %s", job_id, error)
+
+    def get(self, job_id):
+        """
+        The job as a dict, with the agents finished so far; None if unknown.
+        """
+        db = self._db()
+        row = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        agents = [r["agent"] for r in db.execute(
+            "SELECT agent FROM checkpoints WHERE job_id = ? ORDER BY finished_at", (job_id,)
+        )]
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["completed_agents"] = agents
+        return job
+
+    def counts(self):
+        rows = self._db().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+
+class _Transaction:
+    """
+    `with` block around one sqlite connection: BEGIN IMMEDIATE, then COMMIT or ROLLBACK.
+
+    IMMEDIATE takes the write lock up front, so two workers can never claim the same job.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """
+    Process-wide queue, created on first use so importing the app touches no database.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+def submit_jobs():
+    """
+    Queues {"claim_id": ...} or {"claim_ids": [...]} for the worker processes (job_worker.py).
+    """
+    body = request.get_json(silent=True) or {}
+    claim_ids = body.get("claim_ids") or ([body["claim_id"]] if body.get("claim_id") else None)
+    if not isinstance(claim_ids, list) or not claim_ids:
+        return jsonify({"success": False, "error": "claim_id or claim_ids must be provided"}), 400
+    if len(claim_ids) > JOB_MAX_CLAIMS:
+        return jsonify({"success": False, "error": f"At most {JOB_MAX_CLAIMS} claims per request"}), 400
+
+    data_dir = current_app.config.get("DATA_DIR")
+    jobs = []
+    for claim_id in dict.fromkeys(str(claim_id) for claim_id in claim_ids):
+        try:
+            ClaimContext(claim_id, data_dir)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        jobs.append(claim_id)
+
+    queue = get_queue()
+    job_ids = [queue.enqueue(claim_id, data_dir) for claim_id in jobs]
+    logger.info("Queued %d jobs", len(job_ids))
+    return jsonify({
+        "success": True,
+        "jobs": [
+            {"claim_id": claim_id, "job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+            for claim_id, job_id in zip(jobs, job_ids)
+        ],
+    }), 202
+
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_queue().get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown job ID"}), 404
+    job.pop("data_dir", None)
+    return jsonify({"success": True, **job})
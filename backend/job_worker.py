@@ -0,0 +1,141 @@
+"""
+Worker processes for the durable job queue (job_queue.py).
+
+Each process claims jobs, runs the representment agent chain and checkpoints
+every agent's output. A job whose worker dies is picked up again once its
+lease expires and resumes after the last finished agent, so a restart loses
+at most the agent that was running. The supervisor restarts processes that
+exit unexpectedly. Scale with --processes independently of the web tier.
+
+Usage (from the backend folder):
+    python job_worker.py [--processes 2] [--threads 4]
+"""
+import os
+import time
+import socket
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+
+logger = logging.getLogger("JobWorker")
+
+JOB_WORKER_PROCESSES = int(os.environ.get("JOB_WORKER_PROCESSES", "2"))
+# Claims run concurrently inside each process; the work is mostly waiting on the LLM
+JOB_WORKER_THREADS = int(os.environ.get("JOB_WORKER_THREADS", "4"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+
+
+def _keep_lease(queue, job_id, worker, done):
+    while not done.wait(queue.lease_seconds / 3):
+        if not queue.renew(job_id, worker):
+            logger.warning("%s lost the lease on job %s", worker, job_id)
+            return
+
+
+def run_job(queue, job, worker):
+    """
+    Runs one claimed job to completion, failure or retry.
+    """
+    from agent_graph import AgentGraphError
+    from claim_context import ClaimContext
+    from RegulatoryAgent import run_representment_pipeline
+
+    job_id = job["job_id"]
+    done = threading.Event()
+    threading.Thread(target=_keep_lease, args=(queue, job_id, worker, done), daemon=True).start()
+    try:
+        claim_ctx = ClaimContext(job["claim_id"], job["data_dir"])
+        if not claim_ctx.exists():
+            queue.fail(job_id, worker, "Files for given claim ID not found", retry=False)
+            return
+
+        completed = queue.checkpoints(job_id)
+        logger.info("%s running job %s for claim %s (attempt %d%s)", worker, job_id, job["claim_id"],
+                    job["attempts"], f", resuming after {', '.join(completed)}" if completed else "")
+        result = run_representment_pipeline(
+            claim_ctx,
+            completed=completed,
+            on_result=lambda agent, output: queue.save_checkpoint(job_id, agent, output),
+        )
+        queue.complete(job_id, worker, result)
+    except AgentGraphError as e:
+        # The finished agents are checkpointed; the retry runs only the rest
+        queue.fail(job_id, worker, str(e))
+    except ValueError as e:
+        queue.fail(job_id, worker, str(e), retry=False)
+    except Exception as e:
+        logger.exception("Job %s crashed", job_id)
+        queue.fail(job_id, worker, str(e))
+    finally:
+        done.set()
+
+
+def worker_loop(name, stop):
+    """
+    Claims and runs jobs until `stop` is set.
+    """
+    from job_queue import JobQueue
+
+    queue = JobQueue()
+    while not stop.is_set():
+        job = queue.claim(name)
+        if job is None:
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+        run_job(queue, job, name)
+
+
+def worker_process(index, threads, stop):
+    """
+    Entry point of one worker process: `threads` claim loops sharing its LLM client.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+    # The supervisor handles Ctrl+C; leave the running jobs to finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    base = f"{socket.gethostname()}-{os.getpid()}"
+    loops = [
+        threading.Thread(target=worker_loop, args=(f"{base}-{i}", stop), name=f"job-{i}")
+        for i in range(threads)
+    ]
+    for loop in loops:
+        loop.start()
+    for loop in loops:
+        loop.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES)
+    parser.add_argument("--threads", type=int, default=JOB_WORKER_THREADS, help="concurrent jobs per process")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+
+    def start(index):
+        process = context.Process(target=worker_process, args=(index, args.threads, stop), name=f"worker-{index}")
+        process.start()
+        return process
+
+    processes = [start(i) for i in range(args.processes)]
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    logger.info("Started %d worker processes with %d threads each", args.processes, args.threads)
+    try:
+        while not stop.is_set():
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning("%s exited with code %s; restarting", process.name, process.exitcode)
+                    processes[i] = start(i)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+    logger.info("Stopping; waiting for running jobs to finish")
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
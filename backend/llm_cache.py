@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# In-memory tier: number of responses kept (0 disables caching) and their lifetime
+CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+# Optional on-disk tier shared across restarts, e.g. LLM_CACHE_DB=llm_cache.sqlite3
+CACHE_DB = os.environ.get("LLM_CACHE_DB")
+CACHE_DB_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_DB_MAX_ENTRIES", "20000"))
+
+
+def cache_key(model, messages, params):
+    """
+    Content address of a chat-completions request: a hash of model, messages and parameters.
+    """
+    canonical = json.dumps({"model": model, "messages": messages, "params": params},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier LLM response cache.
+
+    Responses live in an LRU dict in memory and, when `db_path` is set, in a
+    sqlite table that survives restarts. Both tiers expire entries after
+    `ttl` seconds and evict the least recently used ones past their size limit.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, db_path=CACHE_DB,
+                 max_db_entries=CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self.counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self._db is not None
+
+    def _expired(self, stored_at, now):
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry[0], now):
+                    del self._memory[key]
+                    self.counters["expired"] += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if self._expired(row[1], now):
+                        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        self._db.commit()
+                        self.counters["expired"] += 1
+                    else:
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(row[0])
+                        self._remember(key, row[1], value)
+                        self.counters["hits"] += 1
+                        self.counters["disk_hits"] += 1
+                        return value
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                self._prune_db(now)
+                self._db.commit()
+
+    def _remember(self, key, stored_at, value):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _prune_db(self, now):
+        if self.ttl > 0:
+            self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_db_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self.counters["evictions"] += excess
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """
+        Hit/miss counters plus the current number of entries in memory.
+        """
+        with self._lock:
+            return {**self.counters, "entries": len(self._memory)}
@@ -0,0 +1,408 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from llm_cache import ResponseCache, cache_key
+from llm_scheduler import CircuitOpenError, RequestScheduler
+from metrics import track_call
+
+logger = logging.getLogger("LLMClient")
+
+# Azure OpenAI chat-completions deployment shared by every agent
+API_URL = os.environ.get(
+    "AZURE_OPENAI_URL",
+    "https://innovate-openai-api-mgt.azure-api.net/innovate-tracked/deployments/gpt-4o-mini/chat/completions?api-version=2024-02-01",
+)
+API_KEY = os.environ.get("AZURE_OPENAI_API_KEY", "5002951037784ef8b91050d692a62318")  # Better to use environment variable
+MODEL = os.environ.get("AZURE_OPENAI_MODEL", "gpt-4o-mini")
+
+# Connection pool settings
+POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "120"))
+USE_HTTP2 = os.environ.get("LLM_HTTP2", "").lower() in ("1", "true", "yes")
+# Process-wide cap on concurrent chat-completions requests, across all claims
+MAX_INFLIGHT = int(os.environ.get("LLM_MAX_INFLIGHT", "16"))
+# Reply length assumed for the tokens-per-minute budget when max_tokens is not set
+EXPECTED_COMPLETION_TOKENS = int(os.environ.get("LLM_EXPECTED_COMPLETION_TOKENS", "500"))
+# Ask for token usage on streamed replies too (stream_options needs api-version 2024-09-01-preview or later)
+STREAM_USAGE = os.environ.get("LLM_STREAM_USAGE", "").lower() in ("1", "true", "yes")
+
+
+class LLMRequestError(Exception):
+    """
+    Raised when the chat-completions endpoint does not return a usable response.
+    """
+
+    def __init__(self, message, status=None, headers=None, partial=False):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+        # True when part of a streamed reply had already been passed on
+        self.partial = partial
+
+
+def _acceptable(response_json, accept):
+    return accept is None or accept(response_json['choices'][0]['message']['content'])
+
+
+def _usage_tokens(response_json):
+    return (response_json.get("usage") or {}).get("total_tokens")
+
+
+# Connection setup time of the current request, filled in by the timed connections below
+_io_state = threading.local()
+
+
+def _add_connect_time(seconds):
+    _io_state.connect = getattr(_io_state, "connect", 0.0) + seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _add_connect_time(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def _httpx_trace(event_name, info):
+    """
+    httpcore trace hook: times TCP connect and TLS setup.
+    """
+    if not event_name.startswith(("connection.connect_tcp.", "connection.start_tls.")):
+        return
+    if event_name.endswith(".started"):
+        _io_state.connect_started = time.perf_counter()
+    elif getattr(_io_state, "connect_started", None) is not None:
+        _add_connect_time(time.perf_counter() - _io_state.connect_started)
+        _io_state.connect_started = None
+
+
+class ChatCompletionsClient:
+    """
+    Keep-alive client for the chat-completions endpoint.
+
+    Connections are pooled and reused across calls and threads, so only the
+    first request to the host pays for the TCP and TLS handshake. HTTP/2 is
+    used when requested and `httpx[http2]` is installed; otherwise urllib3.
+    Successful responses are kept in `cache`, keyed by model, messages and
+    parameters, so an identical request is answered without a round-trip.
+    Every request goes through `scheduler`, which rate-limits it and retries
+    throttled or failed attempts; an LLMRequestError means it finally failed.
+    Each call's queue wait, connect time, time to first byte, tokens, cache
+    result and retries are recorded in `metrics`.
+    """
+
+    def __init__(self, url=API_URL, api_key=API_KEY, model=MODEL, pool_size=POOL_SIZE,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, http2=USE_HTTP2, cache=None,
+                 max_inflight=MAX_INFLIGHT, scheduler=None):
+        self.url = url
+        self.model = model
+        self.cache = cache if cache is not None else ResponseCache()
+        self.scheduler = scheduler or RequestScheduler()
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Cache-Control': 'no-cache',
+            'api-key': api_key,
+        }
+        self._httpx = None
+        self._pool = None
+
+        if http2:
+            try:
+                import httpx
+                self._httpx = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                )
+            except ImportError:
+                logger.warning("LLM_HTTP2 is set but httpx[http2] is not installed; using HTTP/1.1")
+
+        if self._httpx is None:
+            # block=True caps open connections at pool_size instead of opening throwaway ones
+            self._pool = urllib3.PoolManager(
+                maxsize=pool_size,
+                block=True,
+                timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+                retries=False,
+            )
+            self._pool.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+    @contextmanager
+    def _slot(self, timing):
+        """
+        Holds one of the process-wide in-flight slots, adding the wait to `timing`.
+        """
+        waiting_since = time.perf_counter()
+        with self._inflight:
+            timing.queue_wait += time.perf_counter() - waiting_since
+            _io_state.connect = 0.0
+            try:
+                yield
+            finally:
+                timing.connect += _io_state.connect
+
+    def _post(self, body, timing):
+        """
+        Sends the request body and returns (status, headers, response bytes).
+        """
+        try:
+            with self._slot(timing):
+                return self._send(body, timing)
+        except Exception as e:
+            raise LLMRequestError(f"Request to chat-completions endpoint failed: {e}") from e
+
+    def _send(self, body, timing):
+        sent = time.perf_counter()
+        if self._httpx is not None:
+            with self._httpx.stream("POST", self.url, content=body, headers=self.headers,
+                                    extensions={"trace": _httpx_trace}) as response:
+                timing.ttfb = time.perf_counter() - sent
+                return response.status_code, dict(response.headers), response.read()
+        response = self._pool.request("POST", self.url, body=body, headers=self.headers, preload_content=False)
+        try:
+            timing.ttfb = time.perf_counter() - sent
+            return response.status, dict(response.headers), response.read()
+        finally:
+            response.release_conn()
+
+    def create(self, messages, use_cache=True, accept=None, **params):
+        """
+        Sends a chat-completions request and returns the decoded JSON response.
+
+        With `accept`, only responses whose content it returns True for are
+        cached or served from the cache.
+        """
+        with track_call() as timing:
+            key = None
+            if use_cache and self.cache.enabled:
+                key = cache_key(self.model, messages, params)
+                cached = self.cache.get(key)
+                if cached is not None and _acceptable(cached, accept):
+                    timing.cache = "hit"
+                    return cached
+            else:
+                timing.cache = "bypass"
+            response_json = self._create(messages, params, timing)
+            timing.add_usage(response_json.get("usage"))
+            if key is not None and _acceptable(response_json, accept):
+                self.cache.set(key, response_json)
+            return response_json
+
+    def _create(self, messages, params, timing):
+        payload = {"model": self.model, "messages": messages, **params}
+        body = json.dumps(payload).encode("utf-8")
+
+        def send():
+            status, headers, data = self._post(body, timing)
+            if status >= 400:
+                raise LLMRequestError(
+                    f"Chat-completions endpoint returned HTTP {status}: {data[:500].decode('utf-8', 'replace')}",
+                    status=status,
+                    headers=headers,
+                )
+            return json.loads(data.decode("utf-8"))
+
+        return self._schedule(send, messages, params, timing)
+
+    def _send_stream(self, body, timing):
+        """
+        Sends a stream=true request and yields the raw response lines.
+        """
+        sent = time.perf_counter()
+        if self._httpx is not None:
+            with self._httpx.stream("POST", self.url, content=body, headers=self.headers,
+                                    extensions={"trace": _httpx_trace}) as response:
+                timing.ttfb = time.perf_counter() - sent
+                if response.status_code >= 400:
+                    response.read()
+                    raise LLMRequestError(
+                        f"Chat-completions endpoint returned HTTP {response.status_code}: {response.text[:500]}",
+                        status=response.status_code,
+                        headers=dict(response.headers),
+                    )
+                yield from response.iter_lines()
+            return
+
+        response = self._pool.request("POST", self.url, body=body, headers=self.headers, preload_content=False)
+        timing.ttfb = time.perf_counter() - sent
+        try:
+            if response.status >= 400:
+                raise LLMRequestError(
+                    f"Chat-completions endpoint returned HTTP {response.status}: "
+                    f"{response.read()[:500].decode('utf-8', 'replace')}",
+                    status=response.status,
+                    headers=dict(response.headers),
+                )
+            for line in response:
+                yield line.decode("utf-8")
+        finally:
+            response.release_conn()
+
+    def stream(self, messages, on_delta, use_cache=True, accept=None, **params):
+        """
+        Sends a request in stream=true mode, passing each content delta to
+        `on_delta` as it arrives. Returns the same JSON shape as `create`.
+        """
+        with track_call() as timing:
+            key = None
+            if use_cache and self.cache.enabled:
+                key = cache_key(self.model, messages, params)
+                cached = self.cache.get(key)
+                if cached is not None and _acceptable(cached, accept):
+                    timing.cache = "hit"
+                    on_delta(cached['choices'][0]['message']['content'])
+                    return cached
+            else:
+                timing.cache = "bypass"
+            response_json = self._stream(messages, on_delta, params, timing)
+            timing.add_usage(response_json.get("usage"))
+            if key is not None and _acceptable(response_json, accept):
+                self.cache.set(key, response_json)
+            return response_json
+
+    def _stream(self, messages, on_delta, params, timing):
+        payload = {"model": self.model, "messages": messages, "stream": True, **params}
+        if STREAM_USAGE:
+            payload.setdefault("stream_options", {"include_usage": True})
+        body = json.dumps(payload).encode("utf-8")
+
+        def send():
+            parts = []
+            usage = None
+            try:
+                with self._slot(timing):
+                    for line in self._send_stream(body, timing):
+                        line = line.strip()
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        usage = chunk.get("usage") or usage
+                        for choice in chunk.get("choices", []):
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                parts.append(delta)
+                                on_delta(delta)
+            except LLMRequestError as e:
+                e.partial = bool(parts)
+                raise
+            except Exception as e:
+                raise LLMRequestError(
+                    f"Streaming request to chat-completions endpoint failed: {e}", partial=bool(parts)
+                ) from e
+
+            # Same shape as a non-streamed response, so the cache serves both modes
+            response_json = {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}
+            if usage:
+                response_json["usage"] = usage
+            return response_json
+
+        return self._schedule(send, messages, params, timing)
+
+    def _schedule(self, send, messages, params, timing):
+        """
+        Runs one request attempt function through the scheduler.
+        """
+        estimated = 0
+        if self.scheduler.tokens is not None:
+            from prompt_payload import count_tokens
+            estimated = sum(count_tokens(str(message.get("content", ""))) for message in messages)
+            estimated += params.get("max_tokens") or EXPECTED_COMPLETION_TOKENS
+        try:
+            return self.scheduler.run(send, estimated_tokens=estimated, used_tokens=_usage_tokens, timing=timing)
+        except CircuitOpenError as e:
+            raise LLMRequestError(str(e), status=503) from e
+
+    def complete(self, prompt, use_cache=True, system=None, accept=None, **params):
+        """
+        Sends a user prompt, after `system` instructions when given, and returns
+        the content of the first choice.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        on_delta = getattr(_stream_state, "on_delta", None)
+        if on_delta is not None:
+            response_json = self.stream(messages, on_delta, use_cache=use_cache, accept=accept, **params)
+        else:
+            response_json = self.create(messages, use_cache=use_cache, accept=accept, **params)
+        return response_json['choices'][0]['message']['content']
+
+    def close(self):
+        if self._httpx is not None:
+            self._httpx.close()
+        if self._pool is not None:
+            self._pool.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+_stream_state = threading.local()
+
+
+@contextmanager
+def stream_deltas(on_delta):
+    """
+    While active, chat_completion calls made on this thread use stream=true and
+    pass every content delta to `on_delta`. None switches streaming off again.
+    """
+    previous = getattr(_stream_state, "on_delta", None)
+    _stream_state.on_delta = on_delta
+    try:
+        yield
+    finally:
+        _stream_state.on_delta = previous
+
+
+def get_client():
+    """
+    Process-wide client, created on first use so importing agents stays free of I/O.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ChatCompletionsClient()
+    return _client
+
+
+def chat_completion(prompt, use_cache=True, system=None, accept=None, **params):
+    """
+    Sends `prompt` through the shared client and returns the model's reply.
+
+    Pass use_cache=False to always ask the model, e.g. for a deliberate re-run.
+    Static instructions go in `system`: sent first and unchanged from claim to
+    claim, they form a prefix the provider's prompt cache can reuse.
+    `accept(content)` keeps replies it rejects out of the response cache.
+    """
+    return get_client().complete(prompt, use_cache=use_cache, system=system, accept=accept, **params)
@@ -0,0 +1,239 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger("LLMScheduler")
+
+# Attempts per request after the first one, and the backoff between them (seconds)
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "30"))
+# The deployment's quota; 0 disables that limit
+REQUESTS_PER_MINUTE = float(os.environ.get("LLM_RPM", "0"))
+TOKENS_PER_MINUTE = float(os.environ.get("LLM_TPM", "0"))
+# Consecutive failures that open the circuit, and how long it stays open (seconds)
+BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+# Throttling, timeouts and server-side failures are worth another attempt
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the endpoint is considered down.
+    """
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units a minute up to `capacity`.
+
+    `take` blocks until the units are available. The balance may go negative
+    through `adjust` when a request turns out to cost more than estimated;
+    later callers then wait for the debt to be paid back.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount=1):
+        # A single request bigger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                wait = (amount - self.level) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def adjust(self, amount):
+        with self._lock:
+            self._refill()
+            self.level -= amount
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for `cooldown`
+    seconds. After that one trial request is let through (half-open): success
+    closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def before(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(self.cooldown - (time.monotonic() - self.opened_at), 0)
+        raise CircuitOpenError(f"LLM endpoint circuit is open; retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.threshold:
+                if self.opened_at is None or self._trial_running:
+                    logger.warning("Opening LLM circuit after %d consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def retry_after_seconds(headers):
+    """
+    Delay the server asked for in Retry-After (seconds or HTTP date) or retry-after-ms.
+    """
+    headers = {str(key).lower(): value for key, value in (headers or {}).items()}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Paces, retries and guards the requests of one client.
+
+    Requests wait for the requests-per-minute and tokens-per-minute buckets,
+    are retried with exponential backoff and full jitter on throttling,
+    timeouts and 5xx, and honour Retry-After. A 429 pauses every caller, not
+    just the one that got it, so throughput degrades smoothly under load.
+    Repeated failures open the circuit breaker.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 breaker=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.breaker = breaker or CircuitBreaker()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @staticmethod
+    def is_retryable(error):
+        if getattr(error, "partial", False):
+            # Part of a streamed reply was already handed out; a retry would repeat it
+            return False
+        status = getattr(error, "status", None)
+        return status is None or status in RETRYABLE_STATUSES
+
+    def run(self, send, estimated_tokens=0, used_tokens=None, timing=None):
+        """
+        Calls `send()` until it succeeds or the retries run out, and returns its result.
+
+        `estimated_tokens` is taken from the tokens-per-minute bucket up front;
+        `used_tokens(result)`, when given, returns the real cost so the bucket
+        can be corrected afterwards. When a metrics CallTiming is passed, the
+        time spent waiting for pauses and buckets and the retries are added to it.
+        """
+        attempt = 0
+        while True:
+            waiting_since = time.perf_counter()
+            self._wait_for_pause()
+            self.breaker.before()
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens and estimated_tokens:
+                self.tokens.take(estimated_tokens)
+            if timing is not None:
+                timing.queue_wait += time.perf_counter() - waiting_since
+
+            try:
+                result = send()
+            except Exception as e:
+                status = getattr(e, "status", None)
+                retryable = self.is_retryable(e)
+                if status is None or status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    # Throttling and client errors still prove the endpoint is up
+                    self.breaker.record_success()
+                if not retryable or attempt >= self.max_retries:
+                    raise
+
+                delay = self._backoff(attempt)
+                retry_after = retry_after_seconds(getattr(e, "headers", None))
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                if status == 429:
+                    self._pause(delay)
+                attempt += 1
+                if timing is not None:
+                    timing.retries = attempt
+                logger.warning("LLM request failed (%s); retry %d/%d in %.1fs", e, attempt, self.max_retries, delay)
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            if self.tokens and used_tokens is not None:
+                used = used_tokens(result)
+                if used:
+                    self.tokens.adjust(used - estimated_tokens)
+            return result
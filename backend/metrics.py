@@ -0,0 +1,343 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from flask import Blueprint, Response, g
+
+logger = logging.getLogger("Metrics")
+
+# Set METRICS_ENABLED=0 to stop recording (the endpoints then report nothing)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class CallTiming:
+    """
+    What one chat-completions call cost, phase by phase (seconds).
+
+    `queue_wait` covers rate limiting, 429 pauses and waiting for an in-flight
+    slot; `connect` is TCP and TLS setup (0 when a pooled connection was
+    reused); `ttfb` runs from sending the request to the response headers.
+    `cache` is "hit" or "miss", or "bypass" when the call skipped the cache.
+    `cached_tokens` are the prompt tokens the provider served from its own
+    prompt cache (usage.prompt_tokens_details.cached_tokens).
+    """
+
+    def __init__(self, agent=None):
+        self.agent = agent or current_agent() or "unknown"
+        self.queue_wait = 0.0
+        self.connect = 0.0
+        self.ttfb = None
+        self.total = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cache = "miss"
+        self.retries = 0
+        self.outcome = "ok"
+
+    def add_usage(self, usage):
+        usage = usage or {}
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self.cached_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms, rendered in the Prometheus text format.
+
+    Metrics are keyed by name and a sorted tuple of label pairs; every series
+    is created on first use.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, help_text, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, help_text, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(value)
+
+    def record_call(self, timing):
+        agent = timing.agent
+        self.inc("llm_requests_total", "Chat-completions calls by agent, cache result and outcome",
+                 agent=agent, cache=timing.cache, outcome=timing.outcome)
+        self.observe("llm_request_duration_seconds", "Total latency of a chat-completions call",
+                     timing.total, agent=agent, cache=timing.cache)
+        if timing.cache == "hit":
+            return
+        self.observe("llm_queue_wait_seconds", "Time a call waited for rate limits and in-flight slots",
+                     timing.queue_wait, agent=agent)
+        self.observe("llm_connect_seconds", "TCP and TLS connection setup per call",
+                     timing.connect, agent=agent)
+        if timing.ttfb is not None:
+            self.observe("llm_time_to_first_byte_seconds", "Time from sending a request to its response headers",
+                         timing.ttfb, agent=agent)
+        if timing.retries:
+            self.inc("llm_retries_total", "Retried chat-completions attempts", timing.retries, agent=agent)
+        self.inc("llm_prompt_tokens_total", "Prompt tokens reported in usage", timing.prompt_tokens, agent=agent)
+        self.inc("llm_completion_tokens_total", "Completion tokens reported in usage",
+                 timing.completion_tokens, agent=agent)
+        self.inc("llm_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache",
+                 timing.cached_tokens, agent=agent)
+
+    def record_agent(self, agent, seconds, outcome="ok"):
+        self.observe("agent_duration_seconds", "Wall time of one agent, LLM calls included",
+                     seconds, agent=agent, outcome=outcome)
+
+    def render(self):
+        """
+        All series in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h.counts), h.count, h.sum, h.buckets) for key, h in self._histograms.items()}
+            described = dict(self._help)
+
+        lines = []
+        for name in sorted(described):
+            kind, help_text = described[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            for (series, labels), (counts, count, total, buckets) in sorted(histograms.items()):
+                if series != name:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class RequestTimings:
+    """
+    Timings of the agents and LLM calls made while serving one request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.agents = {}  # agent -> seconds
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add_call(self, timing):
+        with self._lock:
+            self.calls.append(timing)
+
+    def add_agent(self, agent, seconds):
+        with self._lock:
+            self.agents[agent] = seconds
+
+    def summary(self):
+        """
+        Per-agent totals: wall time, LLM calls, cache hits, retries, queue wait and tokens
+        (cached_tokens being the prompt tokens the provider had cached).
+        """
+        with self._lock:
+            agents = dict(self.agents)
+            calls = list(self.calls)
+        summary = {}
+        for agent in list(agents) + [timing.agent for timing in calls]:
+            summary.setdefault(agent, {
+                "seconds": round(agents.get(agent, 0.0), 3), "llm_calls": 0, "cache_hits": 0, "retries": 0,
+                "llm_seconds": 0.0, "queue_wait_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cached_tokens": 0,
+            })
+        for timing in calls:
+            entry = summary[timing.agent]
+            entry["llm_calls"] += 1
+            entry["cache_hits"] += timing.cache == "hit"
+            entry["retries"] += timing.retries
+            entry["llm_seconds"] = round(entry["llm_seconds"] + timing.total, 3)
+            entry["queue_wait_seconds"] = round(entry["queue_wait_seconds"] + timing.queue_wait, 3)
+            entry["prompt_tokens"] += timing.prompt_tokens
+            entry["completion_tokens"] += timing.completion_tokens
+            entry["cached_tokens"] += timing.cached_tokens
+        return summary
+
+    def server_timing(self):
+        """
+        Server-Timing header value: one entry per agent plus the request total.
+        """
+        summary = self.summary()
+        with self._lock:
+            agents = dict(self.agents)
+        entries = []
+        for agent, seconds in agents.items():
+            stats = summary[agent]
+            desc = f"{stats['llm_calls']} LLM calls, {stats['cache_hits']} cached, " \
+                   f"{stats['prompt_tokens']}+{stats['completion_tokens']} tokens " \
+                   f"({stats['cached_tokens']} prompt cached)"
+            entries.append(f'{agent};dur={seconds * 1000:.1f};desc="{desc}"')
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+registry = MetricsRegistry()
+_scope = threading.local()
+
+
+def current_agent():
+    return getattr(_scope, "agent", None)
+
+
+def current_timings():
+    return getattr(_scope, "timings", None)
+
+
+@contextmanager
+def agent_scope(agent, timings=None):
+    """
+    Attributes the LLM calls made on this thread to `agent` and, when given,
+    to the request's `timings`. Records the agent's wall time on exit.
+    """
+    previous = (current_agent(), current_timings())
+    _scope.agent = agent
+    _scope.timings = timings if timings is not None else previous[1]
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        if METRICS_ENABLED:
+            registry.record_agent(agent, seconds, outcome)
+        if _scope.timings is not None:
+            _scope.timings.add_agent(agent, seconds)
+        _scope.agent, _scope.timings = previous
+
+
+@contextmanager
+def collect(timings):
+    """
+    Collects the timings of everything run on this thread into `timings`.
+    """
+    previous = current_timings()
+    _scope.timings = timings
+    try:
+        yield timings
+    finally:
+        _scope.timings = previous
+
+
+def bind(func):
+    """
+    Wraps `func` to run in the caller's agent scope, for handing work to other threads.
+    """
+    agent, timings = current_agent(), current_timings()
+
+    def bound(*args, **kwargs):
+        previous = (current_agent(), current_timings())
+        _scope.agent, _scope.timings = agent, timings
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _scope.agent, _scope.timings = previous
+
+    return bound
+
+
+@contextmanager
+def track_call():
+    """
+    Yields a CallTiming for one chat-completions call and records it on exit.
+    """
+    timing = CallTiming()
+    started = time.perf_counter()
+    try:
+        yield timing
+    except Exception:
+        timing.outcome = "error"
+        raise
+    finally:
+        timing.total = time.perf_counter() - started
+        if METRICS_ENABLED:
+            registry.record_call(timing)
+            timings = current_timings()
+            if timings is not None:
+                timings.add_call(timing)
+        logger.debug("LLM call %s", timing.as_dict())
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@metrics_bp.before_app_request
+def _start_request_timings():
+    g.request_timings = RequestTimings()
+    _scope.timings = g.request_timings
+
+
+@metrics_bp.after_app_request
+def _add_server_timing(response):
+    # Per-stage durations, visible in the browser's network panel
+    timings = g.pop("request_timings", None)
+    if timings is not None and (timings.agents or timings.calls):
+        response.headers["Server-Timing"] = timings.server_timing()
+        response.headers.add("Access-Control-Expose-Headers", "Server-Timing")
+    return response
+
+
+@metrics_bp.teardown_app_request
+def _end_request_timings(error=None):
+    _scope.timings = None
@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import math
+import logging
+import datetime
+
+logger = logging.getLogger("PromptPayload")
+
+# json: compact JSON; table: lists of rows as {"columns": [...], "rows": [[...]]}; auto: whichever is shorter
+PROMPT_PAYLOAD_FORMAT = os.environ.get("PROMPT_PAYLOAD_FORMAT", "auto")
+# Tokenizer used for the before/after counts when tiktoken is installed (GPT-4o's)
+PROMPT_TOKEN_ENCODING = os.environ.get("PROMPT_TOKEN_ENCODING", "o200k_base")
+
+_FENCE_PATTERN = re.compile(r"^```[a-zA-Z]*\s*(.*?)\s*```$", re.DOTALL)
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Number of tokens in `text`; falls back to ~4 characters per token without tiktoken.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(PROMPT_TOKEN_ENCODING)
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (dict, list, tuple)):
+        return not value
+    # NaN and NaT from pandas/numpy are the only values not equal to themselves
+    try:
+        return bool(value != value)
+    except Exception:
+        return False
+
+
+def prune(value):
+    """
+    Drops None, NaN and blank fields from nested dicts and lists, along with
+    containers that end up empty.
+    """
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            item = prune(item)
+            if not _is_empty(item):
+                pruned[str(key)] = item
+        return pruned
+    if isinstance(value, (list, tuple)):
+        return [item for item in (prune(item) for item in value) if not _is_empty(item)]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _default(value):
+    # Dates come back from Excel as datetimes at midnight; the time adds nothing
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    return str(value)
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+def _tabulate(value):
+    """
+    Replaces lists of row dicts with a header and positional rows, so each
+    column name appears once instead of once per row.
+    """
+    if isinstance(value, dict):
+        return {key: _tabulate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > 1 and all(isinstance(row, dict) for row in value):
+            columns = list(dict.fromkeys(key for row in value for key in row))
+            return {
+                "columns": columns,
+                "rows": [[_tabulate(row.get(column)) for column in columns] for row in value],
+            }
+        return [_tabulate(item) for item in value]
+    return value
+
+
+class JSONText(str):
+    """
+    Compact JSON text that keeps the object it was encoded from in `data`, so
+    the agents it is handed to read the object instead of parsing it again.
+    """
+
+    def __new__(cls, data):
+        text = super().__new__(cls, _dumps(data))
+        text.data = data
+        return text
+
+    def __reduce__(self):
+        return JSONText, (self.data,)
+
+
+def parse_json_text(text):
+    """
+    Parses LLM output that should be JSON, tolerating a ```json fence around it.
+    Returns None when the text is not JSON.
+    """
+    if isinstance(text, JSONText):
+        return text.data
+    text = text.strip()
+    match = _FENCE_PATTERN.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def encode_payload(value, fmt=None):
+    """
+    Serialises prompt data compactly: empty fields dropped, no whitespace, and
+    (for the table and auto formats) lists of rows stored as header plus rows.
+
+    Strings holding JSON, such as the output of an earlier agent, are parsed
+    and re-encoded; any other string is passed through trimmed.
+    """
+    fmt = fmt or PROMPT_PAYLOAD_FORMAT
+    if isinstance(value, str):
+        parsed = parse_json_text(value)
+        if parsed is None:
+            return value.strip()
+        value = parsed
+
+    value = prune(value)
+    as_json = _dumps(value)
+    if fmt == "json":
+        return as_json
+    as_table = _dumps(_tabulate(value))
+    if fmt == "table":
+        return as_table
+    return as_table if len(as_table) < len(as_json) else as_json
+
+
+def prompt_payload(value, label="payload", fmt=None):
+    """
+    encode_payload, logging the token count of the repr the prompt used to
+    inline against that of the encoded payload.
+    """
+    encoded = encode_payload(value, fmt)
+    if logger.isEnabledFor(logging.INFO):
+        before = count_tokens(value if isinstance(value, str) else str(value))
+        after = count_tokens(encoded)
+        logger.info("%s: %d -> %d prompt tokens", label, before, after)
+    return encoded
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import logging
+import threading
+import datetime
+from flask import Blueprint, jsonify, request
+from prompt_payload import parse_json_text
+
+logger = logging.getLogger("ResultsStore")
+
+# Every finished representment run; RESULTS_STORE=0 stops recording
+RESULTS_STORE = os.environ.get("RESULTS_STORE", "1") != "0"
+RESULTS_DB = os.environ.get(
+    "RESULTS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.sqlite3")
+)
+# Retention: runs older than this are deleted (0 keeps them), and only the latest runs per claim are kept
+RESULTS_RETENTION_DAYS = float(os.environ.get("RESULTS_RETENTION_DAYS", "365"))
+RESULTS_KEEP_PER_CLAIM = int(os.environ.get("RESULTS_KEEP_PER_CLAIM", "20"))
+# Retention and space reclamation run after this many saves
+RESULTS_PRUNE_EVERY = int(os.environ.get("RESULTS_PRUNE_EVERY", "200"))
+
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+
+_DECISION_KEYS = ("Final Decision recommendation", "final_decision", "recommendation")
+_REASON_CODE_KEYS = ("reason_code", "Dispute Reason Code", "dispute_reason_code")
+
+
+def _find(value, keys):
+    """
+    First non-empty scalar under any of `keys`, searching nested dicts and lists depth-first.
+    """
+    if isinstance(value, str):
+        value = parse_json_text(value)
+    if isinstance(value, dict):
+        for key in keys:
+            found = value.get(key)
+            if found not in (None, "", [], {}) and not isinstance(found, (dict, list)):
+                return str(found)
+        for item in value.values():
+            found = _find(item, keys)
+            if found:
+                return found
+    elif isinstance(value, list):
+        for item in value:
+            found = _find(item, keys)
+            if found:
+                return found
+    return None
+
+
+def summarise(results):
+    """
+    (decision, reason code) read from a run's agent outputs, either may be None.
+    """
+    decision = _find(results, _DECISION_KEYS)
+    reason_code = _find(results, _REASON_CODE_KEYS)
+    return (decision.replace("**", "").strip() if decision else None), reason_code
+
+
+def _day_start(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+
+class ResultsStore:
+    """
+    Representment results in sqlite, indexed by claim, decision, reason code and time.
+
+    The full agent outputs are stored zlib-compressed next to the indexed
+    summary columns. Retention deletes runs past `retention_days` and all but
+    the newest `keep_per_claim` runs of each claim; freed pages are returned
+    to the file system with incremental vacuum, so the file stays bounded.
+    """
+
+    def __init__(self, db_path=RESULTS_DB, retention_days=RESULTS_RETENTION_DAYS,
+                 keep_per_claim=RESULTS_KEEP_PER_CLAIM, prune_every=RESULTS_PRUNE_EVERY):
+        self.retention_days = retention_days
+        self.keep_per_claim = keep_per_claim
+        self.prune_every = prune_every
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        # Only takes effect on a new database file
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " run_id TEXT PRIMARY KEY, claim_id TEXT NOT NULL, flow TEXT NOT NULL,"
+            " decision TEXT, reason_code TEXT, created_at REAL NOT NULL, duration REAL,"
+            " payload BLOB NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS results_claim ON results (claim_id, created_at);"
+            "CREATE INDEX IF NOT EXISTS results_decision ON results (decision, created_at);"
+            "CREATE INDEX IF NOT EXISTS results_reason_code ON results (reason_code, created_at);"
+            "CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);"
+        )
+        self._db.commit()
+
+    def save(self, claim_id, flow, results, duration=None):
+        """
+        Stores one run's agent outputs and returns its run ID.
+        """
+        run_id = uuid.uuid4().hex
+        decision, reason_code = summarise(results)
+        payload = zlib.compress(json.dumps(results, default=str).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO results (run_id, claim_id, flow, decision, reason_code, created_at, duration, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, claim_id, flow, decision, reason_code, time.time(), duration, payload),
+            )
+            self._db.commit()
+            self._saves += 1
+            due = self.prune_every and self._saves % self.prune_every == 0
+        if due:
+            self.apply_retention()
+        return run_id
+
+    def _row(self, row, with_result=False):
+        entry = {
+            "run_id": row["run_id"],
+            "claim_id": row["claim_id"],
+            "flow": row["flow"],
+            "decision": row["decision"],
+            "reason_code": row["reason_code"],
+            "created_at": datetime.datetime.fromtimestamp(row["created_at"]).isoformat(timespec="seconds"),
+            "duration": row["duration"],
+        }
+        if with_result:
+            entry["result"] = json.loads(zlib.decompress(row["payload"]).decode("utf-8"))
+        return entry
+
+    def get(self, run_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM results WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row(row, with_result=True) if row else None
+
+    def latest(self, claim_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM results WHERE claim_id = ? ORDER BY created_at DESC LIMIT 1", (claim_id,)
+            ).fetchone()
+        return self._row(row, with_result=True) if row else None
+
+    def query(self, claim_id=None, decision=None, reason_code=None, date_from=None, date_to=None,
+              offset=0, limit=RESULTS_PAGE_SIZE):
+        """
+        (total, page) of run summaries, newest first. Dates are YYYY-MM-DD and inclusive.
+        """
+        where, params = [], []
+        for column, value in (("claim_id", claim_id), ("decision", decision), ("reason_code", reason_code)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(_day_start(date_from))
+        if date_to:
+            where.append("created_at < ?")
+            params.append(_day_start(date_to) + 86400)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM results{clause}", params).fetchone()[0]
+            rows = self._db.execute(
+                "SELECT run_id, claim_id, flow, decision, reason_code, created_at, duration FROM results"
+                f"{clause} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return total, [self._row(row) for row in rows]
+
+    def decision_counts(self, date_from=None, date_to=None):
+        """
+        {decision: number of runs} in the date range.
+        """
+        where, params = [], []
+        if date_from:
+            where.append("created_at >= ?")
+            params.append(_day_start(date_from))
+        if date_to:
+            where.append("created_at < ?")
+            params.append(_day_start(date_to) + 86400)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT decision, COUNT(*) FROM results{clause} GROUP BY decision ORDER BY COUNT(*) DESC", params
+            ).fetchall()
+        return {decision or "unknown": count for decision, count in rows}
+
+    def apply_retention(self):
+        """
+        Deletes expired runs and surplus runs per claim, then reclaims the freed pages.
+        """
+        with self._lock:
+            deleted = 0
+            if self.retention_days > 0:
+                cutoff = time.time() - self.retention_days * 86400
+                deleted += self._db.execute("DELETE FROM results WHERE created_at < ?", (cutoff,)).rowcount
+            if self.keep_per_claim > 0:
+                deleted += self._db.execute(
+                    "DELETE FROM results WHERE run_id IN ("
+                    " SELECT run_id FROM (SELECT run_id, ROW_NUMBER() OVER"
+                    " (PARTITION BY claim_id ORDER BY created_at DESC) AS n FROM results) WHERE n > ?)",
+                    (self.keep_per_claim,),
+                ).rowcount
+            self._db.commit()
+            if deleted:
+                # executescript steps the pragma to the end; execute() would free a single page
+                self._db.executescript("PRAGMA incremental_vacuum;")
+        if deleted:
+            logger.info("Retention removed %d stored runs", deleted)
+        return deleted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """
+    Process-wide store, opened on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResultsStore()
+    return _store
+
+
+def record_result(claim_id, flow, results, duration=None):
+    """
+    Saves a finished run unless RESULTS_STORE=0; returns the run ID or None.
+
+    A store failure is logged and does not fail the run.
+    """
+    if not RESULTS_STORE:
+        return None
+    try:
+        return get_results_store().save(claim_id, flow, results, duration)
+    except Exception as e:
+        logger.error("Could not store result of %s: %s", claim_id, e)
+        return None
+
+
+results_bp = Blueprint("results", __name__)
+
+
+@results_bp.route('/api/results', methods=['GET'])
+def list_results():
+    """
+    Query parameters (all optional):
+      claim_id, decision, reason_code  exact-match filters
+      date_from, date_to               YYYY-MM-DD range on the run date
+      offset, limit                    page through the runs (limit defaults to 100, max 1000)
+    Returns run summaries, newest first; fetch /api/results/<run_id> for the agent outputs.
+    """
+    args = request.args
+    offset = max(args.get("offset", 0, type=int), 0)
+    limit = min(max(args.get("limit", RESULTS_PAGE_SIZE, type=int), 1), RESULTS_MAX_PAGE_SIZE)
+    try:
+        total, runs = get_results_store().query(
+            claim_id=args.get("claim_id"),
+            decision=args.get("decision"),
+            reason_code=args.get("reason_code"),
+            date_from=args.get("date_from"),
+            date_to=args.get("date_to"),
+            offset=offset,
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Dates must be YYYY-MM-DD: {e}"}), 400
+    response = jsonify({"success": True, "total": total, "offset": offset, "results": runs})
+    response.headers["X-Total-Count"] = str(total)
+    return response
+
+
+@results_bp.route('/api/results/decisions', methods=['GET'])
+def count_decisions():
+    """
+    Number of runs per decision, optionally within date_from/date_to (YYYY-MM-DD).
+    """
+    try:
+        counts = get_results_store().decision_counts(request.args.get("date_from"), request.args.get("date_to"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Dates must be YYYY-MM-DD: {e}"}), 400
+    return jsonify({"success": True, "decisions": counts})
+
+
+@results_bp.route('/api/results/<run_id>', methods=['GET'])
+def get_result(run_id):
+    run = get_results_store().get(run_id)
+    if run is None:
+        return jsonify({"success": False, "error": "Unknown run ID"}), 404
+    return jsonify({"success": True, **run})
@@ -0,0 +1,195 @@
+import os
+import logging
+from llm_client import LLMRequestError, chat_completion, stream_deltas
+from metrics import METRICS_ENABLED, current_agent, registry
+from prompt_payload import JSONText, parse_json_text
+
+logger = logging.getLogger("StructuredOutput")
+
+# json_object: JSON mode; json_schema: the agent's schema is sent with the request
+# (needs a model and API version that support it); off: rely on the prompt alone
+LLM_RESPONSE_FORMAT = os.environ.get("LLM_RESPONSE_FORMAT", "json_object")
+# Extra requests for an agent whose reply does not match its schema, before the agent fails
+SCHEMA_RETRIES = int(os.environ.get("SCHEMA_RETRIES", "1"))
+
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+_TEXT = {"type": ["string", "array"]}
+_FIELDS = {"type": "array", "items": {"type": "object", "required": ["field_name"]}}
+
+# JSON schemas of the agents that answer in JSON (the summarizer writes Markdown)
+SCHEMAS = {
+    "claim_validation": {
+        "type": "object",
+        "required": ["matched_fields", "mismatched_fields", "missing_fields"],
+        "properties": {
+            "pdf_data": {"type": "object"},
+            "drc_data": {"type": "object"},
+            "matched_fields": _FIELDS,
+            "mismatched_fields": _FIELDS,
+            "missing_fields": {
+                "type": "object",
+                "properties": {"pdf_missing": _STRING_LIST, "drc_missing": _STRING_LIST},
+            },
+            "critical_findings": {"type": "array"},
+        },
+    },
+    "regulatory": {
+        "type": "object",
+        "required": ["dispute_reason", "identified_visa_rules", "required_information",
+                     "available_information", "missing_information", "justification"],
+        "properties": {
+            "dispute_reason": {"type": "string"},
+            "identified_visa_rules": _TEXT,
+            "required_information": _STRING_LIST,
+            "available_information": _STRING_LIST,
+            "missing_information": _STRING_LIST,
+            "justification": {"type": "string"},
+        },
+    },
+    "decision": {
+        "type": "object",
+        "required": ["information_considered", "Final Decision recommendation", "justification"],
+        "properties": {
+            "information_considered": _TEXT,
+            "Final Decision recommendation": {"type": "string"},
+            "justification": {"type": "string"},
+        },
+    },
+    "validator": {
+        "type": "object",
+        "required": ["Guardrails Check", "Review Summary", "Recommendations"],
+        "properties": {
+            "Guardrails Check": {"type": "string", "enum": ["Pass", "Fail"]},
+            "Review Summary": _TEXT,
+            "Recommendations": _TEXT,
+        },
+    },
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class SchemaValidationError(LLMRequestError):
+    """
+    Raised when an agent's reply still does not match its schema after SCHEMA_RETRIES re-asks.
+    """
+
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _is_type(value, name):
+    # bool is an int subclass, but true is not a number in JSON
+    if isinstance(value, bool) and name in ("number", "integer"):
+        return False
+    return isinstance(value, _TYPES[name])
+
+
+def validate(value, schema, path="$"):
+    """
+    Checks `value` against the subset of JSON Schema used in SCHEMAS (type,
+    enum, required, properties, items); returns the violations, empty if none.
+    """
+    expected = schema.get("type")
+    if expected:
+        expected = [expected] if isinstance(expected, str) else expected
+        if not any(_is_type(value, name) for name in expected):
+            return [f"{path} must be of type {' or '.join(expected)}"]
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path} must be one of {', '.join(map(str, schema['enum']))}")
+    if isinstance(value, dict):
+        errors.extend(f'{path} is missing "{key}"' for key in schema.get("required", ()) if key not in value)
+        for key, item_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], item_schema, f"{path}.{key}"))
+    elif isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def parse_reply(text):
+    """
+    The JSON object in an LLM reply: the whole reply, fenced or not, or else
+    the outermost {...} in it when the model wrapped the JSON in prose.
+    """
+    value = parse_json_text(text)
+    if value is None:
+        start, end = text.find("{"), text.rfind("}")
+        if 0 <= start < end:
+            value = parse_json_text(text[start:end + 1])
+    return value
+
+
+def response_format(name, schema):
+    """
+    The response_format request parameter for LLM_RESPONSE_FORMAT, or None.
+    """
+    if LLM_RESPONSE_FORMAT == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": False}}
+    if LLM_RESPONSE_FORMAT == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def _reask(prompt, reply, errors):
+    problems = "\n".join(f"- {error}" for error in errors)
+    return (
+        f"{prompt}\n\n"
+        f"Your previous reply was:\n{reply}\n\n"
+        f"It does not match the required JSON format:\n{problems}\n"
+        "Reply again with only the corrected JSON object."
+    )
+
+
+def structured_completion(prompt, name, schema=None, system=None):
+    """
+    Sends `prompt` (after the `system` instructions, if any) in JSON mode and
+    returns the reply as JSONText once it parses and matches the schema
+    (SCHEMAS[name] unless `schema` is given).
+
+    A reply that does not is re-asked on its own, up to SCHEMA_RETRIES times,
+    with the violations appended to the prompt; the rest of the pipeline is
+    not re-run. Raises SchemaValidationError when no valid reply comes back.
+    """
+    schema = schema or SCHEMAS[name]
+    params = {}
+    response_format_param = response_format(name, schema)
+    if response_format_param:
+        params["response_format"] = response_format_param
+    if "json" not in f"{system or ''}{prompt}".lower():
+        # JSON mode rejects prompts that do not ask for JSON
+        prompt += f"\n\nRespond with a single JSON object with the keys: {', '.join(schema.get('required', ()))}."
+
+    def check(reply):
+        value = parse_reply(reply)
+        return value, ["the reply is not valid JSON"] if value is None else validate(value, schema)
+
+    # Only replies that pass are cached, so neither a bad reply nor its re-ask is repeated on later runs
+    accept = lambda reply: not check(reply)[1]
+    reply = chat_completion(prompt, system=system, accept=accept, **params)
+    for attempt in range(SCHEMA_RETRIES + 1):
+        value, errors = check(reply)
+        if not errors:
+            return JSONText(value)
+        if attempt == SCHEMA_RETRIES:
+            break
+        agent = current_agent() or name
+        logger.warning("%s reply does not match the %s schema, asking again: %s", agent, name, "; ".join(errors))
+        if METRICS_ENABLED:
+            registry.inc("llm_schema_reasks_total", "Replies re-requested for not matching the agent's schema",
+                         agent=agent)
+        # Not streamed, as the client already has the first attempt's deltas
+        with stream_deltas(None):
+            reply = chat_completion(_reask(prompt, reply, errors), system=system, accept=accept, **params)
+    raise SchemaValidationError(f"Reply does not match the {name} schema: {'; '.join(errors)}", errors)
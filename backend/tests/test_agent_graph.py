@@ -0,0 +1,100 @@
+import re
+import threading
+import pytest
+from agent_graph import AgentGraphError, AgentNode, _check_graph, run_agent_graph
+
+
+def _agent(name, log=None):
+    def func(claim_ctx, *inputs):
+        if log is not None:
+            log.append(name)
+        return f"{name}({', '.join(inputs)})"
+    return func
+
+
+def _fail(claim_ctx, *inputs):
+    raise RuntimeError("LLM unavailable")
+
+
+def test_outputs_are_passed_downstream_in_declared_order():
+    nodes = [
+        AgentNode("Claim", _agent("Claim")),
+        AgentNode("Regulatory", _agent("Regulatory"), ["Claim"]),
+        AgentNode("Decision", _agent("Decision"), ["Claim", "Regulatory"]),
+    ]
+    results = run_agent_graph(nodes, claim_ctx=None)
+    assert list(results) == ["Claim", "Regulatory", "Decision"]
+    assert results["Decision"] == "Decision(Claim(), Regulatory(Claim()))"
+
+
+def test_independent_agents_run_concurrently():
+    # Each sibling waits for the other; run one after the other they would time out
+    both_started = threading.Barrier(2, timeout=5)
+
+    def sibling(claim_ctx, upstream):
+        both_started.wait()
+        return upstream
+
+    nodes = [
+        AgentNode("Claim", _agent("Claim")),
+        AgentNode("Regulatory", sibling, ["Claim"]),
+        AgentNode("Display", sibling, ["Claim"]),
+    ]
+    assert run_agent_graph(nodes, claim_ctx=None)["Display"] == "Claim()"
+
+
+def test_failure_skips_everything_downstream_only():
+    events = []
+    nodes = [
+        AgentNode("Claim", _agent("Claim")),
+        AgentNode("Regulatory", _fail, ["Claim"]),
+        AgentNode("Display", _agent("Display"), ["Claim"]),
+        AgentNode("Decision", _agent("Decision"), ["Claim", "Regulatory"]),
+        AgentNode("Validator", _agent("Validator"), ["Decision"]),
+    ]
+    with pytest.raises(AgentGraphError) as raised:
+        run_agent_graph(nodes, claim_ctx=None, on_event=lambda kind, name, data: events.append((kind, name)))
+    error = raised.value
+    assert list(error.failures) == ["Regulatory"]
+    assert list(error.results) == ["Claim", "Display"]
+    assert error.skipped == ["Decision", "Validator"]
+    assert ("failed", "Regulatory") in events
+    assert ("agent", "Decision") not in events
+
+
+def test_completed_agents_are_not_run_again():
+    log = []
+    saved = []
+    nodes = [
+        AgentNode("Claim", _agent("Claim", log)),
+        AgentNode("Regulatory", _agent("Regulatory", log), ["Claim"]),
+    ]
+    results = run_agent_graph(nodes, claim_ctx=None, completed={"Claim": "saved", "Unknown": "x"},
+                              on_result=lambda name, output: saved.append(name))
+    assert results == {"Claim": "saved", "Regulatory": "Regulatory(saved)"}
+    assert log == saved == ["Regulatory"]
+
+
+@pytest.mark.parametrize("nodes, message", [
+    ([AgentNode("A", _agent("A")), AgentNode("A", _agent("A"))], "Duplicate agent names"),
+    ([AgentNode("A", _agent("A"), ["Missing"])], "unknown agents"),
+    ([AgentNode("A", _agent("A"), ["A"])], "Cycle in agent graph between: ['A']"),
+    ([
+        AgentNode("Root", _agent("Root")),
+        AgentNode("A", _agent("A"), ["Root", "C"]),
+        AgentNode("B", _agent("B"), ["A"]),
+        AgentNode("C", _agent("C"), ["B"]),
+        AgentNode("Leaf", _agent("Leaf"), ["A"]),
+    ], "Cycle in agent graph between: ['A', 'B', 'C', 'Leaf']"),
+])
+def test_invalid_graphs_are_rejected(nodes, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        _check_graph(nodes)
+
+
+def test_invalid_graph_runs_nothing():
+    log = []
+    nodes = [AgentNode("Root", _agent("Root", log)), AgentNode("A", _agent("A", log), ["A"])]
+    with pytest.raises(ValueError):
+        run_agent_graph(nodes, claim_ctx=None)
+    assert log == []
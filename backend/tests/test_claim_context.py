@@ -0,0 +1,41 @@
+import pytest
+import checkpoints
+import claim_context
+import csv_reader
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = checkpoints.CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setattr(checkpoints, "_store", store)
+    monkeypatch.setattr(checkpoints, "CHECKPOINTS", True)
+    return store
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "D1111111261.xlsx"
+    path.write_bytes(b"workbook bytes")
+    return str(path)
+
+
+def _rows(path):
+    yield "Txn data", [{"FLD Claim Number": "D1111111261", "FLD TXN Amount": 25.54}]
+
+
+def test_complete_read_is_checkpointed(store, workbook, monkeypatch):
+    monkeypatch.setattr(csv_reader, "iter_workbook_records", _rows)
+    claim_context.load_cached("drc", workbook, claim_context._extract_drc_data)
+    assert "DRCNotesExtraction" in store.latest("D1111111261")
+
+
+def test_failed_read_leaves_no_checkpoint(store, workbook, monkeypatch):
+    def fail_partway(path):
+        yield from _rows(path)
+        raise OSError("Bad zip entry")
+
+    monkeypatch.setattr(csv_reader, "iter_workbook_records", fail_partway)
+    with pytest.raises(OSError):
+        claim_context.load_cached("drc", workbook, claim_context._extract_drc_data)
+    assert store.latest("D1111111261") == {}
+    assert ("drc", workbook) not in claim_context._file_cache
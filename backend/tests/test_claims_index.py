@@ -0,0 +1,59 @@
+import os
+import functools
+import pytest
+import claims_index
+from claims_index import ClaimsIndex
+from workbook_loader import iter_sheet_chunks
+
+COLUMNS = ["FLD Claim Number", "Status", "FLD TXN Date", "FLD TXN Amount"]
+
+
+def _write_workbook(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def _claims(count, prefix="D"):
+    return [[f"{prefix}{i:03}", "Open" if i % 2 else "Closed", 45700 + i, 10.0 + i] for i in range(count)]
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    # Every workbook takes the chunked path, in chunks of 4 rows
+    monkeypatch.setattr(claims_index, "should_stream", lambda path: True)
+    monkeypatch.setattr(claims_index, "iter_sheet_chunks", functools.partial(iter_sheet_chunks, chunk_rows=4))
+
+
+def test_streamed_page_has_full_rows(tmp_path, streamed):
+    _write_workbook(tmp_path / "claims.xlsx", _claims(10))
+    index = ClaimsIndex(str(tmp_path))
+    index.refresh()
+    total, page = index.query(status="open", offset=1, limit=3)
+    assert total == 5
+    assert [row["FLD Claim Number"] for row in page] == ["D003", "D005", "D007"]
+    assert page[0]["FLD TXN Amount"] == 13.0
+    assert page[0]["FLD TXN Date"] == "2025-02-15"
+
+
+def test_streamed_workbook_rewritten_after_indexing(tmp_path, streamed):
+    path = tmp_path / "claims.xlsx"
+    _write_workbook(path, _claims(10))
+    index = ClaimsIndex(str(tmp_path))
+    index.refresh()
+
+    # Shorter and different: the indexed positions no longer point at these rows
+    _write_workbook(path, _claims(2, prefix="X"))
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    total, page = index.query(offset=1, limit=3)
+    assert total == 10
+    assert [row["FLD Claim Number"] for row in page] == ["D001", "D002", "D003"]
+    # Only the indexed filter columns, never another version's rows
+    assert all("FLD TXN Amount" not in row for row in page)
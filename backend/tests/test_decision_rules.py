@@ -0,0 +1,47 @@
+import pytest
+from decision_rules import DecisionGrid, claim_conditions
+
+REVIEWED = "Cardholder reviewed merchant response"
+NO_LONGER_VALID = "Dispute no longer valid"
+SUFFICIENT = "Compelling evidence sufficient"
+
+
+def _answers(note, critical_findings=None):
+    grid = DecisionGrid([SUFFICIENT, REVIEWED, NO_LONGER_VALID], [])
+    validation = {
+        "drc_data": {"Notes": note},
+        "mismatched_fields": [],
+        "critical_findings": critical_findings or [],
+    }
+    return claim_conditions(grid, validation, {"missing_information": []})
+
+
+@pytest.mark.parametrize("note, expected", [
+    ("CH reviewed the merchant's response and has no further questions", None),
+    ("Called CH. CH reviewed the merchant's representment", True),
+    ("CH has not reviewed the merchant's response yet", False),
+    ("CH hasn't seen the rebuttal letter", False),
+    ("Awaiting cardholder review of the merchant response", False),
+    ("CH was sent rebuttal letter", None),
+    ("CH reviewed the merchant response. CH has not reviewed the rebuttal", None),
+    ("Case opened", False),
+])
+def test_reviewed(note, expected):
+    assert _answers(note)[REVIEWED] is expected
+
+
+@pytest.mark.parametrize("note, expected", [
+    ("Cardholder withdrew the dispute", True),
+    ("Dispute no longer valid per CH call", True),
+    ("CH does not accept the charge and wants to continue the dispute", False),
+    ("CH agreed the charge is valid but is still disputing the chargeback", False),
+    ("Case opened", False),
+])
+def test_no_longer_valid(note, expected):
+    assert _answers(note)[NO_LONGER_VALID] is expected
+
+
+def test_critical_findings_make_evidence_insufficient():
+    assert _answers("Case opened")[SUFFICIENT] is True
+    findings = ["No tracking number or proof of delivery in either source"]
+    assert _answers("Case opened", findings)[SUFFICIENT] is False
@@ -0,0 +1,41 @@
+import pytest
+import field_matcher
+from llm_client import LLMRequestError
+
+# Similar enough to be ambiguous, so the pair is sent to the LLM
+PDF_DATA = "Merchant Name: Today Shops Inc"
+DRC_DATA = {"Txn data": [{"FLD Merchant Name": "TODAY SHOPPE"}]}
+
+
+def _reply_with(monkeypatch, reply):
+    monkeypatch.setattr(field_matcher, "chat_completion", lambda *args, **kwargs: reply)
+
+
+def test_resolved_fields_are_used(monkeypatch):
+    _reply_with(monkeypatch, '{"matched_fields": [{"field_name": "Merchant Name"}], "mismatched_fields": []}')
+    result = field_matcher.match_claim(PDF_DATA, DRC_DATA)
+    assert result["matched_fields"] == [{"field_name": "Merchant Name"}]
+    assert result["mismatched_fields"] == []
+
+
+@pytest.mark.parametrize("reply", [
+    "not json",
+    '["Merchant Name"]',
+    '{"matched_fields": "Merchant Name"}',
+    '{"mismatched_fields": ["Merchant Name"]}',
+])
+def test_unusable_reply_marks_fields_for_review(monkeypatch, reply):
+    _reply_with(monkeypatch, reply)
+    result = field_matcher.match_claim(PDF_DATA, DRC_DATA)
+    assert [(entry["field_name"], entry["discrepancy"]) for entry in result["mismatched_fields"]] == [
+        ("Merchant Name", "needs review")
+    ]
+
+
+def test_request_errors_are_raised(monkeypatch):
+    def fail(*args, **kwargs):
+        raise LLMRequestError("LLM request failed after 3 attempts")
+
+    monkeypatch.setattr(field_matcher, "chat_completion", fail)
+    with pytest.raises(LLMRequestError):
+        field_matcher.match_claim(PDF_DATA, DRC_DATA)
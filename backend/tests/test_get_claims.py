@@ -0,0 +1,82 @@
+import os
+import importlib.util
+import pytest
+from claims_index import ClaimsIndex
+from test_claims_index import _claims, _write_workbook
+
+# The repository root's app.py serves /api/getClaims; backend/app.py shadows it by name
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "app.py")
+
+
+@pytest.fixture(scope="module")
+def root_app():
+    spec = importlib.util.spec_from_file_location("root_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    _write_workbook(tmp_path / "a.xlsx", _claims(5, prefix="A"))
+    _write_workbook(tmp_path / "b.xlsx", _claims(4, prefix="B"))
+    return tmp_path
+
+
+@pytest.fixture
+def client(root_app, data_dir, monkeypatch):
+    monkeypatch.setattr(root_app, "claims_index", ClaimsIndex(str(data_dir)))
+    return root_app.app.test_client()
+
+
+def _numbers(response):
+    return [row["FLD Claim Number"] for row in response.get_json()]
+
+
+def test_pages_run_across_workbooks(client):
+    first = client.get("/api/getClaims?limit=4&fields=FLD Claim Number")
+    assert _numbers(first) == ["A000", "A001", "A002", "A003"]
+    assert first.headers["X-Total-Count"] == "9"
+    assert first.headers["X-Next-Offset"] == "4"
+    assert first.get_json()[0] == {"FLD Claim Number": "A000"}
+
+    second = client.get("/api/getClaims?limit=4&offset=4")
+    assert _numbers(second) == ["A004", "B000", "B001", "B002"]
+    last = client.get("/api/getClaims?limit=4&offset=8")
+    assert _numbers(last) == ["B003"]
+    assert "X-Next-Offset" not in last.headers
+
+
+def test_filters_apply_before_paging(client):
+    response = client.get("/api/getClaims?status=closed&date_from=2025-02-13&limit=2")
+    assert _numbers(response) == ["A002", "A004"]
+    assert response.headers["X-Total-Count"] == "3"
+
+
+def test_limit_is_clamped(client, root_app, monkeypatch):
+    monkeypatch.setattr(root_app, "CLAIMS_MAX_PAGE_SIZE", 3)
+    assert len(client.get("/api/getClaims?limit=0").get_json()) == 1
+    assert len(client.get("/api/getClaims?limit=50").get_json()) == 3
+    assert _numbers(client.get("/api/getClaims?offset=-5&limit=1")) == ["A000"]
+
+
+def test_unchanged_page_is_not_modified(client, data_dir):
+    first = client.get("/api/getClaims?limit=2")
+    etag = first.headers["ETag"]
+    assert client.get("/api/getClaims?limit=2", headers={"If-None-Match": etag}).status_code == 304
+    # Another query has another ETag
+    assert client.get("/api/getClaims?limit=3", headers={"If-None-Match": etag}).status_code == 200
+
+    _write_workbook(data_dir / "b.xlsx", _claims(6, prefix="B"))
+    stat = os.stat(data_dir / "b.xlsx")
+    os.utime(data_dir / "b.xlsx", (stat.st_atime, stat.st_mtime + 10))
+    changed = client.get("/api/getClaims?limit=2", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["X-Total-Count"] == "11"
+
+
+def test_status_filter_needs_the_status_column(client, root_app, monkeypatch):
+    monkeypatch.setattr(root_app, "STATUS_COLUMN", "Claim Status")
+    response = client.get("/api/getClaims?status=open")
+    assert response.status_code == 400
+    assert "Claim Status" in response.get_json()["error"]
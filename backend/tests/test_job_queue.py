@@ -0,0 +1,125 @@
+import pytest
+import job_queue
+import job_worker
+import RegulatoryAgent
+from agent_graph import AgentNode, run_agent_graph
+from job_queue import JobQueue
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / "job_queue.sqlite3"), lease_seconds=120, max_attempts=3, retry_delay=30)
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once(queue, clock):
+    first = queue.enqueue("D1")
+    clock.now += 1
+    second = queue.enqueue("D2")
+    assert queue.claim("worker-1")["job_id"] == first
+    assert queue.claim("worker-2")["job_id"] == second
+    assert queue.claim("worker-3") is None
+    assert queue.counts() == {"running": 2}
+
+
+def test_expired_lease_hands_the_job_to_another_worker(queue, clock):
+    job_id = queue.enqueue("D1")
+    queue.claim("worker-1")
+    clock.now += 119
+    assert queue.renew(job_id, "worker-1")
+    clock.now += 119
+    assert queue.claim("worker-2") is None
+
+    clock.now += 121
+    job = queue.claim("worker-2")
+    assert (job["job_id"], job["worker"], job["attempts"]) == (job_id, "worker-2", 2)
+    # The first worker finds out on its next renewal and its result is ignored
+    assert not queue.renew(job_id, "worker-1")
+    queue.complete(job_id, "worker-1", {"stale": True})
+    assert queue.get(job_id)["status"] == "running"
+
+
+def test_job_that_keeps_losing_its_worker_is_failed(queue, clock):
+    job_id = queue.enqueue("D1")
+    for attempt in range(3):
+        assert queue.claim(f"worker-{attempt}")["attempts"] == attempt + 1
+        clock.now += 121
+    assert queue.claim("worker-4") is None
+    job = queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "Worker lost")
+
+
+def test_failed_attempts_are_retried_with_growing_delay(queue, clock):
+    job_id = queue.enqueue("D1")
+    for delay in (30, 60):
+        queue.claim("worker-1")
+        queue.fail(job_id, "worker-1", "LLM unavailable")
+        assert queue.get(job_id)["status"] == "queued"
+        clock.now += delay - 1
+        assert queue.claim("worker-1") is None
+        clock.now += 1
+    queue.claim("worker-1")
+    queue.fail(job_id, "worker-1", "LLM unavailable")
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 3, "LLM unavailable")
+
+
+def test_failure_without_retry_is_final(queue):
+    job_id = queue.enqueue("D1")
+    queue.claim("worker-1")
+    queue.fail(job_id, "worker-1", "Files for given claim ID not found", retry=False)
+    assert queue.get(job_id)["status"] == "failed"
+
+
+@pytest.fixture
+def claim_files(tmp_path):
+    for name in ("D1.xlsx", "D1.txt"):
+        (tmp_path / name).write_text("")
+    return str(tmp_path)
+
+
+def test_retry_resumes_after_the_checkpointed_agents(queue, clock, claim_files, monkeypatch):
+    ran = []
+    crash = {"Regulatory": True}
+
+    def agent(name):
+        def func(claim_ctx, *inputs):
+            ran.append(name)
+            if crash.pop(name, False):
+                raise RuntimeError("worker killed")
+            return f"{name} output"
+        return func
+
+    nodes = [
+        AgentNode("Claim", agent("Claim")),
+        AgentNode("Display", agent("Display"), ["Claim"]),
+        AgentNode("Regulatory", agent("Regulatory"), ["Display"]),
+    ]
+    monkeypatch.setattr(RegulatoryAgent, "run_representment_pipeline",
+                        lambda claim_ctx, completed, on_result: run_agent_graph(
+                            nodes, claim_ctx, completed=completed, on_result=on_result))
+
+    job_id = queue.enqueue("D1", claim_files)
+    job_worker.run_job(queue, queue.claim("worker-1"), "worker-1")
+    assert sorted(queue.get(job_id)["completed_agents"]) == ["Claim", "Display"]
+
+    clock.now += 30
+    job_worker.run_job(queue, queue.claim("worker-2"), "worker-2")
+    job = queue.get(job_id)
+    assert job["status"] == "completed"
+    assert job["result"]["Regulatory"] == "Regulatory output"
+    assert ran == ["Claim", "Display", "Regulatory", "Regulatory"]
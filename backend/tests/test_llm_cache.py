@@ -0,0 +1,115 @@
+import pytest
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+from llm_client import ChatCompletionsClient
+
+MESSAGES = [{"role": "user", "content": "Input"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def test_key_ignores_parameter_order():
+    assert cache_key("m", MESSAGES, {"a": 1, "b": 2}) == cache_key("m", MESSAGES, {"b": 2, "a": 1})
+    assert cache_key("m", MESSAGES, {"a": 1}) != cache_key("other", MESSAGES, {"a": 1})
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2, ttl=0, db_path=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl=60, db_path=None)
+    cache.set("a", 1)
+    clock.now += 60
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_disk_tier_survives_a_new_cache(clock, tmp_path):
+    db_path = str(tmp_path / "llm_cache.sqlite3")
+    ResponseCache(max_entries=10, ttl=60, db_path=db_path).set("a", {"choices": []})
+    cache = ResponseCache(max_entries=10, ttl=60, db_path=db_path)
+    assert cache.get("a") == {"choices": []}
+    assert cache.stats()["disk_hits"] == 1
+    # Promoted to memory on the way out
+    assert cache.get("a") == {"choices": []}
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_disk_tier_drops_expired_and_least_recently_used_entries(clock, tmp_path):
+    cache = ResponseCache(max_entries=0, ttl=60, db_path=str(tmp_path / "llm_cache.sqlite3"), max_db_entries=2)
+    cache.set("old", 0)
+    clock.now += 61
+    assert cache.get("old") is None
+
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    assert cache.get("a") == 1
+    clock.now += 1
+    cache.set("c", 3)
+    assert [cache.get(key) for key in ("a", "b", "c")] == [1, None, 3]
+
+
+def _response(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = ChatCompletionsClient(url="http://llm.invalid", cache=ResponseCache(max_entries=10, db_path=None))
+    client.sent = []
+
+    def create(messages, params, timing):
+        client.sent.append(client.replies.pop(0))
+        return _response(client.sent[-1])
+
+    monkeypatch.setattr(client, "_create", create)
+    return client
+
+
+def test_identical_requests_are_answered_from_the_cache(client):
+    client.replies = ["one", "two"]
+    assert client.create(MESSAGES) == _response("one")
+    assert client.create(MESSAGES) == _response("one")
+    assert client.create(MESSAGES, use_cache=False) == _response("two")
+    assert client.sent == ["one", "two"]
+
+
+def test_rejected_replies_are_not_cached(client):
+    client.replies = ["not json", "{}", "never sent"]
+    accept = lambda content: content.startswith("{")
+    assert client.create(MESSAGES, accept=accept) == _response("not json")
+    assert client.create(MESSAGES, accept=accept) == _response("{}")
+    assert client.create(MESSAGES, accept=accept) == _response("{}")
+    assert client.sent == ["not json", "{}"]
+
+
+def test_cached_replies_are_checked_before_they_are_served(client):
+    client.replies = ["not json", "{}"]
+    client.create(MESSAGES)
+    assert client.create(MESSAGES, accept=lambda content: content.startswith("{")) == _response("{}")
+    assert client.sent == ["not json", "{}"]
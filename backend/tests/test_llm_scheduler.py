@@ -0,0 +1,172 @@
+import pytest
+import llm_scheduler
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from llm_scheduler import CircuitBreaker, CircuitOpenError, RequestScheduler, retry_after_seconds
+
+
+class FakeClock:
+    """
+    Stands in for the time module: sleeping only moves the clock forward.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class HTTPError(Exception):
+    def __init__(self, status=None, headers=None, partial=False):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers
+        self.partial = partial
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_scheduler, "time", clock)
+    # Full jitter always picks the top of the window, so delays are predictable
+    monkeypatch.setattr(llm_scheduler.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def _send(*outcomes):
+    calls = []
+
+    def send():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    send.calls = calls
+    return send
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"Retry-After": "7"}, 7.0),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after-ms": "1500", "Retry-After": "9"}, 1.5),
+    ({"Retry-After": "soon"}, None),
+    ({}, None),
+    (None, None),
+])
+def test_retry_after_seconds(headers, expected):
+    assert retry_after_seconds(headers) == expected
+
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert 50 < retry_after_seconds({"Retry-After": format_datetime(when, usegmt=True)}) <= 60
+
+
+def test_retries_with_exponential_backoff(clock):
+    scheduler = RequestScheduler(max_retries=3, backoff_base=0.5, backoff_max=30)
+    send = _send(HTTPError(503), HTTPError(500), "ok")
+    assert scheduler.run(send) == "ok"
+    assert clock.sleeps == [0.5, 1.0]
+
+
+def test_backoff_is_capped(clock):
+    scheduler = RequestScheduler(max_retries=5, backoff_base=1, backoff_max=3)
+    scheduler.run(_send(*[HTTPError(502)] * 4, "ok"))
+    assert clock.sleeps == [1, 2, 3, 3]
+
+
+def test_gives_up_after_max_retries(clock):
+    scheduler = RequestScheduler(max_retries=2, breaker=CircuitBreaker(threshold=10))
+    send = _send(HTTPError(503), HTTPError(503), HTTPError(503), "never sent")
+    with pytest.raises(HTTPError):
+        scheduler.run(send)
+    assert len(send.calls) == 3
+
+
+@pytest.mark.parametrize("error", [HTTPError(400), HTTPError(401), HTTPError(503, partial=True)])
+def test_non_retryable_errors_are_raised_at_once(clock, error):
+    send = _send(error, "never sent")
+    with pytest.raises(HTTPError):
+        RequestScheduler(max_retries=3).run(send)
+    assert len(send.calls) == 1
+    assert clock.sleeps == []
+
+
+def test_retry_after_extends_the_backoff(clock):
+    scheduler = RequestScheduler(max_retries=3, backoff_base=0.5)
+    scheduler.run(_send(HTTPError(503, headers={"Retry-After": "4"}), "ok"))
+    assert clock.sleeps == [4.0]
+
+
+def test_throttling_pauses_every_caller(clock):
+    scheduler = RequestScheduler(max_retries=3, backoff_base=0.5)
+    scheduler.run(_send(HTTPError(429, headers={"retry-after": "5"}), "ok"))
+    assert scheduler._paused_until == 1005.0
+
+    # A caller arriving during the pause waits it out before sending
+    clock.now = 1002.0
+    clock.sleeps.clear()
+    scheduler.run(_send("ok"))
+    assert clock.sleeps == [3.0]
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+
+def test_breaker_lets_one_trial_through_when_half_open(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half-open"
+    breaker.before()
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before()
+
+
+def test_failed_trial_reopens_the_circuit(clock):
+    breaker = CircuitBreaker(threshold=5, cooldown=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    breaker.before()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_client_errors_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=30)
+    scheduler = RequestScheduler(max_retries=0, breaker=breaker)
+    for error in (HTTPError(503), HTTPError(429), HTTPError(503)):
+        with pytest.raises(HTTPError):
+            scheduler.run(_send(error))
+    assert breaker.state == "closed"
+
+    with pytest.raises(HTTPError):
+        scheduler.run(_send(HTTPError(503)))
+    with pytest.raises(CircuitOpenError):
+        scheduler.run(_send("never sent"))
@@ -0,0 +1,95 @@
+import os
+import pytest
+import results_store
+from results_store import ResultsStore, summarise
+
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_750_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(results_store, "time", clock)
+    return clock
+
+
+def _store(tmp_path, **settings):
+    settings = {"retention_days": 30, "keep_per_claim": 3, "prune_every": 0, **settings}
+    return ResultsStore(str(tmp_path / "results.sqlite3"), **settings)
+
+
+def _result(decision="Representment"):
+    return {"DecisionAgent": {"Final Decision recommendation": f"**{decision}**"}}
+
+
+def test_summary_is_read_from_nested_agent_outputs():
+    results = {"RegulatoryAgent": '{"dispute": {"reason_code": "13.1"}}', **_result()}
+    assert summarise(results) == ("Representment", "13.1")
+    assert summarise({"SummarizerAgent": "## Summary"}) == (None, None)
+
+
+def test_expired_runs_are_deleted(tmp_path, clock):
+    store = _store(tmp_path)
+    old = store.save("D1", "RepresentmentPipeline", _result())
+    clock.now += 20 * DAY
+    recent = store.save("D1", "RepresentmentPipeline", _result())
+    clock.now += 11 * DAY
+    assert store.apply_retention() == 1
+    assert store.get(old) is None
+    assert store.get(recent)["result"] == _result()
+
+
+def test_only_the_newest_runs_of_each_claim_are_kept(tmp_path, clock):
+    store = _store(tmp_path)
+    runs = {"D1": [], "D2": []}
+    for _ in range(5):
+        for claim_id in runs:
+            runs[claim_id].append(store.save(claim_id, "RepresentmentPipeline", _result()))
+            clock.now += 1
+    store.save("D3", "RepresentmentPipeline", _result())
+
+    assert store.apply_retention() == 4
+    for claim_id, run_ids in runs.items():
+        _, page = store.query(claim_id=claim_id)
+        assert [entry["run_id"] for entry in page] == run_ids[:1:-1]
+    assert store.query(claim_id="D3")[0] == 1
+
+
+def test_zero_settings_keep_everything(tmp_path, clock):
+    store = _store(tmp_path, retention_days=0, keep_per_claim=0)
+    for _ in range(5):
+        store.save("D1", "RepresentmentPipeline", _result())
+    clock.now += 1000 * DAY
+    assert store.apply_retention() == 0
+    assert store.query()[0] == 5
+
+
+def test_retention_runs_every_prune_every_saves(tmp_path, clock):
+    store = _store(tmp_path, keep_per_claim=2, prune_every=3)
+    counts = []
+    for _ in range(4):
+        store.save("D1", "RepresentmentPipeline", _result())
+        clock.now += 1
+        counts.append(store.query()[0])
+    assert counts == [1, 2, 2, 3]
+
+
+def test_pruned_space_is_returned_to_the_file_system(tmp_path, clock):
+    store = _store(tmp_path, keep_per_claim=1)
+    padding = os.urandom(4096).hex()
+    for i in range(200):
+        store.save(f"D{i % 2}", "RepresentmentPipeline", {"padding": padding})
+        clock.now += 1
+    store._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    pages_before = store._db.execute("PRAGMA page_count").fetchone()[0]
+    assert store.apply_retention() == 198
+    store._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    assert store._db.execute("PRAGMA page_count").fetchone()[0] < pages_before / 10
@@ -0,0 +1,99 @@
+import json
+import pytest
+import structured_output
+from structured_output import SCHEMAS, SchemaValidationError, parse_reply, structured_completion, validate
+
+DECISION = {
+    "information_considered": ["Merchant response"],
+    "Final Decision recommendation": "Representment",
+    "justification": "Proof of delivery provided",
+}
+
+
+@pytest.mark.parametrize("reply", [
+    json.dumps(DECISION),
+    f"```json\n{json.dumps(DECISION, indent=2)}\n```",
+    f"```\n{json.dumps(DECISION)}\n```",
+    f"  ```JSON {json.dumps(DECISION)}```  ",
+    f"Here is the decision:\n{json.dumps(DECISION)}\nLet me know if you need more.",
+    f"Here is the decision:\n```json\n{json.dumps(DECISION)}\n```",
+])
+def test_parse_reply(reply):
+    assert parse_reply(reply) == DECISION
+
+
+@pytest.mark.parametrize("reply", ["Representment", "```json\n{not json}\n```", "} {", ""])
+def test_parse_reply_without_json(reply):
+    assert parse_reply(reply) is None
+
+
+def test_valid_reply_has_no_errors():
+    assert validate(DECISION, SCHEMAS["decision"]) == []
+
+
+def test_missing_keys_and_wrong_types_are_reported():
+    errors = validate({"Final Decision recommendation": 1}, SCHEMAS["decision"])
+    assert errors == [
+        '$ is missing "information_considered"',
+        '$ is missing "justification"',
+        "$.Final Decision recommendation must be of type string",
+    ]
+
+
+def test_enum_and_nested_items_are_checked():
+    validator = {"Guardrails Check": "pass", "Review Summary": "ok", "Recommendations": []}
+    assert validate(validator, SCHEMAS["validator"]) == ["$.Guardrails Check must be one of Pass, Fail"]
+
+    claim = {"matched_fields": [{"field_name": "ARN"}, {"pdf_value": "1"}], "mismatched_fields": [],
+             "missing_fields": {"pdf_missing": ["Order", 7]}}
+    assert validate(claim, SCHEMAS["claim_validation"]) == [
+        '$.matched_fields[1] is missing "field_name"',
+        "$.missing_fields.pdf_missing[1] must be of type string",
+    ]
+
+
+def test_booleans_are_not_numbers():
+    assert validate(True, {"type": "number"}) == ["$ must be of type number"]
+    assert validate(3, {"type": ["number", "string"]}) == []
+
+
+class FakeLLM:
+    """
+    Returns the queued replies in order and records what each call was sent.
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.sent = []
+
+    def __call__(self, prompt, system=None, accept=None, **params):
+        reply = self.queue.pop(0)
+        self.sent.append({"prompt": prompt, "accept": accept, "reply": reply})
+        return reply
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(structured_output, "chat_completion", llm)
+    monkeypatch.setattr(structured_output, "SCHEMA_RETRIES", 1)
+    return llm
+
+
+def test_invalid_reply_is_asked_again(replies):
+    replies.queue = ['{"justification": "x"}', f"```json\n{json.dumps(DECISION)}\n```"]
+    assert structured_completion("Decide in JSON", "decision").data == DECISION
+    reask = replies.sent[1]["prompt"]
+    assert reask.startswith("Decide in JSON")
+    assert '$ is missing "information_considered"' in reask
+    # Only replies that pass are let into the response cache
+    accept = replies.sent[0]["accept"]
+    assert not accept(replies.sent[0]["reply"]) and accept(replies.sent[1]["reply"])
+
+
+def test_gives_up_after_the_retries(replies):
+    replies.queue = ["no", "still no"]
+    with pytest.raises(SchemaValidationError) as raised:
+        structured_completion("Decide in JSON", "decision")
+    assert raised.value.errors == ["the reply is not valid JSON"]
+    assert len(replies.sent) == 2
@@ -0,0 +1,81 @@
+import json
+import threading
+from token_budget import deep_merge, estimate_tokens, merge_replies, run_chunked, split_to_budget
+
+NOTES = {
+    "claim_number": "D1111111261",
+    "Notes": [{"date": f"2025-03-{i % 28 + 1:02}", "text": f"Called cardholder about order {i}. " * 5}
+              for i in range(60)],
+}
+
+
+def test_data_within_budget_is_not_split():
+    assert split_to_budget(NOTES, estimate_tokens(NOTES)) == [NOTES]
+
+
+def test_rows_are_split_with_the_other_fields_kept():
+    budget = estimate_tokens(NOTES) // 5
+    chunks = split_to_budget(NOTES, budget)
+    assert len(chunks) >= 5
+    assert all(estimate_tokens(chunk) <= budget for chunk in chunks)
+    assert all(chunk["claim_number"] == "D1111111261" for chunk in chunks)
+    assert [row for chunk in chunks for row in chunk["Notes"]] == NOTES["Notes"]
+
+
+def test_long_text_is_cut_at_paragraph_breaks():
+    paragraphs = [f"Paragraph {i}: " + "the merchant shipped the order. " * 20 for i in range(12)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_to_budget(text, estimate_tokens(text) // 4)
+    assert len(chunks) >= 4
+    assert "".join(chunks) == text
+    assert all(chunk.startswith("Paragraph") for chunk in chunks)
+
+
+def test_unsplittable_value_is_returned_whole():
+    assert split_to_budget("x" * 5000, 10) == ["x" * 5000]
+
+
+def test_deep_merge():
+    base = {"Txn": {"Amount": "", "Date": "2025-02-20"}, "Refs": ["A"], "Status": "Open"}
+    extra = {"Txn": {"Amount": "25.54", "Date": "2025-02-21"}, "Refs": ["A", "B"], "Status": "Closed", "New": 1}
+    assert deep_merge(base, extra) == {
+        "Txn": {"Amount": "25.54", "Date": "2025-02-20"}, "Refs": ["A", "B"], "Status": "Open", "New": 1,
+    }
+
+
+def test_replies_are_merged_and_unparsed_ones_kept():
+    replies = ['{"Notes": ["call"], "Amount": null}', '```json\n{"Notes": ["letter"], "Amount": 25.54}\n```', "sorry"]
+    assert json.loads(merge_replies(replies)) == {
+        "Notes": ["call", "letter"], "Amount": 25.54, "unparsed_chunks": ["sorry"],
+    }
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, system=None):
+        with self._lock:
+            self.calls.append((prompt, system))
+            return json.dumps({"chunk": [len(self.calls)]})
+
+
+def _build_prompt(payload):
+    return f"Data:\n{json.dumps(payload)}"
+
+
+def test_prompt_within_budget_is_sent_once():
+    llm = FakeLLM()
+    assert run_chunked(_build_prompt, NOTES, "notes", budget=100_000, complete=llm, system="Extract") == '{"chunk": [1]}'
+    assert llm.calls == [(_build_prompt(NOTES), "Extract")]
+
+
+def test_prompt_over_budget_is_sent_in_merged_chunks():
+    llm = FakeLLM()
+    reply = run_chunked(_build_prompt, NOTES, "notes", budget=estimate_tokens(NOTES) // 3, complete=llm, system="Extract")
+    assert len(llm.calls) > 1
+    assert all(system == "Extract" for _, system in llm.calls)
+    assert sorted(json.loads(reply)["chunk"]) == list(range(1, len(llm.calls) + 1))
+    sent_rows = [row for prompt, _ in llm.calls for row in json.loads(prompt[len("Data:\n"):])["Notes"]]
+    assert sorted(sent_rows, key=NOTES["Notes"].index) == NOTES["Notes"]
@@ -0,0 +1,62 @@
+import pytest
+import workbook_loader
+from workbook_loader import _header, iter_workbook_records, read_workbook_records
+
+HEADERS = [
+    ["A", "B", "C"],
+    ["A", "A", "B", None, "A"],
+    ["A", "A.1", "A"],
+    ["A", "A", "A.1"],
+    ["A", "A", "A.1", "A.1"],
+    ["A", None, "A", None],
+    ["Unnamed: 1", None, "x"],
+    [2024, 2024, "Total"],
+]
+
+
+@pytest.mark.parametrize("header", HEADERS)
+def test_header_matches_pandas(tmp_path, header):
+    import pandas as pd
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    workbook.active.append(header)
+    workbook.active.append([1] * len(header))
+    path = tmp_path / "header.xlsx"
+    workbook.save(path)
+    assert _header(header) == [str(column) for column in pd.read_excel(path).columns]
+
+
+@pytest.mark.parametrize("header, expected", [
+    (["A", "A", "B", None, "A"], ["A", "A.1", "B", "Unnamed: 3", "A.2"]),
+    (["A", "A", "A.1"], ["A", "A.2", "A.1"]),
+])
+def test_header_names(header, expected):
+    assert _header(header) == expected
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    claims = workbook.active
+    claims.title = "Claims"
+    claims.append(["Claim", "Amount", "Amount"])
+    for i in range(5):
+        claims.append([f"D{i}", i, None if i % 2 else i * 2])
+    notes = workbook.create_sheet("Notes")
+    notes.append(["Note"])
+    notes.append(["Called CH"])
+    path = tmp_path / "claims.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+def test_streamed_records_come_in_chunks(workbook, monkeypatch):
+    monkeypatch.setattr(workbook_loader, "should_stream", lambda path: True)
+    chunks = list(iter_workbook_records(workbook, chunk_rows=2))
+    assert [(sheet, len(rows)) for sheet, rows in chunks] == [("Claims", 2), ("Claims", 2), ("Claims", 1), ("Notes", 1)]
+    # Empty cells are left out rather than held as NaN
+    assert chunks[0][1] == [{"Claim": "D0", "Amount": 0, "Amount.1": 0}, {"Claim": "D1", "Amount": 1}]
+    assert read_workbook_records(workbook)["Notes"] == [{"Note": "Called CH"}]
@@ -0,0 +1,155 @@
+import os
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import chat_completion
+from prompt_payload import count_tokens, encode_payload, parse_json_text
+from metrics import bind
+
+logger = logging.getLogger("TokenBudget")
+
+# Prompt size (instructions + data) above which the data is split into chunks
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "12000"))
+# Chunks of one prompt sent at the same time; LLM_MAX_INFLIGHT still caps the total
+CHUNK_WORKERS = int(os.environ.get("LLM_CHUNK_WORKERS", "4"))
+# Never cut the data into pieces smaller than this, whatever the instructions cost
+MIN_CHUNK_TOKENS = 1000
+
+# Preferred places to cut long text, best first (page break, paragraph, line, sentence, word)
+_TEXT_BREAKS = ("\f", "\n\n", "\n", ". ", " ")
+
+
+def estimate_tokens(value):
+    """
+    Prompt tokens `value` takes once encoded with encode_payload.
+    """
+    return count_tokens(encode_payload(value))
+
+
+def _as_data(value):
+    # Agent output handed on as JSON text can only be split once parsed
+    if isinstance(value, str) and value.lstrip()[:1] in ("{", "[", "`"):
+        parsed = parse_json_text(value)
+        if parsed is not None:
+            return parsed
+    if isinstance(value, dict):
+        return {key: _as_data(item) for key, item in value.items()}
+    return value
+
+
+def _halve_text(text):
+    middle = len(text) // 2
+    for separator in _TEXT_BREAKS:
+        # Closest break to the middle, so the halves come out about the same size
+        before = text.rfind(separator, 0, middle)
+        after = text.find(separator, middle)
+        candidates = [i for i in (before, after) if i > 0]
+        if candidates:
+            cut = min(candidates, key=lambda i: abs(i - middle)) + len(separator)
+            if 0 < cut < len(text):
+                return text[:cut], text[cut:]
+    return None
+
+
+def _halve(value):
+    """
+    Splits the largest list or text inside `value` in two, keeping every other
+    field (claim number, column headers...) in both halves. None when nothing
+    can be split further.
+    """
+    if isinstance(value, str):
+        return _halve_text(value) if len(value) > 1 else None
+    if isinstance(value, list):
+        if len(value) > 1:
+            middle = len(value) // 2
+            return value[:middle], value[middle:]
+        if len(value) == 1:
+            halves = _halve(value[0])
+            return ([halves[0]], [halves[1]]) if halves else None
+        return None
+    if isinstance(value, dict) and value:
+        largest = max(value, key=lambda key: len(encode_payload(value[key])))
+        halves = _halve(value[largest])
+        if halves is None:
+            return None
+        return {**value, largest: halves[0]}, {**value, largest: halves[1]}
+    return None
+
+
+def split_to_budget(value, budget):
+    """
+    Cuts `value` into pieces that each encode to at most `budget` tokens.
+    Rows are split between rows and text at page, paragraph or line breaks.
+    """
+    if estimate_tokens(value) <= budget:
+        return [value]
+    halves = _halve(value)
+    if halves is None:
+        return [value]
+    return [chunk for half in halves for chunk in split_to_budget(half, budget)]
+
+
+def _is_blank(value):
+    return value is None or value in ("", "null", "N/A", [], {})
+
+
+def deep_merge(base, extra):
+    """
+    Merges two partial extractions: dicts key by key, lists without
+    duplicates, and for plain values the first non-blank one wins.
+    """
+    if isinstance(base, dict) and isinstance(extra, dict):
+        merged = dict(base)
+        for key, value in extra.items():
+            merged[key] = deep_merge(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(base, list) and isinstance(extra, list):
+        return base + [item for item in extra if item not in base]
+    return extra if _is_blank(base) else base
+
+
+def merge_replies(replies):
+    """
+    Combines the JSON replies of the chunks of one prompt into a single JSON string.
+    """
+    merged = {}
+    unparsed = []
+    for reply in replies:
+        parsed = parse_json_text(reply)
+        if isinstance(parsed, dict):
+            merged = deep_merge(merged, parsed)
+        else:
+            unparsed.append(reply)
+    if unparsed:
+        merged["unparsed_chunks"] = unparsed
+    return json.dumps(merged)
+
+
+def run_chunked(build_prompt, payload, label, budget=None, complete=chat_completion, system=None):
+    """
+    Sends build_prompt(payload) as one request when it fits the budget.
+
+    Otherwise the payload is split so every prompt fits, the chunks are sent
+    concurrently and the JSON replies are deep-merged, so a long note history
+    or OCR dump costs a few parallel requests instead of overflowing the
+    context window. `complete(prompt, system=system)` makes each request;
+    the system instructions count towards every chunk's budget.
+    """
+    budget = budget or PROMPT_TOKEN_BUDGET
+    payload = _as_data(payload)
+    prompt = build_prompt(payload)
+    total = count_tokens(prompt) + (count_tokens(system) if system else 0)
+    if total <= budget:
+        logger.info("%s: ~%d prompt tokens", label, total)
+        return complete(prompt, system=system)
+
+    overhead = total - estimate_tokens(payload)
+    chunks = split_to_budget(payload, max(budget - overhead, MIN_CHUNK_TOKENS))
+    logger.info("%s: ~%d prompt tokens over the %d budget, sending %d chunks", label, total, budget, len(chunks))
+    if len(chunks) == 1:
+        return complete(prompt, system=system)
+
+    with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(chunks)), thread_name_prefix="chunk") as pool:
+        # bind() keeps the chunk calls attributed to the agent that split them
+        replies = list(pool.map(bind(lambda chunk: complete(build_prompt(chunk), system=system)), chunks))
+    return merge_replies(replies)
@@ -0,0 +1,85 @@
+import json
+import queue
+import logging
+import threading
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from claim_context import ClaimContext
+from metrics import RequestTimings, collect
+from RegulatoryAgent import run_representment_pipeline
+
+logger = logging.getLogger("ValidateStream")
+
+stream_bp = Blueprint("validate_stream", __name__)
+
+_DONE = object()
+
+
+def _sse(event, data):
+    """
+    Formats one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@stream_bp.route('/api/validate/stream', methods=['GET', 'POST'])
+def validate_dispute_reason_stream():
+    """
+    Streaming variant of /api/validate.
+
+    Emits `delta` events with each agent's token deltas, an `agent` event with
+    the full output as soon as that agent finishes (`agent_error` if it
+    failed), then a final `done` event with the complete result and per-agent
+    timings (or `error`). GET with ?claim_id= works with the browser's
+    EventSource.
+    """
+    claim_id = request.args.get("claim_id") or (request.get_json(silent=True) or {}).get("claim_id")
+    if not claim_id:
+        return jsonify({"success": False, "error": "Claim ID not provided"}), 400
+    try:
+        claim_ctx = ClaimContext(claim_id, current_app.config.get("DATA_DIR"))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if not claim_ctx.exists():
+        return jsonify({"success": False, "error": "Files for given claim ID not found"}), 404
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            with collect(RequestTimings()) as timings:
+                result = run_representment_pipeline(
+                    claim_ctx,
+                    on_event=lambda kind, agent, payload: events.put((kind, agent, payload)),
+                )
+            events.put(("done", None, (result, timings.summary())))
+        except Exception as e:
+            logger.error("Streaming validation of %s failed: %s", claim_id, e)
+            events.put(("error", None, str(e)))
+        events.put(_DONE)
+
+    # The pipeline keeps running if the client goes away; its LLM replies still land in the cache
+    threading.Thread(target=run, name=f"stream-{claim_id}", daemon=True).start()
+
+    def generate():
+        while True:
+            item = events.get()
+            if item is _DONE:
+                return
+            kind, agent, payload = item
+            if kind == "delta":
+                yield _sse("delta", {"agent": agent, "delta": payload})
+            elif kind == "agent":
+                yield _sse("agent", {"agent": agent, "output": payload})
+            elif kind == "failed":
+                yield _sse("agent_error", {"agent": agent, "error": payload})
+            elif kind == "done":
+                result, timings = payload
+                yield _sse("done", {"success": True, "result": result, "timings": timings})
+            else:
+                yield _sse("error", {"success": False, "error": payload})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
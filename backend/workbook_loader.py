@@ -0,0 +1,162 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Parsed workbooks kept in memory, most recently used last
+WORKBOOK_CACHE_SIZE = int(os.environ.get("WORKBOOK_CACHE_SIZE", "32"))
+# Larger workbooks are streamed row by row with openpyxl instead of loaded whole
+STREAM_THRESHOLD_MB = float(os.environ.get("WORKBOOK_STREAM_THRESHOLD_MB", "50"))
+STREAM_CHUNK_ROWS = int(os.environ.get("WORKBOOK_STREAM_CHUNK_ROWS", "5000"))
+
+_cache = OrderedDict()  # path -> (mtime, {sheet name: DataFrame})
+_cache_lock = threading.Lock()
+
+
+def load_workbook_sheets(path):
+    """
+    Parses every sheet of an Excel workbook in a single pass.
+
+    Returns {sheet name: DataFrame}, reusing the previous parse while the
+    file's mtime is unchanged. Callers get copies, so they are free to modify
+    the frames without touching the cache.
+    """
+    import pandas as pd  # deferred: pandas alone costs ~0.3 s of import time
+
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(path)
+            return {name: df.copy() for name, df in cached[1].items()}
+
+    # sheet_name=None opens and parses the file once for all sheets
+    sheets = pd.read_excel(path, sheet_name=None)
+    with _cache_lock:
+        _cache[path] = (mtime, sheets)
+        _cache.move_to_end(path)
+        while len(_cache) > WORKBOOK_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return {name: df.copy() for name, df in sheets.items()}
+
+
+def read_workbook_records(path):
+    """
+    All sheets of a workbook as {sheet name: list of row dicts}.
+
+    Workbooks over STREAM_THRESHOLD_MB are streamed instead of parsed into
+    pandas first; their rows leave out empty cells rather than holding NaN.
+    The whole workbook still ends up in memory: use iter_workbook_records to
+    process it chunk by chunk.
+    """
+    records = {}
+    for sheet_name, rows in iter_workbook_records(path):
+        records.setdefault(sheet_name, []).extend(rows)
+    return records
+
+
+def should_stream(path):
+    """
+    True for workbooks big enough that loading them whole risks running out of memory.
+    """
+    return os.path.getsize(path) > STREAM_THRESHOLD_MB * 1024 * 1024
+
+
+def _header(values):
+    """
+    Column names for a header row, as pandas would name them: blank cells
+    become "Unnamed: <i>" and repeated names get a ".1", ".2", ... suffix,
+    so both paths produce the same columns.
+    """
+    columns = [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(values)]
+    header = set(columns)
+    counts = {}
+    # pandas renames the named columns first and skips suffixes already in the header
+    for i in sorted(range(len(columns)), key=lambda i: values[i] is None):
+        name = column = columns[i]
+        count = counts.get(name, 0)
+        while count:
+            counts[name] = count + 1
+            column = f"{name}.{count}"
+            count = count + 1 if column in header else counts.get(column, 0)
+        columns[i] = column
+        counts[column] = count + 1
+    return columns
+
+
+def iter_sheet_rows(path):
+    """
+    Yields (sheet name, row dict) for every non-empty row, reading the file
+    lazily with openpyxl's read-only mode. Empty cells are left out of the dict.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = _header(header)
+            for values in rows:
+                row = {column: value for column, value in zip(columns, values) if value is not None and value != ""}
+                if row:
+                    yield sheet.title, row
+    finally:
+        workbook.close()
+
+
+def iter_sheet_chunks(path, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yields (sheet name, DataFrame) chunks of at most `chunk_rows` rows, so
+    column-wise processing works on files far larger than memory.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            columns = _header(header)
+            chunk = []
+            for values in rows:
+                if all(value is None for value in values):
+                    continue
+                chunk.append(values[:len(columns)])
+                if len(chunk) >= chunk_rows:
+                    yield sheet.title, pd.DataFrame.from_records(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield sheet.title, pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_workbook_records(path, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yields (sheet name, list of row dicts) for every sheet of a workbook.
+
+    Workbooks over STREAM_THRESHOLD_MB are read row by row and handed out in
+    chunks of at most `chunk_rows` rows, so a caller that drops each chunk
+    once it is done never holds the whole workbook; smaller ones come from
+    the cached parse, one chunk per sheet.
+    """
+    if not should_stream(path):
+        for sheet_name, df in load_workbook_sheets(path).items():
+            yield sheet_name, df.to_dict(orient="records")
+        return
+
+    chunk_sheet, chunk = None, []
+    for sheet_name, row in iter_sheet_rows(path):
+        if chunk and (sheet_name != chunk_sheet or len(chunk) >= chunk_rows):
+            yield chunk_sheet, chunk
+            chunk = []
+        chunk_sheet = sheet_name
+        chunk.append(row)
+    if chunk:
+        yield chunk_sheet, chunk
@@ -26,6 +26,18 @@ export default function App() {
   const [summarizerResponse, setSummarizerResponse] = useState(null);
   const [feedback, setFeedback] = useState(Array(10).fill(null));
 
+  // Maps backend agent names to the state that renders their output
+  const agentResponseSetters = {
+    ClaimValidationAgent: setClaimvalidationResponse,
+    RegulatoryAgent: setRegulatoryAgentResponse,
+    CBValidationDisplayAgent: setCBValidationDisplayResponse,
+    DecisionAgent: setDecisionResponse,
+    ValidatorAgent: setValidatorResponse,
+    SummarizerAgent: setSummarizerResponse,
+  };
+  // Backend agent behind each progress bar, in the order of `agents`
+  const agentProgressBars = ["ClaimValidationAgent", "RegulatoryAgent", "DecisionAgent", "ValidatorAgent"];
+
   const handleFeedback = (index, value) => {
     const updatedFeedback = [...feedback];
     updatedFeedback[index] = value;
@@ -59,6 +71,7 @@ const triggerAgentSimulation = async () => {
 
   // Reset states before starting
   setProgressStates(agents.map(() => 0));
+  Object.values(agentResponseSetters).forEach((setResponse) => setResponse(null));
   setIsProcessing(true);
   setLoading(true);
   setError(null);
@@ -67,34 +80,53 @@ const triggerAgentSimulation = async () => {
     // Simulate progress while calling the backend API
     simulateSequentialProgress(agents);
 
-    // Backend API call
-    const response = await fetch("http://localhost:5000/api/validate", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        pdf_data: { field: "Example PDF Data" }, // Replace with actual data
-        csv_data: { field: "Example CSV Data", ClaimID: selectedClaim }, // Replace with actual data
-      }),
-    });
+    // Stream each agent's output from the backend as soon as it completes
+    await new Promise((resolve, reject) => {
+      const source = new EventSource(
+        `http://localhost:5000/api/validate/stream?claim_id=${encodeURIComponent(selectedClaim)}`
+      );
 
-    if (!response.ok) {
-      throw new Error("API call failed");
-    }
+      source.addEventListener("delta", (event) => {
+        const { agent, delta } = JSON.parse(event.data);
+        const setResponse = agentResponseSetters[agent];
+        // CBValidationDisplayAgent is rendered as parsed JSON, so it waits for its full output
+        if (setResponse && agent !== "CBValidationDisplayAgent") {
+          setResponse((prev) => (prev || "") + delta); // Show tokens while the agent is still writing
+        }
+      });
 
-    const data = await response.json();
-    if (data.success) {
-      setClaimvalidationResponse(data.result.ClaimValidationAgent);
-      setRegulatoryAgentResponse(data.result.RegulatoryAgent);
-      setCBValidationDisplayResponse(data.result.CBValidationDisplayAgent);
-      setDecisionResponse(data.result.DecisionAgent);
-      setValidatorResponse(data.result.ValidatorAgent);
-      setSummarizerResponse(data.result.SummarizerAgent)
-      // Store the RegulatoryAgent response
-    } else {
-      throw new Error(data.error || "Unknown error from API");
-    }
+      source.addEventListener("agent", (event) => {
+        const { agent, output } = JSON.parse(event.data);
+        const setResponse = agentResponseSetters[agent];
+        if (setResponse) {
+          setResponse(output);
+        }
+        const barIndex = agentProgressBars.indexOf(agent);
+        if (barIndex !== -1) {
+          setProgressStates((prev) => prev.map((value, index) => (index === barIndex ? 100 : value)));
+        }
+      });
+
+      source.addEventListener("agent_error", (event) => {
+        const { agent, error } = JSON.parse(event.data);
+        const setResponse = agentResponseSetters[agent];
+        if (setResponse) {
+          setResponse(JSON.stringify({ error }));
+        }
+      });
+
+      source.addEventListener("done", () => {
+        source.close();
+        resolve();
+      });
+
+      source.addEventListener("error", (event) => {
+        source.close();
+        // Server-sent "error" events carry a message; connection failures do not
+        const message = event.data ? JSON.parse(event.data).error : "API call failed";
+        reject(new Error(message || "Unknown error from API"));
+      });
+    });
   } catch (err) {
     console.error(err);
     setError(err.message || "An error occurred while fetching data.");
@@ -127,7 +159,7 @@ const triggerAgentSimulation = async () => {
           // Update state for progress
           setProgressStates((prev) => {
             const newProgress = [...prev];
-            newProgress[currentAgentIndex] = progressValue;
+            newProgress[currentAgentIndex] = Math.max(prev[currentAgentIndex], progressValue); // Never undo a finished agent
             return newProgress;
           });
         }
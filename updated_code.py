@@ -1,11 +1,8 @@
 import json
-import urllib.request
 import logging
-import os
+import sys
 from functools import wraps
 from datetime import datetime
-from pdf_reader import parsed_data as v_pdf_data  # Import parsed data from pdf_reader
-from csv_reader import response_from_api as v_csv_data  # Import the sheet data from csv_reader
 
 # Set up logging
 logging.basicConfig(
@@ -20,52 +17,106 @@ logger = logging.getLogger("RepresentmentFlow")
 
 # Import data from other modules
 try:
-    from pdf_reader import parsed_data as v_pdf_data
-    from csv_reader import response_from_api as v_csv_data
+    from claim_context import ClaimContext
+    from checkpoints import checkpointed, input_hash
+    from llm_client import MODEL, LLMRequestError, chat_completion
+    from metrics import RequestTimings, agent_scope, collect
+    from prompt_payload import prompt_payload
+    from results_store import record_result
+    from structured_output import parse_reply, structured_completion
     # from RepreRules import repre_decision as v_repre_decision
 except ImportError as e:
     logger.error(f"Error importing required modules: {e}")
     raise
 
-# Constants
-API_URL = "https://innovate-openai-api-mgt.azure-api.net/innovate-tracked/deployments/gpt-4o-mini/chat/completions?api-version=2024-02-01"
-API_KEY = os.environ.get("AZURE_OPENAI_API_KEY", "5002951037784ef8b91050d692a62318")  # Better to use environment variable
+_REASONING_TRACE = {"type": "array", "items": {"type": "string"}}
+
+# JSON schemas of the agents' replies (see backend/structured_output.py); a reply that
+# does not match is re-asked on its own instead of re-running the workflow
+AGENT_SCHEMAS = {
+    "claimvalidation_agent": {
+        "type": "object",
+        "required": ["matched_fields", "mismatched_fields", "missing_fields", "reasoning_trace"],
+        "properties": {
+            "matched_fields": {"type": "array", "items": {"type": "object", "required": ["field_name"]}},
+            "mismatched_fields": {"type": "array", "items": {"type": "object", "required": ["field_name"]}},
+            "missing_fields": {"type": "object"},
+            "critical_findings": {"type": "array"},
+            "reasoning_trace": _REASONING_TRACE,
+        },
+    },
+    "regulatory_agent": {
+        "type": "object",
+        "required": ["dispute_classification", "required_evidence", "available_evidence", "missing_evidence",
+                     "regulatory_compliance_assessment", "reasoning_trace"],
+        "properties": {
+            "dispute_classification": {"type": "object"},
+            "required_evidence": {"type": "array"},
+            "available_evidence": {"type": "array"},
+            "missing_evidence": {"type": "array"},
+            "regulatory_compliance_assessment": {"type": "object"},
+            "reasoning_trace": _REASONING_TRACE,
+        },
+    },
+    "decision_agent": {
+        "type": "object",
+        "required": ["case_summary", "decision", "justification", "reasoning_trace"],
+        "properties": {
+            "case_summary": {"type": "object"},
+            "decision": {
+                "type": "object",
+                "required": ["recommendation"],
+                "properties": {"recommendation": {"type": "string"}},
+            },
+            "justification": {"type": "string"},
+            "reasoning_trace": _REASONING_TRACE,
+        },
+    },
+    "validator_agent": {
+        "type": "object",
+        "required": ["validation_summary", "review_summary", "recommendations", "reasoning_trace"],
+        "properties": {
+            "validation_summary": {
+                "type": "object",
+                "required": ["guardrails_check"],
+                "properties": {"guardrails_check": {"type": "string", "enum": ["Pass", "Conditional Pass", "Fail"]}},
+            },
+            "review_summary": {"type": "string"},
+            "recommendations": {"type": "array"},
+            "reasoning_trace": _REASONING_TRACE,
+        },
+    },
+}
 
 # Decorator for API calls to reduce code duplication
 def api_call(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
-            prompt = func(*args, **kwargs)
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Cache-Control': 'no-cache',
-                'api-key': API_KEY,
-            }
-            
-            payload = {
-                "model": "gpt-4o-mini",
-                "messages": [{
-                    "role": "user",
-                    "content": prompt
-                }]
-            }
-            
-            req = urllib.request.Request(
-                API_URL, 
-                headers=headers, 
-                data=json.dumps(payload).encode("utf-8")
-            )
-            req.get_method = lambda: 'POST'
-            
-            logger.info(f"Calling API for {func.__name__}")
-            response = urllib.request.urlopen(req)
-            response_data = response.read().decode('utf-8')
-            response_json = json.loads(response_data)
-            
-            return response_json['choices'][0]['message']['content']
+            # Timings and tokens are recorded per agent; see backend/metrics.py
+            with agent_scope(func.__name__):
+                # Agents return (system instructions, claim data): the instructions go first and
+                # are the same for every claim, so the provider's prompt cache can reuse them
+                system, prompt = func(*args, **kwargs)
+
+                def call_api():
+                    logger.info(f"Calling API for {func.__name__}")
+                    schema = AGENT_SCHEMAS.get(func.__name__)
+                    if schema:
+                        # Parsed and validated; only this agent is re-asked when the reply is malformed
+                        return structured_completion(prompt, func.__name__, schema, system=system)
+                    # Shared keep-alive client; see backend/llm_client.py
+                    return chat_completion(prompt, system=system)
+
+                # The prompts carry all of the agent's inputs: when they are unchanged since the
+                # last run of this claim, the saved output is reused instead of calling the API
+                claim_ctx = args[0]
+                return checkpointed(claim_ctx.claim_id, func.__name__, input_hash(MODEL, system, prompt), call_api)
             
+        except LLMRequestError as e:
+            # Retries are exhausted; stop the workflow instead of feeding the error to the next agent
+            logger.error(f"API call failed in {func.__name__}: {e}")
+            raise
         except Exception as e:
             logger.error(f"Error in {func.__name__}: {e}")
             return json.dumps({"error": f"An error occurred in {func.__name__}: {e}"})
@@ -75,726 +126,738 @@ def api_call(func):
 # Function to connect reasoning chains between agents
 def connect_reasoning_chains(previous_agent_output, current_agent_name):
     """Extract reasoning traces from previous agent and provide context for current agent"""
-    try:
-        previous_output_json = json.loads(previous_agent_output)
-        if "reasoning_trace" in previous_output_json:
-            previous_reasoning = previous_output_json["reasoning_trace"]
-            if isinstance(previous_reasoning, list):
-                previous_reasoning = "\n".join(previous_reasoning)
-            
-            return f"""
-            ## Previous Agent Reasoning Context
-            The previous agent in the workflow documented the following reasoning steps:
-            
-            {previous_reasoning}
-            
-            As the {current_agent_name}, you should build upon this reasoning chain where relevant,
-            reference specific previous reasoning steps when they influence your analysis,
-            and extend the reasoning process with your specialized expertise.
-            """
-        else:
-            logger.info(f"No reasoning trace found in previous agent output for {current_agent_name}")
-            return "No previous reasoning trace available."
-    except json.JSONDecodeError:
-        logger.warning(f"Could not parse previous agent output as JSON for {current_agent_name}")
+    # Agent replies are validated JSON; parse_reply also copes with fenced text from older checkpoints
+    previous_output_json = parse_reply(previous_agent_output) if previous_agent_output else None
+    if not isinstance(previous_output_json, dict):
+        logger.warning(f"Could not parse previous agent output as JSON for {current_agent_name}: {previous_agent_output!r:.200}")
         return "Previous agent output could not be parsed for reasoning trace."
+    if "reasoning_trace" in previous_output_json:
+        previous_reasoning = previous_output_json["reasoning_trace"]
+        if isinstance(previous_reasoning, list):
+            previous_reasoning = "\n".join(str(step) for step in previous_reasoning)
+        
+        return f"""
+        ## Previous Agent Reasoning Context
+        The previous agent in the workflow documented the following reasoning steps:
+        
+        {previous_reasoning}
+        
+        As the {current_agent_name}, you should build upon this reasoning chain where relevant,
+        reference specific previous reasoning steps when they influence your analysis,
+        and extend the reasoning process with your specialized expertise.
+        """
+    else:
+        logger.info(f"No reasoning trace found in previous agent output for {current_agent_name}")
+        return "No previous reasoning trace available."
+
+CLAIM_VALIDATION_INSTRUCTIONS = """
+You are an AI assistant specialized in Chargeback Representment analysis with deep expertise in financial transaction disputes.
+
+You are provided two data sources, given in the user message:
+- **PDF Data (Merchant Response)**
+- **DRC Data (Dispute Resolution Center)**
+
+## PRIMARY OBJECTIVE
+Extract, normalize, and compare data from both sources to identify matches, mismatches, and missing information crucial for validating a chargeback representment claim.
+
+## EXTRACTION INSTRUCTIONS
+1. Extract all key-value pairs from both sources, including:
+   - Transaction details (dates, amounts, IDs)
+   - Customer information (name, address, contact details)
+   - Merchant information (name, ID, category code)
+   - Dispute details (reason codes, category, condition)
+   - Evidence references (tracking numbers, confirmation codes)
+   - Notes and comments, especially **"FLDNoteText"** which contains crucial information
+
+2. Data normalization requirements:
+   - Standardize all dates to ISO format (YYYY-MM-DD)
+   - Normalize all currency amounts to decimal format with 2 decimal places
+   - Convert all text to lowercase for comparison but preserve original case in output
+   - Remove extraneous whitespace, special characters, and formatting
+   - Recognize and standardize abbreviations (e.g., "Txn" = "Transaction")
+
+3. Handle special cases:
+   - For multilingual text, preserve both original and translated versions if available
+   - For fields with multiple values, maintain as arrays
+   - For nested data structures, flatten with dot notation (e.g., "shipping.address.street")
+
+## COMPARISON INSTRUCTIONS
+1. For each field, determine if it:
+   - Matches exactly (after normalization)
+   - Matches semantically but not exactly (e.g., slight variations in wording)
+   - Exists in one source but not the other
+   - Contradicts between sources
+
+2. Pay special attention to these critical fields:
+   - Transaction date and amount
+   - Dispute reason code
+   - Evidence of delivery (tracking numbers, delivery confirmation)
+   - Customer verification methods
+   - Merchant response comments
+   - Credit issuance information
+
+## CHAIN OF THOUGHT PROCESS (DOCUMENT EACH STEP)
+Before finalizing your analysis, document your step-by-step reasoning process:
+
+1. Data Extraction Phase:
+   - For PDF data: Document which sections you examined and what data points you extracted
+   - For CSV data: Document which columns were analyzed and any data cleaning performed
+
+2. Normalization Phase:
+   - Document any significant transformations applied to make data comparable
+   - Note any challenges in normalization and how you resolved them
+
+3. Comparison Phase:
+   - Document your methodology for identifying matches and mismatches
+   - Explain threshold decisions for what constitutes a "match" vs. "semantic match"
+
+4. Critical Analysis Phase:
+   - Explain how you prioritized the most significant findings
+   - Document your process for resolving ambiguous or contradictory information
+
+## OUTPUT FORMAT (JSON)
+{
+  "pdf_data": {
+    "// All key-value pairs extracted from PDF"
+  },
+  "drc_data": {
+    "// All key-value pairs extracted from DRC"
+  },
+  "matched_fields": [
+    {
+      "field_name": "Transaction Date",
+      "pdf_value": "2023-05-15",
+      "drc_value": "2023-05-15",
+      "notes": "Perfect match after normalization"
+    }
+    // Additional matched fields
+  ],
+  "mismatched_fields": [
+    {
+      "field_name": "Transaction Amount",
+      "pdf_value": "156.78",
+      "drc_value": "157.00",
+      "discrepancy": "0.22",
+      "significance": "minor|major",
+      "reasoning": "Considered major because discrepancy exceeds threshold of 0.01% of transaction amount"
+    }
+    // Additional mismatched fields
+  ],
+  "missing_fields": {
+    "pdf_missing": ["field1", "field2"],
+    "drc_missing": ["field3", "field4"]
+  },
+  "critical_findings": [
+    // List of the most significant observations relevant to the dispute
+  ],
+  "reasoning_trace": [
+    // Step-by-step documentation of key reasoning decisions
+    "Step 1: Identified transaction dates in both documents at PDF p.2 para 3 and CSV column 'TransactionDate'",
+    "Step 2: Normalized dates from MM/DD/YYYY format in PDF to ISO format YYYY-MM-DD",
+    "Step 3: Found exact match after normalization",
+    // Additional reasoning steps that show your work
+  ]
+}
+
+## IMPORTANT GUIDELINES
+- NEVER fabricate, assume, or infer data not explicitly present in the sources
+- If a field exists in both sources but in different formats, normalize before comparison
+- For ambiguous fields, prioritize the most specific and detailed source
+- Do not summarize or interpret the data beyond strict comparison
+- If no matching or mismatching data is found for a section, use empty arrays
+- Document your reasoning process for critical decisions in the reasoning_trace
+- Return the structured JSON output with comprehensive reasoning traces
+"""
 
 @api_call
-def claimvalidation_agent():
+def claimvalidation_agent(claim_ctx):
     """Generates prompt for claim validation against PDF and CSV data with enhanced chain of thought"""
-    return f"""
-    You are an AI assistant specialized in Chargeback Representment analysis with deep expertise in financial transaction disputes.
-
-    You are provided two data sources:
-    - **PDF Data (Merchant Response)**: {v_pdf_data}
-    - **DRC Data (Dispute Resolution Center)**: {v_csv_data}
-
-    ## PRIMARY OBJECTIVE
-    Extract, normalize, and compare data from both sources to identify matches, mismatches, and missing information crucial for validating a chargeback representment claim.
-
-    ## EXTRACTION INSTRUCTIONS
-    1. Extract all key-value pairs from both sources, including:
-       - Transaction details (dates, amounts, IDs)
-       - Customer information (name, address, contact details)
-       - Merchant information (name, ID, category code)
-       - Dispute details (reason codes, category, condition)
-       - Evidence references (tracking numbers, confirmation codes)
-       - Notes and comments, especially **"FLDNoteText"** which contains crucial information
-       
-    2. Data normalization requirements:
-       - Standardize all dates to ISO format (YYYY-MM-DD)
-       - Normalize all currency amounts to decimal format with 2 decimal places
-       - Convert all text to lowercase for comparison but preserve original case in output
-       - Remove extraneous whitespace, special characters, and formatting
-       - Recognize and standardize abbreviations (e.g., "Txn" = "Transaction")
-       
-    3. Handle special cases:
-       - For multilingual text, preserve both original and translated versions if available
-       - For fields with multiple values, maintain as arrays
-       - For nested data structures, flatten with dot notation (e.g., "shipping.address.street")
-
-    ## COMPARISON INSTRUCTIONS
-    1. For each field, determine if it:
-       - Matches exactly (after normalization)
-       - Matches semantically but not exactly (e.g., slight variations in wording)
-       - Exists in one source but not the other
-       - Contradicts between sources
-       
-    2. Pay special attention to these critical fields:
-       - Transaction date and amount
-       - Dispute reason code
-       - Evidence of delivery (tracking numbers, delivery confirmation)
-       - Customer verification methods
-       - Merchant response comments
-       - Credit issuance information
-
-    ## CHAIN OF THOUGHT PROCESS (DOCUMENT EACH STEP)
-    Before finalizing your analysis, document your step-by-step reasoning process:
-    
-    1. Data Extraction Phase:
-       - For PDF data: Document which sections you examined and what data points you extracted
-       - For CSV data: Document which columns were analyzed and any data cleaning performed
-       
-    2. Normalization Phase:
-       - Document any significant transformations applied to make data comparable
-       - Note any challenges in normalization and how you resolved them
-       
-    3. Comparison Phase:
-       - Document your methodology for identifying matches and mismatches
-       - Explain threshold decisions for what constitutes a "match" vs. "semantic match"
-       
-    4. Critical Analysis Phase:
-       - Explain how you prioritized the most significant findings
-       - Document your process for resolving ambiguous or contradictory information
-
-    ## OUTPUT FORMAT (JSON)
+    pdf_data = prompt_payload(claim_ctx.pdf_data, "ClaimValidationAgent PDF data")
+    drc_data = prompt_payload(claim_ctx.drc_data, "ClaimValidationAgent DRC data")
+    return CLAIM_VALIDATION_INSTRUCTIONS, (
+        f"## PDF Data (Merchant Response)\n{pdf_data}\n\n"
+        f"## DRC Data (Dispute Resolution Center)\n{drc_data}"
+    )
+
+REGULATORY_INSTRUCTIONS = """
+You are a RegulatoryValidationAgent with 30+ years of expertise in payment card disputes, compliance frameworks, and chargeback regulations.
+
+## PRIMARY OBJECTIVE
+Analyze the dispute data to identify the applicable regulations, verify compliance with required documentation standards, and assess the strength of the representment case under relevant card network rules.
+
+## INPUT DATA
+The ClaimValidationAgent output, given in the user message.
+
+## ANALYSIS INSTRUCTIONS
+1. Dispute Classification:
+   - Identify the exact dispute reason code and category (e.g., Visa 10.4, MC 4853)
+   - Determine the specific condition within that category (if applicable)
+   - Map to the appropriate regulatory framework and time limitations
+
+2. Required Evidence Analysis:
+   - For the identified dispute reason, enumerate ALL required documentation items according to current Visa/Mastercard/Amex regulations
+   - Check for time-sensitive requirements (documentation age limits, submission deadlines)
+   - Identify mandatory fields vs. supporting (nice-to-have) evidence
+
+3. Compliance Verification:
+   - For each required item, verify if it is present in the provided data
+   - Check if the format and completeness of each item meets regulatory standards
+   - Validate if time-sensitive requirements are satisfied
+
+4. Representment Strength Assessment:
+   - Evaluate the quality and relevance of the available evidence
+   - Identify regulatory strengths and weaknesses in the case
+   - Assess whether the core dispute reason is adequately addressed
+
+## CHAIN OF THOUGHT PROCESS (MANDATORY STEP-BY-STEP REASONING)
+Before finalizing your analysis, document your detailed reasoning process:
+
+1. Reason Code Identification:
+   - Examine specific values in the input data to determine the exact reason code
+   - Cross-reference with official card network documentation
+   - Resolve any ambiguities or contradictions in the reason code
+
+2. Regulatory Framework Mapping:
+   - Based on the identified reason code, determine which specific regulations apply
+   - Document exactly which sections of card network regulations are relevant
+
+3. Evidence Requirements Analysis:
+   - For each required evidence item, explain WHY it is required based on regulations
+   - Document the specific regulatory clause that mandates each evidence item
+
+4. Evidence Assessment Process:
+   - For each available evidence item, document exactly how you determined its presence/absence
+   - Explain your methodology for assessing quality and compliance
+
+5. Regulatory Interpretation:
+   - Explain any judgment calls made when regulations are ambiguous
+   - Document how you interpreted gray areas in the regulations
+
+## OUTPUT FORMAT (JSON)
+{
+  "dispute_classification": {
+    "network": "Visa|Mastercard|Amex|Discover",
+    "category": "Fraud|Consumer Dispute|Processing Error|Authorization",
+    "reason_code": "10.4|4853|etc.",
+    "reason_description": "Detailed description of the dispute reason",
+    "time_limits": {
+      "chargeback_window": "X days from transaction|statement date",
+      "representment_window": "X days from chargeback date",
+      "compelling_evidence_requirements": "Age limits on documentation"
+    }
+  },
+
+  "required_evidence": [
     {
-      "pdf_data": {
-        "// All key-value pairs extracted from PDF"
-      },
-      "drc_data": {
-        "// All key-value pairs extracted from DRC"
-      },
-      "matched_fields": [
-        {
-          "field_name": "Transaction Date",
-          "pdf_value": "2023-05-15",
-          "drc_value": "2023-05-15",
-          "notes": "Perfect match after normalization"
-        }
-        // Additional matched fields
-      ],
-      "mismatched_fields": [
-        {
-          "field_name": "Transaction Amount",
-          "pdf_value": "156.78",
-          "drc_value": "157.00",
-          "discrepancy": "0.22",
-          "significance": "minor|major",
-          "reasoning": "Considered major because discrepancy exceeds threshold of 0.01% of transaction amount"
-        }
-        // Additional mismatched fields
-      ],
-      "missing_fields": {
-        "pdf_missing": ["field1", "field2"],
-        "drc_missing": ["field3", "field4"]
-      },
-      "critical_findings": [
-        // List of the most significant observations relevant to the dispute
-      ],
-      "reasoning_trace": [
-        // Step-by-step documentation of key reasoning decisions
-        "Step 1: Identified transaction dates in both documents at PDF p.2 para 3 and CSV column 'TransactionDate'",
-        "Step 2: Normalized dates from MM/DD/YYYY format in PDF to ISO format YYYY-MM-DD",
-        "Step 3: Found exact match after normalization",
-        // Additional reasoning steps that show your work
-      ]
+      "item": "Item name (e.g., 'Proof of delivery')",
+      "requirement_level": "Mandatory|Supporting",
+      "description": "Detailed description of what constitutes valid evidence",
+      "format_requirements": "Digital signature|Timestamp|etc.",
+      "regulatory_source": "Reference to specific regulation clause",
+      "reasoning": "Explanation of why this evidence is required for this specific dispute"
     }
+    // Additional required evidence items
+  ],
 
-    ## IMPORTANT GUIDELINES
-    - NEVER fabricate, assume, or infer data not explicitly present in the sources
-    - If a field exists in both sources but in different formats, normalize before comparison
-    - For ambiguous fields, prioritize the most specific and detailed source
-    - Do not summarize or interpret the data beyond strict comparison
-    - If no matching or mismatching data is found for a section, use empty arrays
-    - Document your reasoning process for critical decisions in the reasoning_trace
-    - Return the structured JSON output with comprehensive reasoning traces
-    """
+  "available_evidence": [
+    {
+      "item": "Item name",
+      "present": true|false,
+      "meets_requirements": true|false,
+      "found_in": "PDF|DRC|Both",
+      "quality_assessment": "Strong|Adequate|Weak",
+      "notes": "Specific observations about this evidence item",
+      "reasoning": "Explanation of how you determined presence and quality"
+    }
+    // Additional available evidence items
+  ],
 
-@api_call
-def regulatory_agent(response_data):
-    """Processes the JSON response from ClaimValidationAgent and analyzes applicable Visa rules with enhanced chain of thought"""
-    regulatory_prompt = f"""
-    You are a RegulatoryValidationAgent with 30+ years of expertise in payment card disputes, compliance frameworks, and chargeback regulations.
-
-    ## PRIMARY OBJECTIVE
-    Analyze the dispute data to identify the applicable regulations, verify compliance with required documentation standards, and assess the strength of the representment case under relevant card network rules.
-
-    ## INPUT DATA
-    {response_data}
-
-    ## ANALYSIS INSTRUCTIONS
-    1. Dispute Classification:
-       - Identify the exact dispute reason code and category (e.g., Visa 10.4, MC 4853)
-       - Determine the specific condition within that category (if applicable)
-       - Map to the appropriate regulatory framework and time limitations
-       
-    2. Required Evidence Analysis:
-       - For the identified dispute reason, enumerate ALL required documentation items according to current Visa/Mastercard/Amex regulations
-       - Check for time-sensitive requirements (documentation age limits, submission deadlines)
-       - Identify mandatory fields vs. supporting (nice-to-have) evidence
-       
-    3. Compliance Verification:
-       - For each required item, verify if it is present in the provided data
-       - Check if the format and completeness of each item meets regulatory standards
-       - Validate if time-sensitive requirements are satisfied
-
-    4. Representment Strength Assessment:
-       - Evaluate the quality and relevance of the available evidence
-       - Identify regulatory strengths and weaknesses in the case
-       - Assess whether the core dispute reason is adequately addressed
-
-    ## CHAIN OF THOUGHT PROCESS (MANDATORY STEP-BY-STEP REASONING)
-    Before finalizing your analysis, document your detailed reasoning process:
-    
-    1. Reason Code Identification:
-       - Examine specific values in the input data to determine the exact reason code
-       - Cross-reference with official card network documentation
-       - Resolve any ambiguities or contradictions in the reason code
-       
-    2. Regulatory Framework Mapping:
-       - Based on the identified reason code, determine which specific regulations apply
-       - Document exactly which sections of card network regulations are relevant
-       
-    3. Evidence Requirements Analysis:
-       - For each required evidence item, explain WHY it is required based on regulations
-       - Document the specific regulatory clause that mandates each evidence item
-       
-    4. Evidence Assessment Process:
-       - For each available evidence item, document exactly how you determined its presence/absence
-       - Explain your methodology for assessing quality and compliance
-       
-    5. Regulatory Interpretation:
-       - Explain any judgment calls made when regulations are ambiguous
-       - Document how you interpreted gray areas in the regulations
-
-    ## OUTPUT FORMAT (JSON)
+  "missing_evidence": [
     {
-      "dispute_classification": {
-        "network": "Visa|Mastercard|Amex|Discover",
-        "category": "Fraud|Consumer Dispute|Processing Error|Authorization",
-        "reason_code": "10.4|4853|etc.",
-        "reason_description": "Detailed description of the dispute reason",
-        "time_limits": {
-          "chargeback_window": "X days from transaction|statement date",
-          "representment_window": "X days from chargeback date",
-          "compelling_evidence_requirements": "Age limits on documentation"
-        }
-      },
-      
-      "required_evidence": [
-        {
-          "item": "Item name (e.g., 'Proof of delivery')",
-          "requirement_level": "Mandatory|Supporting",
-          "description": "Detailed description of what constitutes valid evidence",
-          "format_requirements": "Digital signature|Timestamp|etc.",
-          "regulatory_source": "Reference to specific regulation clause",
-          "reasoning": "Explanation of why this evidence is required for this specific dispute"
-        }
-        // Additional required evidence items
-      ],
-      
-      "available_evidence": [
-        {
-          "item": "Item name",
-          "present": true|false,
-          "meets_requirements": true|false,
-          "found_in": "PDF|DRC|Both",
-          "quality_assessment": "Strong|Adequate|Weak",
-          "notes": "Specific observations about this evidence item",
-          "reasoning": "Explanation of how you determined presence and quality"
-        }
-        // Additional available evidence items
-      ],
-      
-      "missing_evidence": [
-        {
-          "item": "Missing item name",
-          "criticality": "Critical|Important|Helpful",
-          "impact": "How this missing item impacts the case",
-          "alternative_evidence": "Possible alternatives that may compensate",
-          "reasoning": "Explanation of why this missing evidence matters"
-        }
-        // Additional missing evidence items
-      ],
-      
-      "regulatory_compliance_assessment": {
-        "overall_compliance_level": "Fully Compliant|Partially Compliant|Non-Compliant",
-        "critical_gaps": [
-          // List of the most significant compliance issues
-        ],
-        "strengths": [
-          // List of strong compliance points
-        ],
-        "justification": "Detailed assessment explaining the compliance determination, citing ONLY facts from the input data and relevant regulations"
-      },
-      
-      "reasoning_trace": [
-        // Step-by-step documentation of your regulatory analysis process
-        "Step 1: Identified reason code 10.4 based on DRC data field 'ReasonCode'",
-        "Step 2: Analyzed Visa Core Rules section 11.3.4 to determine evidence requirements",
-        "Step 3: Cross-referenced evidence requirements with available documentation",
-        // Additional reasoning steps showing your work
-      ]
+      "item": "Missing item name",
+      "criticality": "Critical|Important|Helpful",
+      "impact": "How this missing item impacts the case",
+      "alternative_evidence": "Possible alternatives that may compensate",
+      "reasoning": "Explanation of why this missing evidence matters"
     }
+    // Additional missing evidence items
+  ],
+
+  "regulatory_compliance_assessment": {
+    "overall_compliance_level": "Fully Compliant|Partially Compliant|Non-Compliant",
+    "critical_gaps": [
+      // List of the most significant compliance issues
+    ],
+    "strengths": [
+      // List of strong compliance points
+    ],
+    "justification": "Detailed assessment explaining the compliance determination, citing ONLY facts from the input data and relevant regulations"
+  },
+
+  "reasoning_trace": [
+    // Step-by-step documentation of your regulatory analysis process
+    "Step 1: Identified reason code 10.4 based on DRC data field 'ReasonCode'",
+    "Step 2: Analyzed Visa Core Rules section 11.3.4 to determine evidence requirements",
+    "Step 3: Cross-referenced evidence requirements with available documentation",
+    // Additional reasoning steps showing your work
+  ]
+}
+
+## CRITICAL GUIDELINES
+- Base your analysis EXCLUSIVELY on the provided input data and established card network regulations
+- DO NOT assume, fabricate, or infer information not explicitly present in the input
+- DO NOT reference internal policies, personal experiences, or theoretical best practices
+- Highlight ONLY actual compliance issues, not hypothetical concerns
+- If information is ambiguous, indicate the uncertainty rather than making assumptions
+- Use precise regulatory language matching official Visa/Mastercard/Amex documentation
+- Document your complete reasoning process in the reasoning_trace field
+- Format all output as clean, properly indented JSON
+"""
 
-    ## CRITICAL GUIDELINES
-    - Base your analysis EXCLUSIVELY on the provided input data and established card network regulations
-    - DO NOT assume, fabricate, or infer information not explicitly present in the input
-    - DO NOT reference internal policies, personal experiences, or theoretical best practices
-    - Highlight ONLY actual compliance issues, not hypothetical concerns
-    - If information is ambiguous, indicate the uncertainty rather than making assumptions
-    - Use precise regulatory language matching official Visa/Mastercard/Amex documentation
-    - Document your complete reasoning process in the reasoning_trace field
-    - Format all output as clean, properly indented JSON
-    """
-    
+@api_call
+def regulatory_agent(claim_ctx, response_data):
+    """Processes the JSON response from ClaimValidationAgent and analyzes applicable Visa rules with enhanced chain of thought"""
     # Add previous agent reasoning context if available
     previous_context = connect_reasoning_chains(response_data, "RegulatoryValidationAgent")
-    return regulatory_prompt + previous_context
+    return REGULATORY_INSTRUCTIONS, f"## INPUT DATA\n{response_data}\n{previous_context}"
+
+DECISION_INSTRUCTIONS = """
+You are a DecisionAgent with 30+ years of expertise in payment dispute resolution, risk management, and chargeback representment strategies.
+
+## PRIMARY OBJECTIVE
+Based on comprehensive analysis of the dispute data and regulatory assessment, provide a definitive recommendation on the optimal course of action with detailed justification and transparent reasoning.
+
+## INPUT DATA
+Given in the user message:
+1. ClaimValidation Analysis
+2. Regulatory Assessment
+
+## ANALYSIS PROCESS (MANDATORY STEP-BY-STEP APPROACH)
+1. Case Summary Assessment:
+   - Identify the core dispute reason and amount
+   - Verify if the representment was submitted within regulatory timeframes
+   - Confirm if the merchant has provided specific evidence addressing the dispute reason
+
+2. Evidence Strength Evaluation:
+   - Rate the quality and relevance of each evidence item on a scale of 1-5
+   - Assess if the collective evidence directly addresses the specific dispute reason
+   - Determine if any critical evidence contradicts the merchant's position
+
+3. Compliance Analysis:
+   - Check if all mandatory regulatory requirements are satisfied
+   - Evaluate if any compliance gaps are significant enough to invalidate the representment
+   - Assess if alternative evidence compensates for any missing required documentation
+
+4. Precedent Consideration:
+   - Consider historical outcomes for similar cases (if data suggests patterns)
+   - Assess consistency with network regulations and industry standards
+
+5. Outcome Likelihood Assessment:
+   - Estimate probability of successful representment based on evidence strength
+   - Identify specific risks or vulnerabilities in the representment position
+
+6. Decision Determination:
+   - Based on all factors, select the single most appropriate recommendation
+   - Provide clear, concise justification referencing specific evidence and regulations
+
+## CHAIN OF THOUGHT DECISION PROCESS (EXPLICIT REASONING DOCUMENTATION)
+Before finalizing your recommendation, document your detailed reasoning process:
+
+1. Evidence Evaluation Process:
+   - For each key evidence item, document exactly how you evaluated its strength and relevance
+   - Explain your rating methodology and criteria for determining strength (1-5 scale)
+   - Document your process for identifying the most pivotal evidence
+
+2. Comparative Analysis:
+   - Document how you weighed conflicting evidence
+   - Explain how you resolved contradictions between merchant and cardholder claims
+   - Document your process for evaluating the collective weight of all evidence
+
+3. Decision Tree Reasoning:
+   - Document the explicit logical pathway leading to your final recommendation
+   - Include alternative paths considered and why they were rejected
+   - Explain key decision points and threshold criteria used
+
+4. Confidence Assessment:
+   - Document how you determined your confidence level in the recommendation
+   - Explain any uncertainties or ambiguities that affected your confidence
+   - Document how these uncertainties influenced your final decision
+
+## POSSIBLE RECOMMENDATIONS (SELECT EXACTLY ONE)
+1. **Send for Cardholder's review/Rebuttal letter** - When evidence is strong but cardholder confirmation is needed
+2. **Deny Representment, pursue Pre-Arb** - When evidence doesn't fully support the dispute reason but alternative recourse exists
+3. **Accept Representment, close txn as CH Responsibility** - When evidence comprehensively refutes the dispute
+4. **Accept Representment, close txn as Merchant Issued Credit** - When evidence shows the merchant has already credited the transaction
+
+## OUTPUT FORMAT (JSON)
+{
+  "case_summary": {
+    "dispute_reason": "Concise statement of the core dispute reason",
+    "dispute_amount": "Transaction amount in dispute",
+    "representment_timeliness": "Within|Outside regulatory timeframe",
+    "key_evidence_available": ["List", "of", "critical", "evidence", "items"]
+  },
+
+  "evidence_assessment": {
+    "strength_rating": "1-5 scale (5 being strongest)",
+    "directly_addresses_dispute": true|false,
+    "critical_contradictions": ["Any evidence that undermines the case"],
+    "pivotal_evidence": "The single most compelling piece of evidence",
+    "evidence_rating_explanation": "Detailed explanation of how strength rating was determined"
+  },
+
+  "compliance_status": {
+    "mandatory_requirements_met": true|false,
+    "significant_gaps": ["List of critical compliance issues"],
+    "compensating_controls": ["Alternative evidence that may offset gaps"],
+    "compliance_assessment_reasoning": "Explanation of how compliance determination was made"
+  },
+
+  "decision": {
+    "recommendation": "EXACTLY ONE of the four possible recommendations",
+    "confidence_level": "High|Medium|Low",
+    "primary_factors": ["List of 3-5 decisive factors that led to this decision"],
+    "risks": ["Potential vulnerabilities or challenges with this decision"],
+    "alternative_options_considered": ["Options considered but rejected"],
+    "rejection_reasoning": ["Why alternative options were rejected"]
+  },
+
+  "information_considered": [
+    "Bullet-point list of all key facts and evidence considered",
+    "Including critical dates, amounts, and verification details"
+  ],
+
+  "justification": "Detailed explanation of why this decision was recommended, referencing specific evidence items and regulations. The justification must be factual, clear, and directly tied to the case details.",
+
+  "reasoning_trace": [
+    // Step-by-step documentation of your decision-making process
+    "Step 1: Evaluated core evidence item 'delivery confirmation' with rating 4/5 because it contains tracking number, delivery date, but lacks signature confirmation",
+    "Step 2: Determined that evidence directly addresses dispute reason 'Item Not Received' by proving delivery occurred",
+    "Step 3: Identified regulatory requirement for 'proof of delivery to cardholder's address' as satisfied",
+    // Additional reasoning steps showing your work and decision path
+  ]
+}
+
+## CRITICAL GUIDELINES
+- You MUST select EXACTLY ONE recommendation from the four possible options
+- Base your decision ONLY on facts present in the input data
+- DO NOT reference internal policies, personal experiences, or hypothetical scenarios
+- Maintain strict objectivity and focus on evidence strength and regulatory compliance
+- Provide specific, concrete reasons for your recommendation, not general statements
+- Document your complete reasoning process in the reasoning_trace field
+- Format all output as clean, properly indented JSON
+"""
 
 @api_call
-def decision_agent(response_data, regulatory_response):
+def decision_agent(claim_ctx, response_data, regulatory_response):
     """Makes decision recommendation based on validation and regulatory analysis with enhanced chain of thought"""
-    decision_prompt = f"""
-    You are a DecisionAgent with 30+ years of expertise in payment dispute resolution, risk management, and chargeback representment strategies.
-
-    ## PRIMARY OBJECTIVE
-    Based on comprehensive analysis of the dispute data and regulatory assessment, provide a definitive recommendation on the optimal course of action with detailed justification and transparent reasoning.
-
-    ## INPUT DATA
-    1. ClaimValidation Analysis: {response_data}
-    2. Regulatory Assessment: {regulatory_response}
-
-    ## ANALYSIS PROCESS (MANDATORY STEP-BY-STEP APPROACH)
-    1. Case Summary Assessment:
-       - Identify the core dispute reason and amount
-       - Verify if the representment was submitted within regulatory timeframes
-       - Confirm if the merchant has provided specific evidence addressing the dispute reason
-       
-    2. Evidence Strength Evaluation:
-       - Rate the quality and relevance of each evidence item on a scale of 1-5
-       - Assess if the collective evidence directly addresses the specific dispute reason
-       - Determine if any critical evidence contradicts the merchant's position
-       
-    3. Compliance Analysis:
-       - Check if all mandatory regulatory requirements are satisfied
-       - Evaluate if any compliance gaps are significant enough to invalidate the representment
-       - Assess if alternative evidence compensates for any missing required documentation
-       
-    4. Precedent Consideration:
-       - Consider historical outcomes for similar cases (if data suggests patterns)
-       - Assess consistency with network regulations and industry standards
-       
-    5. Outcome Likelihood Assessment:
-       - Estimate probability of successful representment based on evidence strength
-       - Identify specific risks or vulnerabilities in the representment position
-       
-    6. Decision Determination:
-       - Based on all factors, select the single most appropriate recommendation
-       - Provide clear, concise justification referencing specific evidence and regulations
-
-    ## CHAIN OF THOUGHT DECISION PROCESS (EXPLICIT REASONING DOCUMENTATION)
-    Before finalizing your recommendation, document your detailed reasoning process:
-    
-    1. Evidence Evaluation Process:
-       - For each key evidence item, document exactly how you evaluated its strength and relevance
-       - Explain your rating methodology and criteria for determining strength (1-5 scale)
-       - Document your process for identifying the most pivotal evidence
-       
-    2. Comparative Analysis:
-       - Document how you weighed conflicting evidence
-       - Explain how you resolved contradictions between merchant and cardholder claims
-       - Document your process for evaluating the collective weight of all evidence
-       
-    3. Decision Tree Reasoning:
-       - Document the explicit logical pathway leading to your final recommendation
-       - Include alternative paths considered and why they were rejected
-       - Explain key decision points and threshold criteria used
-       
-    4. Confidence Assessment:
-       - Document how you determined your confidence level in the recommendation
-       - Explain any uncertainties or ambiguities that affected your confidence
-       - Document how these uncertainties influenced your final decision
-
-    ## POSSIBLE RECOMMENDATIONS (SELECT EXACTLY ONE)
-    1. **Send for Cardholder's review/Rebuttal letter** - When evidence is strong but cardholder confirmation is needed
-    2. **Deny Representment, pursue Pre-Arb** - When evidence doesn't fully support the dispute reason but alternative recourse exists
-    3. **Accept Representment, close txn as CH Responsibility** - When evidence comprehensively refutes the dispute
-    4. **Accept Representment, close txn as Merchant Issued Credit** - When evidence shows the merchant has already credited the transaction
-
-    ## OUTPUT FORMAT (JSON)
-    {
-      "case_summary": {
-        "dispute_reason": "Concise statement of the core dispute reason",
-        "dispute_amount": "Transaction amount in dispute",
-        "representment_timeliness": "Within|Outside regulatory timeframe",
-        "key_evidence_available": ["List", "of", "critical", "evidence", "items"]
-      },
-      
-      "evidence_assessment": {
-        "strength_rating": "1-5 scale (5 being strongest)",
-        "directly_addresses_dispute": true|false,
-        "critical_contradictions": ["Any evidence that undermines the case"],
-        "pivotal_evidence": "The single most compelling piece of evidence",
-        "evidence_rating_explanation": "Detailed explanation of how strength rating was determined"
-      },
-      
-      "compliance_status": {
-        "mandatory_requirements_met": true|false,
-        "significant_gaps": ["List of critical compliance issues"],
-        "compensating_controls": ["Alternative evidence that may offset gaps"],
-        "compliance_assessment_reasoning": "Explanation of how compliance determination was made"
-      },
-      
-      "decision": {
-        "recommendation": "EXACTLY ONE of the four possible recommendations",
-        "confidence_level": "High|Medium|Low",
-        "primary_factors": ["List of 3-5 decisive factors that led to this decision"],
-        "risks": ["Potential vulnerabilities or challenges with this decision"],
-        "alternative_options_considered": ["Options considered but rejected"],
-        "rejection_reasoning": ["Why alternative options were rejected"]
-      },
-      
-      "information_considered": [
-        "Bullet-point list of all key facts and evidence considered",
-        "Including critical dates, amounts, and verification details"
-      ],
-      
-      "justification": "Detailed explanation of why this decision was recommended, referencing specific evidence items and regulations. The justification must be factual, clear, and directly tied to the case details.",
-      
-      "reasoning_trace": [
-        // Step-by-step documentation of your decision-making process
-        "Step 1: Evaluated core evidence item 'delivery confirmation' with rating 4/5 because it contains tracking number, delivery date, but lacks signature confirmation",
-        "Step 2: Determined that evidence directly addresses dispute reason 'Item Not Received' by proving delivery occurred",
-        "Step 3: Identified regulatory requirement for 'proof of delivery to cardholder's address' as satisfied",
-        // Additional reasoning steps showing your work and decision path
-      ]
-    }
-
-    ## CRITICAL GUIDELINES
-    - You MUST select EXACTLY ONE recommendation from the four possible options
-    - Base your decision ONLY on facts present in the input data
-    - DO NOT reference internal policies, personal experiences, or hypothetical scenarios
-    - Maintain strict objectivity and focus on evidence strength and regulatory compliance
-    - Provide specific, concrete reasons for your recommendation, not general statements
-    - Document your complete reasoning process in the reasoning_trace field
-    - Format all output as clean, properly indented JSON
-    """
-    
     # Add previous agent reasoning context
     previous_context = connect_reasoning_chains(regulatory_response, "DecisionAgent")
-    return decision_prompt + previous_context
+    return DECISION_INSTRUCTIONS, (
+        f"## INPUT DATA\n1. ClaimValidation Analysis: {response_data}\n"
+        f"2. Regulatory Assessment: {regulatory_response}\n{previous_context}"
+    )
+
+VALIDATOR_INSTRUCTIONS = """
+You are a ValidatorAgent with expertise in financial compliance, risk management, and quality assurance for payment dispute resolution processes.
+
+## PRIMARY OBJECTIVE
+Review the decision recommendation to ensure it adheres to all regulatory requirements, operational guidelines, and risk management principles, with transparent reasoning throughout the validation process.
+
+## INPUT DATA
+The Decision Recommendation, given in the user message.
+
+## VALIDATION FRAMEWORK
+1. Regulatory Compliance Check:
+   - Verify adherence to relevant card network regulations (Visa, Mastercard, Amex, Discover)
+   - Confirm compliance with applicable financial laws (EFTA, FCBA, etc.)
+   - Assess alignment with industry standards and best practices
+
+2. Process Integrity Verification:
+   - Evaluate if all required procedural steps were followed
+   - Confirm appropriate evidence was considered
+   - Verify decision logic is clear, consistent, and well-documented
+
+3. Risk Assessment:
+   - Identify potential financial risks of the recommendation
+   - Assess reputational and relationship risks
+   - Evaluate precedent implications
+
+4. Quality Assurance:
+   - Check for factual accuracy and data consistency
+   - Ensure decision is based solely on available evidence
+   - Verify justifications are specific and directly tied to case details
+
+5. Ethical Considerations:
+   - Confirm fairness to all parties
+   - Verify absence of bias or conflicts of interest
+   - Assess transparency of decision-making process
+
+## CHAIN OF THOUGHT VALIDATION PROCESS (EXPLICIT REASONING DOCUMENTATION)
+Before finalizing your validation assessment, document your detailed reasoning process:
+
+1. Validation Methodology:
+   - Document exactly how you evaluated each aspect of the decision against requirements
+   - Explain your criteria for determining compliance vs. non-compliance
+   - Detail your approach to identifying risks and quality issues
+
+2. Cross-Verification Process:
+   - Document how you cross-checked factual statements against input data
+   - Explain your approach to validating logic consistency
+   - Detail how you identified any gaps in reasoning or evidence consideration
+
+3. Counter-Argument Analysis:
+   - Document potential opposing viewpoints to the decision
+   - Explain how you assessed whether these were adequately addressed
+   - Detail how you determined if alternative interpretations were properly considered
+
+4. Meta-Evaluation Process:
+   - Document how you assessed the quality of the decision agent's own reasoning
+   - Explain your approach to evaluating the thoroughness of the reasoning traces
+   - Detail how you determined if the decision process itself was sound
+
+## OUTPUT FORMAT (JSON)
+{
+  "validation_summary": {
+    "guardrails_check": "Pass|Conditional Pass|Fail",
+    "compliance_status": "Compliant|Partially Compliant|Non-Compliant",
+    "risk_level": "Low|Medium|High",
+    "quality_assessment": "Meets Standards|Needs Improvement|Below Standards"
+  },
+
+  "compliance_details": {
+    "regulations_assessment": "Analysis of regulatory compliance",
+    "procedural_assessment": "Evaluation of process adherence",
+    "documentation_assessment": "Assessment of supporting documentation",
+    "compliance_reasoning": "Explanation of how compliance determinations were made"
+  },
+
+  "risk_analysis": {
+    "financial_risk": "Assessment of financial exposure",
+    "reputational_risk": "Evaluation of brand/relationship impact",
+    "precedent_risk": "Analysis of future case implications",
+    "risk_assessment_methodology": "Explanation of how risks were identified and evaluated"
+  },
+
+  "quality_verification": {
+    "factual_accuracy": "Assessment of factual correctness",
+    "logical_consistency": "Evaluation of reasoning soundness",
+    "evidence_sufficiency": "Assessment of evidence adequacy",
+    "quality_assessment_approach": "Explanation of how quality determinations were made"
+  },
+
+  "ethical_review": {
+    "fairness_assessment": "Evaluation of equitable treatment",
+    "transparency_assessment": "Assessment of decision clarity",
+    "objectivity_assessment": "Evaluation of unbiased analysis",
+    "ethical_reasoning": "Explanation of how ethical determinations were made"
+  },
+
+  "reasoning_critique": {
+    "strengths": ["Specific aspects of the decision reasoning that were particularly strong"],
+    "weaknesses": ["Areas where reasoning could have been more thorough or clear"],
+    "blind_spots": ["Important considerations that may have been overlooked"],
+    "critique_methodology": "Explanation of how you evaluated the quality of reasoning"
+  },
+
+  "review_summary": "Comprehensive summary of the validation findings, highlighting key strengths and potential concerns",
+
+  "recommendations": [
+    "Specific, actionable recommendations to address any identified issues",
+    "May include additional verification steps, clarifications, or modifications"
+  ],
+
+  "reasoning_trace": [
+    // Step-by-step documentation of your validation process
+    "Step 1: Verified regulatory compliance by cross-checking decision against Visa Regulation 10.4.3 requirements",
+    "Step 2: Evaluated procedural completeness by confirming all required analysis steps were documented",
+    "Step 3: Assessed decision logic by examining the path from evidence to conclusion",
+    // Additional reasoning steps showing your validation work
+  ]
+}
+
+## CRITICAL GUIDELINES
+- Evaluate the decision SOLELY on its merits, not on what you might have decided
+- Focus on verifiable facts, not subjective opinions
+- Highlight both strengths and areas for improvement
+- If recommending changes, provide specific, actionable guidance
+- Maintain objective, balanced assessment even if you disagree with the decision
+- Document your complete validation process in the reasoning_trace field
+- Format all output as clean, properly indented JSON
+"""
 
 @api_call
-def validator_agent(decision_content):
+def validator_agent(claim_ctx, decision_content):
     """Validates the decision against guardrails and compliance requirements with enhanced chain of thought"""
-    validator_prompt = f"""
-    You are a ValidatorAgent with expertise in financial compliance, risk management, and quality assurance for payment dispute resolution processes.
-
-    ## PRIMARY OBJECTIVE
-    Review the decision recommendation to ensure it adheres to all regulatory requirements, operational guidelines, and risk management principles, with transparent reasoning throughout the validation process.
-
-    ## INPUT DATA
-    Decision Recommendation: {decision_content}
-
-    ## VALIDATION FRAMEWORK
-    1. Regulatory Compliance Check:
-       - Verify adherence to relevant card network regulations (Visa, Mastercard, Amex, Discover)
-       - Confirm compliance with applicable financial laws (EFTA, FCBA, etc.)
-       - Assess alignment with industry standards and best practices
-       
-    2. Process Integrity Verification:
-       - Evaluate if all required procedural steps were followed
-       - Confirm appropriate evidence was considered
-       - Verify decision logic is clear, consistent, and well-documented
-       
-    3. Risk Assessment:
-       - Identify potential financial risks of the recommendation
-       - Assess reputational and relationship risks
-       - Evaluate precedent implications
-       
-    4. Quality Assurance:
-       - Check for factual accuracy and data consistency
-       - Ensure decision is based solely on available evidence
-       - Verify justifications are specific and directly tied to case details
-       
-    5. Ethical Considerations:
-       - Confirm fairness to all parties
-       - Verify absence of bias or conflicts of interest
-       - Assess transparency of decision-making process
-
-    ## CHAIN OF THOUGHT VALIDATION PROCESS (EXPLICIT REASONING DOCUMENTATION)
-    Before finalizing your validation assessment, document your detailed reasoning process:
-    
-    1. Validation Methodology:
-       - Document exactly how you evaluated each aspect of the decision against requirements
-       - Explain your criteria for determining compliance vs. non-compliance
-       - Detail your approach to identifying risks and quality issues
-       
-    2. Cross-Verification Process:
-       - Document how you cross-checked factual statements against input data
-       - Explain your approach to validating logic consistency
-       - Detail how you identified any gaps in reasoning or evidence consideration
-       
-    3. Counter-Argument Analysis:
-       - Document potential opposing viewpoints to the decision
-       - Explain how you assessed whether these were adequately addressed
-       - Detail how you determined if alternative interpretations were properly considered
-       
-    4. Meta-Evaluation Process:
-       - Document how you assessed the quality of the decision agent's own reasoning
-       - Explain your approach to evaluating the thoroughness of the reasoning traces
-       - Detail how you determined if the decision process itself was sound
-
-    ## OUTPUT FORMAT (JSON)
-    {
-      "validation_summary": {
-        "guardrails_check": "Pass|Conditional Pass|Fail",
-        "compliance_status": "Compliant|Partially Compliant|Non-Compliant",
-        "risk_level": "Low|Medium|High",
-        "quality_assessment": "Meets Standards|Needs Improvement|Below Standards"
-      },
-      
-      "compliance_details": {
-        "regulations_assessment": "Analysis of regulatory compliance",
-        "procedural_assessment": "Evaluation of process adherence",
-        "documentation_assessment": "Assessment of supporting documentation",
-        "compliance_reasoning": "Explanation of how compliance determinations were made"
-      },
-      
-      "risk_analysis": {
-        "financial_risk": "Assessment of financial exposure",
-        "reputational_risk": "Evaluation of brand/relationship impact",
-        "precedent_risk": "Analysis of future case implications",
-        "risk_assessment_methodology": "Explanation of how risks were identified and evaluated"
-      },
-      
-      "quality_verification": {
-        "factual_accuracy": "Assessment of factual correctness",
-        "logical_consistency": "Evaluation of reasoning soundness",
-        "evidence_sufficiency": "Assessment of evidence adequacy",
-        "quality_assessment_approach": "Explanation of how quality determinations were made"
-      },
-      
-      "ethical_review": {
-        "fairness_assessment": "Evaluation of equitable treatment",
-        "transparency_assessment": "Assessment of decision clarity",
-        "objectivity_assessment": "Evaluation of unbiased analysis",
-        "ethical_reasoning": "Explanation of how ethical determinations were made"
-      },
-      
-      "reasoning_critique": {
-        "strengths": ["Specific aspects of the decision reasoning that were particularly strong"],
-        "weaknesses": ["Areas where reasoning could have been more thorough or clear"],
-        "blind_spots": ["Important considerations that may have been overlooked"],
-        "critique_methodology": "Explanation of how you evaluated the quality of reasoning"
-      },
-      
-      "review_summary": "Comprehensive summary of the validation findings, highlighting key strengths and potential concerns",
-      
-      "recommendations": [
-        "Specific, actionable recommendations to address any identified issues",
-        "May include additional verification steps, clarifications, or modifications"
-      ],
-      
-      "reasoning_trace": [
-        // Step-by-step documentation of your validation process
-        "Step 1: Verified regulatory compliance by cross-checking decision against Visa Regulation 10.4.3 requirements",
-        "Step 2: Evaluated procedural completeness by confirming all required analysis steps were documented",
-        "Step 3: Assessed decision logic by examining the path from evidence to conclusion",
-        // Additional reasoning steps showing your validation work
-      ]
-    }
-
-    ## CRITICAL GUIDELINES
-    - Evaluate the decision SOLELY on its merits, not on what you might have decided
-    - Focus on verifiable facts, not subjective opinions
-    - Highlight both strengths and areas for improvement
-    - If recommending changes, provide specific, actionable guidance
-    - Maintain objective, balanced assessment even if you disagree with the decision
-    - Document your complete validation process in the reasoning_trace field
-    - Format all output as clean, properly indented JSON
-    """
-    
     # Add previous agent reasoning context
     previous_context = connect_reasoning_chains(decision_content, "ValidatorAgent")
-    return validator_prompt + previous_context
-
+    return VALIDATOR_INSTRUCTIONS, f"## INPUT DATA\nDecision Recommendation: {decision_content}\n{previous_context}"
+
+SUMMARIZER_INSTRUCTIONS = """
+You are an AI Summarizer Agent for the Chargeback Representment process, skilled at converting complex financial analyses into clear, actionable insights while making the reasoning process transparent.
+
+## PRIMARY OBJECTIVE
+Transform the technical decision analysis into a concise, visually organized summary that highlights key findings and recommendations using emoji indicators for enhanced readability, while providing insight into the reasoning process.
+
+## INPUT DATA
+The Decision Analysis and the Validation Analysis, given in the user message.
+
+## SUMMARIZATION PROCESS (FOLLOW PRECISELY)
+1. Extract Key Information:
+   - Identify the dispute reason and amount
+   - Verify representment timeliness
+   - Assess if compelling evidence addresses both reason and amount of chargeback
+   - Determine if merchant issued credit or valid charge identification exists
+   - Extract delivery confirmation details (address match, delivery date, tracking)
+   - Identify the final recommendation
+
+2. Apply Structured Analysis:
+   - Use step-by-step logical evaluation for each key element
+   - Compare normalized data (dates, addresses, amounts) for accurate assessment
+   - Apply semantic matching for field variations (e.g., "Txn Date" vs "Transaction Date")
+   - Verify if evidence directly addresses the specific dispute reason
+
+3. Format with Visual Indicators:
+   - Use designated emoji indicators for status visualization
+   - Format in clean, scannable Markdown
+   - Group related information in logical sections
+   - Emphasize the final recommendation
+
+4. Provide Reasoning Transparency:
+   - Include a brief "Reasoning Path" section showing key steps in the decision process
+   - Highlight critical evidence that influenced the decision
+   - Explain any significant compliance considerations that affected the outcome
+
+## OUTPUT FORMAT (MARKDOWN WITH EMOJIS)
+The output must follow this format:
+
+### Summary:
+- ⏱️ Represented timely: [✅Yes/❌No]
+- 📄 Compelling evidence addresses the reason for chargeback: [✅Yes/❌No]
+- 💵 Compelling evidence addresses the amount of chargeback: [✅Yes/❌No]
+
+### Merchant Issued Credit:
+- 🔍 Credit issued: [actual value(MIC/Merchant Issued Credit) or "None found"]
+
+### Valid Charge Identification:
+- 🔍 Charge ID: [actual value or "None found"]
+
+### Delivery Confirmation:
+- 📍 Address match: [✅Yes/❌No/🔍Missing]
+- 📅 Delivery date: [actual date or "Not available"]
+- 🚚 Tracking details: [✅Available/❌Not available]
+
+### Dispute Evaluation:
+- 📦 [3-5 bullet points highlighting key findings]
+- 📨 [Specific action recommendation for issuer/cardholder]
+
+### Key Reasoning Steps:
+- 🔍 [Brief explanation of how evidence was evaluated]
+- ⚖️ [Brief explanation of how compliance was determined]
+- 🧩 [Brief explanation of how the final decision was reached]
+
+### Recommendation:
+- ✉️ [Final detailed recommendation or rebuttal instruction]
+---
+
+## ICON LEGEND
+- ✅ Yes/Confirmed/Available
+- ❌ No/Not confirmed/Not available
+- 🔍 Missing information/Could not determine
+- ✉️ Recommendations
+- ⏱️ Time-related information
+- 📦 Dispute findings
+- 📨 Communication guidance
+- 📍 Location/address
+- 📅 Date information
+- 🚚 Shipping/delivery
+- 💵 Financial/amount
+- ⚖️ Compliance assessment
+- 🧩 Decision process
+
+## CRITICAL GUIDELINES
+- Use ONLY facts explicitly present in the input data
+- DO NOT fabricate, assume, or infer information not provided
+- Keep language simple, clear, and direct
+- Include specific values where available (dates, amounts, IDs)
+- If proposing a rebuttal letter, clearly indicate this recommendation
+- DO NOT include raw JSON, code blocks, or additional explanations
+- Include the "Key Reasoning Steps" section to provide transparency into the decision process
+- Format response as clean Markdown with proper spacing
+"""
 
 @api_call
-def summarizer_agent(decision_content, validation_content=None):
+def summarizer_agent(claim_ctx, decision_content, validation_content=None):
     """Creates a user-friendly summary with emoji indicators for clarity and explicit reasoning process"""
-    summarizer_prompt = f"""
-    You are an AI Summarizer Agent for the Chargeback Representment process, skilled at converting complex financial analyses into clear, actionable insights while making the reasoning process transparent.
-
-    ## PRIMARY OBJECTIVE
-    Transform the technical decision analysis into a concise, visually organized summary that highlights key findings and recommendations using emoji indicators for enhanced readability, while providing insight into the reasoning process.
-
-    ## INPUT DATA
-    Decision Analysis: {decision_content}
-    Validation Analysis: {validation_content if validation_content else "Not provided"}
-
-    ## SUMMARIZATION PROCESS (FOLLOW PRECISELY)
-    1. Extract Key Information:
-       - Identify the dispute reason and amount
-       - Verify representment timeliness
-       - Assess if compelling evidence addresses both reason and amount of chargeback
-       - Determine if merchant issued credit or valid charge identification exists
-       - Extract delivery confirmation details (address match, delivery date, tracking)
-       - Identify the final recommendation
-
-    2. Apply Structured Analysis:
-       - Use step-by-step logical evaluation for each key element
-       - Compare normalized data (dates, addresses, amounts) for accurate assessment
-       - Apply semantic matching for field variations (e.g., "Txn Date" vs "Transaction Date")
-       - Verify if evidence directly addresses the specific dispute reason
-
-    3. Format with Visual Indicators:
-       - Use designated emoji indicators for status visualization
-       - Format in clean, scannable Markdown
-       - Group related information in logical sections
-       - Emphasize the final recommendation
-
-    4. Provide Reasoning Transparency:
-       - Include a brief "Reasoning Path" section showing key steps in the decision process
-       - Highlight critical evidence that influenced the decision
-       - Explain any significant compliance considerations that affected the outcome
-
-    ## OUTPUT FORMAT (MARKDOWN WITH EMOJIS)
-    The output must follow this format:
-
-    ### Summary:
-    - ⏱️ Represented timely: [✅Yes/❌No]
-    - 📄 Compelling evidence addresses the reason for chargeback: [✅Yes/❌No]
-    - 💵 Compelling evidence addresses the amount of chargeback: [✅Yes/❌No]
-
-    ### Merchant Issued Credit:
-    - 🔍 Credit issued: [actual value(MIC/Merchant Issued Credit) or "None found"]
-
-    ### Valid Charge Identification:
-    - 🔍 Charge ID: [actual value or "None found"]
-
-    ### Delivery Confirmation:
-    - 📍 Address match: [✅Yes/❌No/🔍Missing]
-    - 📅 Delivery date: [actual date or "Not available"]
-    - 🚚 Tracking details: [✅Available/❌Not available]
-
-    ### Dispute Evaluation:
-    - 📦 [3-5 bullet points highlighting key findings]
-    - 📨 [Specific action recommendation for issuer/cardholder]
-
-    ### Key Reasoning Steps:
-    - 🔍 [Brief explanation of how evidence was evaluated]
-    - ⚖️ [Brief explanation of how compliance was determined]
-    - 🧩 [Brief explanation of how the final decision was reached]
-
-    ### Recommendation:
-    - ✉️ [Final detailed recommendation or rebuttal instruction]
-    ---
-
-    ## ICON LEGEND
-    - ✅ Yes/Confirmed/Available
-    - ❌ No/Not confirmed/Not available
-    - 🔍 Missing information/Could not determine
-    - ✉️ Recommendations
-    - ⏱️ Time-related information
-    - 📦 Dispute findings
-    - 📨 Communication guidance
-    - 📍 Location/address
-    - 📅 Date information
-    - 🚚 Shipping/delivery
-    - 💵 Financial/amount
-    - ⚖️ Compliance assessment
-    - 🧩 Decision process
-
-    ## CRITICAL GUIDELINES
-    - Use ONLY facts explicitly present in the input data
-    - DO NOT fabricate, assume, or infer information not provided
-    - Keep language simple, clear, and direct
-    - Include specific values where available (dates, amounts, IDs)
-    - If proposing a rebuttal letter, clearly indicate this recommendation
-    - DO NOT include raw JSON, code blocks, or additional explanations
-    - Include the "Key Reasoning Steps" section to provide transparency into the decision process
-    - Format response as clean Markdown with proper spacing
-    """
-
     # Add previous agent reasoning context
     if validation_content:
         previous_context = connect_reasoning_chains(validation_content, "SummarizerAgent")
-        summarizer_prompt += previous_context
     else:
         previous_context = connect_reasoning_chains(decision_content, "SummarizerAgent")
-        summarizer_prompt += previous_context
 
-    return summarizer_prompt
+    return SUMMARIZER_INSTRUCTIONS, (
+        f"## INPUT DATA\nDecision Analysis: {decision_content}\n"
+        f"Validation Analysis: {validation_content if validation_content else 'Not provided'}\n{previous_context}"
+    )
 
 
-def run_representment_workflow():
+def run_representment_workflow(claim_id="D1111111261"):
     """Orchestrates the full representment workflow with enhanced chain of thought"""
     try:
         # Log workflow start
-        logger.info("Starting representment workflow with enhanced chain of thought")
+        logger.info(f"Starting representment workflow with enhanced chain of thought for claim {claim_id}")
+        claim_ctx = ClaimContext(claim_id)
         start_time = datetime.now()
-
-        # Step 1: Run claim validation agent
-        logger.info("Running ClaimValidationAgent")
-        claim_validation_result = claimvalidation_agent()
-        logger.info("ClaimValidationAgent completed")
-
-        # Step 2: Run regulatory agent with validation result
-        logger.info("Running RegulatoryAgent")
-        regulatory_result = regulatory_agent(claim_validation_result)
-        logger.info("RegulatoryAgent completed")
-
-        # Step 3: Run decision agent with both previous results
-        logger.info("Running DecisionAgent")
-        decision_result = decision_agent(claim_validation_result, regulatory_result)
-        logger.info("DecisionAgent completed")
-
-        # Step 4: Run validator agent with decision result
-        logger.info("Running ValidatorAgent")
-        validator_result = validator_agent(decision_result)
-        logger.info("ValidatorAgent completed")
-
-        # Step 5: Run summarizer agent with decision and validation results
-        logger.info("Running SummarizerAgent")
-        summary_result = summarizer_agent(decision_result, validator_result)
-        logger.info("SummarizerAgent completed")
+        # Per-agent wall time, LLM calls and tokens for the metadata below
+        with collect(RequestTimings()) as timings:
+            # Step 1: Run claim validation agent
+            logger.info("Running ClaimValidationAgent")
+            claim_validation_result = claimvalidation_agent(claim_ctx)
+            logger.info("ClaimValidationAgent completed")
+
+            # Step 2: Run regulatory agent with validation result
+            logger.info("Running RegulatoryAgent")
+            regulatory_result = regulatory_agent(claim_ctx, claim_validation_result)
+            logger.info("RegulatoryAgent completed")
+
+            # Step 3: Run decision agent with both previous results
+            logger.info("Running DecisionAgent")
+            decision_result = decision_agent(claim_ctx, claim_validation_result, regulatory_result)
+            logger.info("DecisionAgent completed")
+
+            # Step 4: Run validator agent with decision result
+            logger.info("Running ValidatorAgent")
+            validator_result = validator_agent(claim_ctx, decision_result)
+            logger.info("ValidatorAgent completed")
+
+            # Step 5: Run summarizer agent with decision and validation results
+            logger.info("Running SummarizerAgent")
+            summary_result = summarizer_agent(claim_ctx, decision_result, validator_result)
+            logger.info("SummarizerAgent completed")
 
         # Calculate workflow duration
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         logger.info(f"Representment workflow completed in {duration:.2f} seconds")
 
-        # Save results to files
+        # Collect the results and run metadata
         results = {
-            "claim_validation": json.loads(claim_validation_result) if claim_validation_result else None,
-            "regulatory_analysis": json.loads(regulatory_result) if regulatory_result else None,
-            "decision": json.loads(decision_result) if decision_result else None,
-            "validation": json.loads(validator_result) if validator_result else None,
+            "claim_validation": parse_reply(claim_validation_result) if claim_validation_result else None,
+            "regulatory_analysis": parse_reply(regulatory_result) if regulatory_result else None,
+            "decision": parse_reply(decision_result) if decision_result else None,
+            "validation": parse_reply(validator_result) if validator_result else None,
             "summary": summary_result,
             "metadata": {
                 "workflow_duration": duration,
+                "agent_timings": timings.summary(),
                 "timestamp": datetime.now().isoformat(),
                 "version": "1.0.0"
             }
         }
 
-        with open("representment_results.json", "w") as f:
-            json.dump(results, f, indent=2)
-
-        logger.info("Results saved to representment_results.json")
+        # Indexed by claim, decision and reason code; query it through /api/results
+        run_id = record_result(claim_id, "RepresentmentWorkflow", results, duration)
+        logger.info(f"Results saved to the results store as run {run_id}")
 
         # Return the summary as the final output
         return summary_result
@@ -807,7 +870,7 @@ def run_representment_workflow():
 if __name__ == "__main__":
     try:
         # Execute the full workflow
-        final_result = run_representment_workflow()
+        final_result = run_representment_workflow(*sys.argv[1:2])
         print("\n=== REPRESENTMENT WORKFLOW RESULT ===\n")
         print(final_result)
 